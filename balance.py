@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Dodge Like Naruto - Balancing Runner
+Plays thousands of seeded headless games across a process pool and reports
+how long players survive, what kills them, how far they get and what they
+score, for the current difficulty numbers or for proposed changes to them.
+
+    python balance.py --games 5000 --output runs/baseline
+    python balance.py --games 5000 --output runs/faster --set spawn_delay_floor=12 --set projectile_base_speed=4
+
+Games run in chunks of consecutive seeds; every finished chunk is written to
+the output directory as a .npz file with one array per column. Running the
+same command again skips chunks that are already there, so an interrupted
+run resumes where it stopped. Any BALANCE entry in main.py can be overridden
+with --set.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from main import (Simulation, RandomPolicy, BALANCE, DEATH_CAUSES, PROJECTILE_SIZE, SPECIAL_ATTACK_RANGE,
+                  SCREEN_WIDTH, SCREEN_HEIGHT, FPS, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN, INPUT_DASH, INPUT_SPECIAL)
+
+CHUNK_GAMES = 50  # Games per chunk file; also the unit of work handed to a worker
+DEFAULT_MAX_SECONDS = 600
+MANIFEST_FILE = 'manifest.json'
+SUMMARY_FILE = 'summary.json'
+COLUMNS = {
+    'seed': np.int64,
+    'frames': np.int32,
+    'score': np.int64,
+    'level': np.int16,
+    'stage': np.int8,
+    'died': np.bool_,
+    'death_cause': np.int8,  # Index into DEATH_CAUSES; -1 means survived
+    'damage_taken': np.int16,
+    'powerups_collected': np.int16,
+    'dash_count': np.int32
+}
+
+# Policies
+
+class IdlePolicy:
+    """Never touch the keys"""
+    def __init__(self, seed):
+        pass
+
+    def __call__(self, sim):
+        return 0
+
+class DodgePolicy:
+    """Scripted player: steps sideways out of the nearest projectile's path and
+    dashes when it is about to hit, uses the special attack on adjacent
+    enemies and backs away from them while it recharges, and otherwise
+    drifts back to its starting area."""
+    DANGER = 160  # Pixels within which a projectile is worth dodging
+    PANIC = 60  # Pixels within which it is worth a dash
+    HOME = (SCREEN_WIDTH // 2, SCREEN_HEIGHT - 200)
+
+    def __init__(self, seed):
+        pass
+
+    def __call__(self, sim):
+        player = sim.player
+        px, py = player.rect.center
+        inputs = 0
+        pool = sim.projectiles
+        n = pool.count
+        if n:
+            dx = pool.x[:n] + PROJECTILE_SIZE / 2 - px
+            dy = pool.y[:n] + PROJECTILE_SIZE / 2 - py
+            distance = np.hypot(dx, dy)
+            i = int(distance.argmin())
+            if distance[i] < self.DANGER:
+                if pool.vy[i]:  # Falling: step sideways, away from it
+                    inputs |= INPUT_LEFT if dx[i] > 0 else INPUT_RIGHT
+                else:  # Flying sideways: step up or down
+                    inputs |= INPUT_UP if dy[i] > 0 else INPUT_DOWN
+                if distance[i] < self.PANIC:
+                    inputs |= INPUT_DASH
+        if not inputs and sim.enemies:
+            enemy = min(sim.enemies, key=lambda enemy: (enemy.rect.centerx - px) ** 2 + (enemy.rect.centery - py) ** 2)
+            ex, ey = enemy.rect.center
+            distance_squared = (ex - px) ** 2 + (ey - py) ** 2
+            if distance_squared < SPECIAL_ATTACK_RANGE ** 2 and player.special_attack_cooldown <= 0:
+                inputs |= INPUT_SPECIAL
+            elif distance_squared < self.DANGER ** 2:  # Back away while the special attack recharges
+                inputs |= (INPUT_LEFT if ex > px else INPUT_RIGHT) | (INPUT_UP if ey > py else INPUT_DOWN)
+        if not inputs:
+            home_x, home_y = self.HOME
+            if px < home_x - 40:
+                inputs |= INPUT_RIGHT
+            elif px > home_x + 40:
+                inputs |= INPUT_LEFT
+            if py < home_y - 40:
+                inputs |= INPUT_DOWN
+            elif py > home_y + 40:
+                inputs |= INPUT_UP
+        return inputs
+
+POLICIES = {'random': RandomPolicy, 'idle': IdlePolicy, 'dodge': DodgePolicy}
+
+# Running games
+
+def play(seed, policy_name, balance, max_frames):
+    """Play one game and return its row of COLUMNS values"""
+    sim = Simulation(seed, effects=False, balance=balance)
+    frames = sim.advance(max_frames, POLICIES[policy_name](seed))
+    cause = DEATH_CAUSES.index(sim.death_cause) if sim.game_over else -1
+    return (seed, frames, sim.score, sim.level, sim.stage, sim.game_over, cause,
+            sim.damage_taken, sim.powerups_collected, sim.player.dash_count)
+
+def chunk_path(output, chunk):
+    return os.path.join(output, f"chunk_{chunk:06d}.npz")
+
+def run_chunk(job):
+    """Worker entry point: play one chunk of seeds and write it to its .npz file"""
+    output, chunk, seeds, policy_name, balance, max_frames = job
+    rows = [play(seed, policy_name, balance, max_frames) for seed in seeds]
+    columns = {name: np.array([row[i] for row in rows], dtype=dtype) for i, (name, dtype) in enumerate(COLUMNS.items())}
+    path = chunk_path(output, chunk)
+    temp_path = path + '.tmp.npz'
+    np.savez(temp_path, **columns)
+    os.replace(temp_path, path)  # A chunk file either holds every game of the chunk or does not exist
+    return chunk, len(rows)
+
+def chunk_seeds(first_seed, games, chunk):
+    start = chunk * CHUNK_GAMES
+    return list(range(first_seed + start, first_seed + min(start + CHUNK_GAMES, games)))
+
+def chunk_complete(output, chunk, seeds):
+    try:
+        with np.load(chunk_path(output, chunk)) as data:
+            return data['seed'].tolist() == seeds
+    except (OSError, KeyError, ValueError):
+        return False
+
+def load_runs(output, chunks):
+    """Concatenate the columns of every chunk file"""
+    parts = {name: [] for name in COLUMNS}
+    for chunk in range(chunks):
+        with np.load(chunk_path(output, chunk)) as data:
+            for name in COLUMNS:
+                parts[name].append(data[name])
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+def check_manifest(output, manifest):
+    """Record what the directory holds, refusing to mix results from different settings"""
+    path = os.path.join(output, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            changed = sorted(key for key in set(existing) | set(manifest) if existing.get(key) != manifest.get(key))
+            sys.exit(f"{output} holds results for different settings ({', '.join(changed)}); "
+                     f"pick a new --output to run this experiment")
+        return
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+# Reporting
+
+def distribution(values, names=None):
+    """Share of games per distinct value, keyed by ``names(value)`` when given"""
+    keys, counts = np.unique(values, return_counts=True)
+    return {(names(key) if names else str(key)): count / len(values) for key, count in zip(keys.tolist(), counts.tolist())}
+
+def summarize(runs):
+    percentiles = (10, 25, 50, 75, 90, 99)
+    games = len(runs['seed'])
+    seconds = runs['frames'] / FPS
+    died = runs['died']
+    return {
+        'games': games,
+        'survival_seconds': dict(zip(map(str, percentiles), np.percentile(seconds, percentiles).tolist())),
+        'score': dict(zip(map(str, percentiles), np.percentile(runs['score'], percentiles).tolist())),
+        'mean_score': float(runs['score'].mean()),
+        'survived': float(1 - died.mean()),
+        'death_cause': distribution(runs['death_cause'], lambda cause: DEATH_CAUSES[cause] if cause >= 0 else 'survived'),
+        'stage_reached': distribution(runs['stage']),
+        'level_reached': distribution(runs['level'])
+    }
+
+def print_summary(summary):
+    def shares(values):
+        return '  '.join(f"{key} {share:.1%}" for key, share in sorted(values.items(), key=lambda item: -item[1]))
+    print(f"games      {summary['games']:,} ({summary['survived']:.1%} survived to the time limit)")
+    print("survival   " + '  '.join(f"p{key} {value:.1f}s" for key, value in summary['survival_seconds'].items()))
+    print("score      " + '  '.join(f"p{key} {value:,.0f}" for key, value in summary['score'].items()))
+    print(f"stage      {shares(summary['stage_reached'])}")
+    print(f"level      {shares(summary['level_reached'])}")
+    print(f"killed by  {shares(summary['death_cause'])}")
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo difficulty balancing over many headless games")
+    parser.add_argument('--games', type=positive_int, default=1000, help="games to play (default %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game; the rest follow (default %(default)s)")
+    parser.add_argument('--policy', choices=POLICIES, default='random', help="who plays (default %(default)s)")
+    parser.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS,
+                        help="stop a game that is still going after this long (default %(default)s)")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help="override a BALANCE setting, e.g. spawn_delay_floor=12 (repeatable)")
+    parser.add_argument('--workers', type=positive_int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument('--output', default='balance_runs', help="directory for results (default %(default)s)")
+    args = parser.parse_args()
+
+    balance = {}
+    for setting in args.set:
+        name, _, value = setting.partition('=')
+        if name not in BALANCE:
+            parser.error(f"unknown balance setting {name!r}; choose from {', '.join(BALANCE)}")
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = None
+        # Settings keep the type of their default: counts of frames and pixels stay whole numbers
+        if isinstance(BALANCE[name], int) and (isinstance(value, bool) or not isinstance(value, int)):
+            parser.error(f"{setting!r} needs a whole number")
+        if isinstance(BALANCE[name], float) and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            parser.error(f"{setting!r} needs a number")
+        balance[name] = type(BALANCE[name])(value)
+
+    os.makedirs(args.output, exist_ok=True)
+    max_frames = int(args.max_seconds * FPS)
+    check_manifest(args.output, {'seed': args.seed, 'policy': args.policy, 'max_frames': max_frames,
+                                 'balance': {**BALANCE, **balance}})
+
+    chunks = -(-args.games // CHUNK_GAMES)
+    jobs = []
+    for chunk in range(chunks):
+        seeds = chunk_seeds(args.seed, args.games, chunk)
+        if not chunk_complete(args.output, chunk, seeds):
+            jobs.append((args.output, chunk, seeds, args.policy, balance, max_frames))
+    pending = sum(len(job[2]) for job in jobs)
+    if pending < args.games:
+        print(f"Resuming: {args.games - pending:,} of {args.games:,} games already in {args.output}")
+
+    started = time.perf_counter()
+    if jobs:
+        done = 0
+        with multiprocessing.Pool(args.workers) as pool:
+            for _, games in pool.imap_unordered(run_chunk, jobs):
+                done += games
+                elapsed = time.perf_counter() - started
+                print(f"\r{done:,}/{pending:,} games, {done / elapsed:.0f} games/s", end='', flush=True)
+        print()
+
+    runs = load_runs(args.output, chunks)
+    summary = summarize(runs)
+    summary['policy'] = args.policy
+    summary['balance'] = balance
+    with open(os.path.join(args.output, SUMMARY_FILE), 'w') as f:
+        json.dump(summary, f, indent=2)
+    print_summary(summary)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Dodge Like Naruto - Benchmark Suite
+Drives the simulation and renderer through scripted, seeded scenarios with no
+visible window and reports how fast each one runs.
+
+    python benchmark.py                         # run every scenario
+    python benchmark.py --save-baseline         # record benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json   # fail on regressions
+
+Exits with status 1 when a scenario is slower than the baseline by more than
+the tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+from main import (Game, Enemy, RandomPolicy, PROFILE_PHASES, PLAYING, SCREEN_WIDTH, SCREEN_HEIGHT, FPS)
+
+BASELINE_FILE = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.15  # Allowed slowdown before a scenario counts as a regression
+ALLOCATION_FRAMES = 120  # Frames traced with tracemalloc, after the timed run
+SEED = 1234
+BOSS_SWARM_SIZE = 40
+
+# Scenarios
+# Each one prepares a freshly reset game, optionally adjusts it every frame,
+# and is timed after ``warmup`` frames for ``frames`` frames.
+
+def keep_alive(game):
+    """Hold the player at full health so every scenario runs its full length"""
+    game.player.invincible = True
+    game.player.invincible_timer = FPS
+    game.player.health = game.player.max_health
+
+def setup_stage_5(game):
+    game.level = 13
+    game.stage = 5
+    game.score = 12000
+    game.spawn_delay = 10  # The floor spawn_delay reaches from stage 3 on
+    game.enemy_delay = 30
+
+def level_up_every_frame(game):
+    keep_alive(game)
+    game.level -= 1  # The next step sees score // 1000 + 1 above the level and levels up again
+
+def hold_slow_time(game):
+    keep_alive(game)
+    game.player.slow_time = True
+    game.player.slow_timer = FPS
+    game.spawn_timer = game.spawn_delay  # Spawn every frame
+
+def setup_boss_swarm(game):
+    setup_stage_5(game)
+    boss_swarm(game)
+
+def boss_swarm(game):
+    keep_alive(game)
+    rng = game.spawn_rng
+    while len(game.enemies) < BOSS_SWARM_SIZE:
+        x = rng.choice((-60, SCREEN_WIDTH, rng.randrange(SCREEN_WIDTH)))
+        y = -60 if 0 <= x < SCREEN_WIDTH else rng.randrange(SCREEN_HEIGHT // 2)
+        game.enemies.append(Enemy(x, y, 'boss'))
+
+SCENARIOS = {
+    'stage_1': {
+        'description': "Fresh run at stage 1",
+        'setup': None, 'per_frame': keep_alive, 'warmup': 60, 'frames': 1200
+    },
+    'stage_5_floor': {
+        'description': "Stage 5 with spawn_delay at its floor",
+        'setup': setup_stage_5, 'per_frame': keep_alive, 'warmup': 300, 'frames': 1200
+    },
+    'level_up_storm': {
+        'description': "A level-up explosion every frame",
+        'setup': None, 'per_frame': level_up_every_frame, 'warmup': 60, 'frames': 600
+    },
+    'slow_time_buildup': {
+        'description': "Slow time held with a projectile spawned every frame",
+        'setup': setup_stage_5, 'per_frame': hold_slow_time, 'warmup': 600, 'frames': 600
+    },
+    'boss_swarm': {
+        'description': f"{BOSS_SWARM_SIZE} bosses chasing the player",
+        'setup': setup_boss_swarm, 'per_frame': boss_swarm, 'warmup': 120, 'frames': 900
+    }
+}
+
+def prepare(game, scenario):
+    game.reset_game(SEED)
+    game.state = PLAYING
+    if scenario['setup']:
+        scenario['setup'](game)
+    return RandomPolicy(SEED)
+
+def play_frame(game, scenario, policy):
+    profiler = game.profiler
+    profiler.begin_frame()
+    scenario['per_frame'](game)
+    inputs = policy(game)
+    profiler.mark('update/other')
+    game.step(inputs)
+    profiler.mark('update/other')
+    game.draw_game()
+    profiler.mark('draw/other')
+    profiler.end_frame()
+
+def run_scenario(game, name):
+    scenario = SCENARIOS[name]
+    profiler = game.profiler
+
+    policy = prepare(game, scenario)
+    profiler.enabled = False
+    for _ in range(scenario['warmup']):
+        play_frame(game, scenario, policy)
+    profiler.enabled = True
+    profiler.frames = 0
+    started = time.perf_counter()
+    for _ in range(scenario['frames']):
+        play_frame(game, scenario, policy)
+    elapsed = time.perf_counter() - started
+    profiler.enabled = False
+    summary = profiler.summary(scenario['frames'])
+    samples = profiler.history(scenario['frames']) * 1000
+    workload = {
+        'projectiles': len(game.projectiles),
+        'enemies': len(game.enemies),
+        'powerups': len(game.powerups),
+        'particles': len(game.particles)
+    }
+
+    # Allocations are traced separately; tracemalloc slows everything down
+    tracemalloc.start()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    for _ in range(ALLOCATION_FRAMES):
+        play_frame(game, scenario, policy)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'description': scenario['description'],
+        'frames': scenario['frames'],
+        'fps': scenario['frames'] / elapsed,
+        'frame_ms': {'p50': summary['busy'][0], 'p99': summary['busy'][1]},
+        'phases_ms': {phase: {'mean': float(samples[:, i].mean()), 'p99': summary[phase][1]}
+                      for i, phase in enumerate(PROFILE_PHASES) if samples[:, i].any()},
+        'allocations_kib': {'peak': (peak - baseline_memory) / 1024,
+                            'retained': (current - baseline_memory) / 1024},
+        'workload': workload
+    }
+
+def compare(results, baseline, tolerance):
+    """Print the change against ``baseline`` and return the names of regressed scenarios"""
+    regressions = []
+    print(f"\n{'scenario':<20} {'baseline fps':>12} {'fps':>10} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline['scenarios']:
+            print(f"{name:<20} {'-':>12} {result['fps']:>10.1f}")
+            continue
+        expected = baseline['scenarios'][name]
+        change = result['fps'] / expected['fps'] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        if result['workload'] != expected['workload']:
+            flag += "  (workload changed)"
+        print(f"{name:<20} {expected['fps']:>12.1f} {result['fps']:>10.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation and renderer hot paths")
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--output', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a saved run and fail on regressions")
+    parser.add_argument('--save-baseline', action='store_true', help=f"write the results to {BASELINE_FILE}")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="fractional fps drop tolerated before failing (default %(default)s)")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    game = Game(lazy=False, profile_file=':memory:')
+    results = {}
+    print(f"{'scenario':<20} {'fps':>8} {'p50 ms':>8} {'p99 ms':>8} {'alloc KiB':>10}  slowest phases")
+    for name in args.scenarios or SCENARIOS:
+        result = run_scenario(game, name)
+        results[name] = result
+        slowest = sorted(result['phases_ms'].items(), key=lambda item: -item[1]['mean'])[:3]
+        print(f"{name:<20} {result['fps']:>8.1f} {result['frame_ms']['p50']:>8.2f} {result['frame_ms']['p99']:>8.2f} "
+              f"{result['allocations_kib']['peak']:>10.1f}  "
+              + ", ".join(f"{phase} {timing['mean']:.2f}" for phase, timing in slowest))
+
+    report = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scenarios': results
+    }
+    for path in filter(None, (args.output, BASELINE_FILE if args.save_baseline else None)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nPerformance regressed beyond {args.tolerance:.0%} in: {', '.join(regressions)}")
+            sys.exit(1)
+
+    game.saver.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
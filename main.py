@@ -1,19 +1,50 @@
+import time
+STARTUP_STARTED = time.perf_counter()  # Taken before the heavy imports so the startup report covers them
+
 import pygame
 import random
 import sys
 import math
 import json
 import os
-import time
+import struct
+import itertools
+import collections
+import hashlib
+import sqlite3
+import functools
+import threading
+import contextlib
+import numpy as np
+
+# Startup timing
+# Pygame subsystems are initialized on demand: Game brings up the display and
+# fonts, SoundManager the mixer, and the headless simulation needs neither.
+startup_timings = [('imports', 'main', 0.0, time.perf_counter() - STARTUP_STARTED)]
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+@contextlib.contextmanager
+def startup_phase(name):
+    """Record how long the enclosed block takes in ``startup_timings``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        thread = 'main' if threading.current_thread() is threading.main_thread() else threading.current_thread().name
+        startup_timings.append((name, thread, started - STARTUP_STARTED,
+                                time.perf_counter() - started))
+
+def print_startup_report():
+    """Print the recorded startup phases in the order they began"""
+    print(f"{'phase':<20} {'thread':<8} {'start [ms]':>10} {'self [ms]':>10}")
+    for name, thread, start, duration in sorted(startup_timings, key=lambda timing: timing[2]):
+        print(f"{name:<20} {thread:<8} {start * 1000:>10.1f} {duration * 1000:>10.1f}")
 
 # Game constants
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 700
-FPS = 60
+FPS = 60  # Simulation ticks per second; every timer in the game counts ticks
+TICK_SECONDS = 1 / FPS
+MAX_TICKS_PER_FRAME = 5  # Frame-skip cap: past this the game slows down rather than falling further behind
 
 # Colors
 BLACK = (0, 0, 0)
@@ -47,44 +78,141 @@ PAUSED = 3
 SETTINGS = 4
 LEVEL_SELECT = 5
 SPLASH = 6
+REPLAY = 7
+DEMO = 8  # Attract mode: the autopilot plays behind the menu until a key is pressed
+ATTRACT_DELAY = 20 * FPS  # Idle frames on the menu before the demo starts
+# Window events after which the window has to be repainted in full
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.ACTIVEEVENT, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED,
+                 pygame.WINDOWFOCUSGAINED)
+
+# Player input flags, one bit per key that Player.move reads
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_DASH = 16
+INPUT_SPECIAL = 32
+INPUT_KEYS = {
+    pygame.K_LEFT: INPUT_LEFT,
+    pygame.K_RIGHT: INPUT_RIGHT,
+    pygame.K_UP: INPUT_UP,
+    pygame.K_DOWN: INPUT_DOWN,
+    pygame.K_SPACE: INPUT_DASH,
+    pygame.K_x: INPUT_SPECIAL
+}
+
+def read_input():
+    """Pack the currently held keys into INPUT_* flags"""
+    keys = pygame.key.get_pressed()
+    bits = 0
+    for key, flag in INPUT_KEYS.items():
+        if keys[key]:
+            bits |= flag
+    return bits
+
+def rng_stream(seed, name):
+    """Independent, reproducible random stream for one subsystem of a seeded game"""
+    return random.Random(f"{seed}:{name}")
 
 # Sound system
+SOUND_CACHE_DIR = 'sound_cache'
+SOUND_CACHE_VERSION = 1  # Bump when synthesis changes so stale buffers are ignored
+SOUND_EFFECTS = {
+    'collect': {'frequency': 440, 'duration': 0.1},    # A note
+    'hit': {'frequency': 220, 'duration': 0.2},        # Low A
+    'dash': {'frequency': 880, 'duration': 0.05},      # High A
+    'level_up': {'frequency': 660, 'duration': 0.3},   # E note
+    'game_over': {'frequency': 110, 'duration': 0.5}   # Very low A
+}
+SAMPLE_TYPES = {8: np.uint8, -8: np.int8, 16: np.uint16, -16: np.int16, 32: np.float32, -32: np.int32}
+
+def adsr_envelope(frames, sample_rate, attack=0.005, decay=0.0, sustain=1.0, release=0.02):
+    """Piecewise-linear attack/decay/sustain/release gain curve"""
+    duration = frames / sample_rate
+    attack = min(attack, duration / 2)
+    release = min(release, duration / 2)
+    decay = min(decay, duration - attack - release)
+    points = [0, attack, attack + decay, duration - release, duration]
+    levels = [0, 1, sustain, sustain, 0]
+    return np.interp(np.arange(frames) / sample_rate, points, levels)
+
+def synthesize_tone(frequency, duration, waveform='sine', volume=0.125, envelope=(),
+                    sample_rate=22050, sample_format=-16, channels=2, seed=0):
+    """Render a tone as a (frames, channels) PCM array in the mixer's sample format.
+    
+    ``waveform`` is 'sine', 'square' or 'noise'; ``volume`` is a fraction of
+    full scale and ``envelope`` holds optional ADSR arguments.
+    """
+    frames = int(duration * sample_rate)
+    t = np.arange(frames) / sample_rate
+    if waveform == 'sine':
+        wave = np.sin(2 * math.pi * frequency * t)
+    elif waveform == 'square':
+        wave = np.sign(np.sin(2 * math.pi * frequency * t))
+    elif waveform == 'noise':
+        wave = np.random.default_rng(seed).uniform(-1, 1, frames)
+    else:
+        raise ValueError(f"unknown waveform {waveform!r}")
+    wave *= volume * adsr_envelope(frames, sample_rate, *envelope)
+    
+    dtype = np.dtype(SAMPLE_TYPES.get(sample_format, np.int16))
+    if dtype.kind == 'f':
+        pcm = wave.astype(dtype)
+    else:
+        info = np.iinfo(dtype)
+        midpoint = (int(info.max) + int(info.min) + 1) // 2
+        pcm = (wave * (info.max - midpoint) + midpoint).astype(dtype)
+    return np.repeat(pcm[:, None], channels, axis=1)
+
 class SoundManager:
-    def __init__(self):
+    def __init__(self, cache_dir=SOUND_CACHE_DIR):
         self.sounds = {}
         self.music_enabled = True
         self.sound_enabled = True
-        self.init_sounds()
+        self.cache_dir = cache_dir
     
     def init_sounds(self):
-        """Initialize sound effects (placeholder for actual sound files)"""
-        # In a real implementation, you would load actual sound files here
-        # For now, we'll create placeholder sounds using pygame's built-in sounds
-        try:
-            # Create simple beep sounds for different events
-            self.sounds['collect'] = self.create_beep_sound(440, 0.1)  # A note
-            self.sounds['hit'] = self.create_beep_sound(220, 0.2)      # Low A
-            self.sounds['dash'] = self.create_beep_sound(880, 0.05)    # High A
-            self.sounds['level_up'] = self.create_beep_sound(660, 0.3) # E note
-            self.sounds['game_over'] = self.create_beep_sound(110, 0.5) # Very low A
-        except:
-            # If sound creation fails, disable sounds
+        """Open the mixer and synthesize the sound effects, reusing cached PCM buffers when possible"""
+        with startup_phase('audio device'):
+            try:
+                pygame.mixer.init()
+            except pygame.error:
+                pass
+        mixer = pygame.mixer.get_init()
+        if mixer is None:
+            # No audio device
             self.sound_enabled = False
+            return
+        with startup_phase('sound effects'):
+            for name, params in SOUND_EFFECTS.items():
+                try:
+                    self.sounds[name] = self.load_sound(params, mixer)
+                except (pygame.error, ValueError):
+                    self.sounds[name] = None
     
-    def create_beep_sound(self, frequency, duration):
-        """Create a simple beep sound"""
+    def load_sound(self, params, mixer):
+        sample_rate, sample_format, channels = mixer
+        key = repr((SOUND_CACHE_VERSION, sorted(params.items()), mixer))
+        path = os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.pcm')
+        frames = int(params['duration'] * sample_rate)
+        sample_size = np.dtype(SAMPLE_TYPES.get(sample_format, np.int16)).itemsize
         try:
-            sample_rate = 22050
-            frames = int(duration * sample_rate)
-            arr = []
-            for i in range(frames):
-                time = float(i) / sample_rate
-                wave = 4096 * math.sin(frequency * 2 * math.pi * time)
-                arr.append([int(wave), int(wave)])
-            sound = pygame.sndarray.make_sound(pygame.array.array('i', arr))
-            return sound
-        except:
-            return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            # A short or oversized file is a damaged cache entry; fall through and regenerate it
+            if len(data) == frames * channels * sample_size:
+                return pygame.mixer.Sound(buffer=data)
+        except OSError:
+            pass
+        
+        pcm = synthesize_tone(sample_rate=sample_rate, sample_format=sample_format,
+                              channels=channels, **params)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_atomic(path, pcm.tobytes())
+        except OSError:
+            pass  # Cache is optional
+        return pygame.sndarray.make_sound(pcm)
     
     def play_sound(self, sound_name):
         """Play a sound effect"""
@@ -102,78 +230,223 @@ class SoundManager:
         """Toggle background music on/off"""
         self.music_enabled = not self.music_enabled
 
-# Global sound manager
+# Global sound manager; sounds are loaded by Game while the splash screen is up
 sound_manager = SoundManager()
 
-class Particle:
-    def __init__(self, x, y, color, velocity, life, particle_type="circle", size=3):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.vx, self.vy = velocity
-        self.life = life
-        self.max_life = life
-        self.type = particle_type
-        self.size = size
-        self.rotation = 0
-        self.gravity = 0.1 if particle_type == "spark" else 0
+# Particle system
+PARTICLE_CIRCLE = 0
+PARTICLE_SPARK = 1
+PARTICLE_STAR = 2
+PARTICLE_TYPES = {'circle': PARTICLE_CIRCLE, 'spark': PARTICLE_SPARK, 'star': PARTICLE_STAR}
+PARTICLE_CAPACITY = 4096  # Maximum number of live particles
+
+class ParticleSystem:
+    """Structure-of-arrays particle pool backed by NumPy.
+
+    Each particle is one slot across a set of parallel columns; the first
+    ``count`` slots are alive. Dead particles are compacted away by moving
+    live particles from the tail into their slots, so spawning and culling
+    never allocate and the whole pool updates in one vectorized step.
+    """
+    def __init__(self, capacity=PARTICLE_CAPACITY, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.life = np.zeros(capacity, dtype=np.int32)
+        self.max_life = np.ones(capacity, dtype=np.int32)
+        self.size = np.zeros(capacity, dtype=np.int32)
+        self.rotation = np.zeros(capacity, dtype=np.int32)
+        self.type = np.zeros(capacity, dtype=np.int8)
+        self.color = np.zeros(capacity, dtype=np.int16)  # Index into self.palette
+        self.palette = []
+        self.palette_index = {}
+        self.rng = np.random.default_rng(seed)
+    
+    def __len__(self):
+        return self.count
+    
+    def columns(self):
+        return (self.x, self.y, self.vx, self.vy, self.life, self.max_life,
+                self.size, self.rotation, self.type, self.color)
+    
+    def clear(self):
+        self.count = 0
+    
+    def color_id(self, color):
+        """Return the palette index for an RGB color, registering it if new"""
+        color = tuple(color)
+        index = self.palette_index.get(color)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(color)
+            self.palette_index[color] = index
+        return index
+    
+    def emit(self, x, y, vx, vy, life, particle_type, color, size):
+        """Spawn a batch of particles; scalars are broadcast over the batch.
+        
+        Particles that do not fit in the pool are dropped.
+        """
+        count = min(len(vx), self.capacity - self.count)
+        if count <= 0:
+            return
+        batch = slice(self.count, self.count + count)
+        self.x[batch] = x
+        self.y[batch] = y
+        self.vx[batch] = vx[:count]
+        self.vy[batch] = vy[:count]
+        life = np.broadcast_to(life, len(vx))[:count]
+        self.life[batch] = life
+        self.max_life[batch] = life
+        self.size[batch] = size
+        self.rotation[batch] = 0
+        self.type[batch] = np.broadcast_to(particle_type, len(vx))[:count]
+        self.color[batch] = self.color_id(color)
+        self.count += count
     
     def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.life -= 1
-        self.vx *= 0.98  # Friction
-        self.vy *= 0.98
-        self.vy += self.gravity  # Gravity for sparks
-        self.rotation += 5
+        n = self.count
+        if n == 0:
+            return
+        vx = self.vx[:n]
+        vy = self.vy[:n]
+        self.x[:n] += vx
+        self.y[:n] += vy
+        self.life[:n] -= 1
+        vx *= 0.98  # Friction
+        vy *= 0.98
+        vy[self.type[:n] == PARTICLE_SPARK] += 0.1  # Gravity for sparks
+        self.rotation[:n] += 5
+        
+        # Swap-compact: fill dead slots below the new count with live tail slots
+        alive = self.life[:n] > 0
+        live = int(np.count_nonzero(alive))
+        if live < n:
+            holes = np.flatnonzero(~alive[:live])
+            movers = np.flatnonzero(alive[live:]) + live
+            if len(holes):
+                for column in self.columns():
+                    column[holes] = column[movers]
+            self.count = live
+
+class ParticleRenderer:
+    """Draws a ParticleSystem from pre-rasterized sprite atlases.
     
-    def draw(self, screen):
-        if self.life > 0:
-            alpha = int(255 * (self.life / self.max_life))
-            size = max(1, int(self.size * (self.life / self.max_life)))
-            
-            if self.type == "circle":
-                pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), size)
-            elif self.type == "spark":
-                # Draw spark as a line
-                end_x = self.x + math.cos(self.rotation * math.pi / 180) * size
-                end_y = self.y + math.sin(self.rotation * math.pi / 180) * size
-                pygame.draw.line(screen, self.color, (int(self.x), int(self.y)), 
-                               (int(end_x), int(end_y)), 2)
-            elif self.type == "star":
-                # Draw star particle
+    Every particle type is rasterized once per color at each quantized size,
+    rotation and alpha level into a single atlas surface. A frame is then one
+    ``Surface.blits()`` call with an atlas cell per particle.
+    """
+    MAX_SIZE = 4
+    ROTATIONS = 16
+    ALPHAS = 8
+    HALF = MAX_SIZE + 2  # Sprite center offset inside a cell
+    CELL = 2 * HALF + 1
+    
+    def __init__(self):
+        self.atlases = {}
+        # Atlas row for each (type, size - 1, rotation bucket); circles ignore rotation
+        self.rows = np.zeros((len(PARTICLE_TYPES), self.MAX_SIZE, self.ROTATIONS), dtype=np.int32)
+        self.row_specs = []
+        for particle_type in PARTICLE_TYPES.values():
+            for size in range(1, self.MAX_SIZE + 1):
+                rotations = 1 if particle_type == PARTICLE_CIRCLE else self.ROTATIONS
+                for bucket in range(rotations):
+                    self.row_specs.append((particle_type, size, bucket * 360 // self.ROTATIONS))
+                    if rotations == 1:
+                        self.rows[particle_type, size - 1, :] = len(self.row_specs) - 1
+                    else:
+                        self.rows[particle_type, size - 1, bucket] = len(self.row_specs) - 1
+        self.areas = [(column * self.CELL, row * self.CELL, self.CELL, self.CELL)
+                      for row in range(len(self.row_specs)) for column in range(self.ALPHAS)]
+    
+    def atlas(self, color):
+        atlas = self.atlases.get(color)
+        if atlas is None:
+            atlas = self.atlases[color] = self.build_atlas(color)
+        return atlas
+    
+    def build_atlas(self, color):
+        """Rasterize every sprite variant of one color into an atlas surface"""
+        cell = self.CELL
+        atlas = pygame.Surface((cell * self.ALPHAS, cell * len(self.row_specs)), pygame.SRCALPHA)
+        full = (self.ALPHAS - 1) * cell  # Opaque sprites go in the last column
+        for row, (particle_type, size, rotation) in enumerate(self.row_specs):
+            x = full + self.HALF
+            y = row * cell + self.HALF
+            if particle_type == PARTICLE_CIRCLE:
+                pygame.draw.circle(atlas, color, (x, y), size)
+            elif particle_type == PARTICLE_SPARK:
+                end_x = x + math.cos(rotation * math.pi / 180) * size
+                end_y = y + math.sin(rotation * math.pi / 180) * size
+                pygame.draw.line(atlas, color, (x, y), (int(end_x), int(end_y)), 2)
+            else:
                 points = []
                 for i in range(5):
-                    angle = (self.rotation + i * 72) * math.pi / 180
+                    angle = (rotation + i * 72) * math.pi / 180
                     radius = size if i % 2 == 0 else size // 2
-                    x = self.x + radius * math.cos(angle)
-                    y = self.y + radius * math.sin(angle)
-                    points.append((x, y))
-                if len(points) >= 3:
-                    pygame.draw.polygon(screen, self.color, points)
+                    points.append((x + radius * math.cos(angle), y + radius * math.sin(angle)))
+                pygame.draw.polygon(atlas, color, points)
+        
+        # Copy the opaque column into the faded columns with scaled alpha
+        rgb = pygame.surfarray.pixels3d(atlas)
+        alpha = pygame.surfarray.pixels_alpha(atlas)
+        for level in range(self.ALPHAS - 1):
+            column = slice(level * cell, (level + 1) * cell)
+            rgb[column] = rgb[full:]
+            alpha[column] = alpha[full:].astype(np.uint16) * (level + 1) // self.ALPHAS
+        del rgb, alpha  # Release the pixel locks
+        
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        return atlas
+    
+    def draw(self, screen, particles):
+        n = particles.count
+        if n == 0:
+            return
+        life = particles.life[:n]
+        max_life = particles.max_life[:n]
+        sizes = np.clip((particles.size[:n] * life) // max_life, 1, self.MAX_SIZE)
+        buckets = (particles.rotation[:n] % 360) * self.ROTATIONS // 360
+        alphas = (life * self.ALPHAS - 1) // max_life
+        cells = self.rows[particles.type[:n], sizes - 1, buckets] * self.ALPHAS + alphas
+        
+        atlases = [self.atlas(color) for color in particles.palette]
+        areas = self.areas
+        screen.blits(zip([atlases[color] for color in particles.color[:n].tolist()],
+                         zip((particles.x[:n].astype(np.int32) - self.HALF).tolist(),
+                             (particles.y[:n].astype(np.int32) - self.HALF).tolist()),
+                         [areas[cell] for cell in cells.tolist()]),
+                     doreturn=False)
+
+POWERUP_TYPES = ('speed', 'shield', 'slow_time', 'multi_shot', 'health', 'invincible')
 
 class PowerUp:
+    colors = {
+        'speed': CYAN,
+        'shield': BLUE,
+        'slow_time': PURPLE,
+        'multi_shot': YELLOW,
+        'health': GREEN,
+        'invincible': GOLD
+    }
+    symbols = {
+        'speed': '⚡',
+        'shield': '🛡️',
+        'slow_time': '⏰',
+        'multi_shot': '💥',
+        'health': '❤️',
+        'invincible': '✨'
+    }
+    
     def __init__(self, x, y, power_type):
         self.rect = pygame.Rect(x, y, 40, 40)
         self.type = power_type  # 'speed', 'shield', 'slow_time', 'multi_shot', 'health', 'invincible'
         self.animation = 0
         self.rotation = 0
-        self.colors = {
-            'speed': CYAN,
-            'shield': BLUE,
-            'slow_time': PURPLE,
-            'multi_shot': YELLOW,
-            'health': GREEN,
-            'invincible': GOLD
-        }
-        self.symbols = {
-            'speed': '⚡',
-            'shield': '🛡️',
-            'slow_time': '⏰',
-            'multi_shot': '💥',
-            'health': '❤️',
-            'invincible': '✨'
-        }
     
     def update(self):
         self.animation += 0.3
@@ -269,7 +542,7 @@ class Player:
         self.is_using_special = False
         self.dash_count = 0
     
-    def move(self, keys):
+    def move(self, inputs):
         current_speed = self.speed
         if self.speed_boost:
             current_speed *= 1.5
@@ -277,13 +550,12 @@ class Player:
             current_speed *= 2.0
         
         # Handle dash
-        if keys[pygame.K_SPACE] and self.dash_cooldown <= 0 and not self.is_dashing:
+        if inputs & INPUT_DASH and self.dash_cooldown <= 0 and not self.is_dashing:
             self.is_dashing = True
             self.dash_timer = 10  # Dash for 10 frames
             self.dash_cooldown = 60  # 1 second cooldown
             # Track dash count for achievements
             self.dash_count += 1
-            sound_manager.play_sound('dash')
         
         # Update dash
         if self.is_dashing:
@@ -295,7 +567,7 @@ class Player:
             self.dash_cooldown -= 1
         
         # Handle special attack
-        if keys[pygame.K_x] and self.special_attack_cooldown <= 0 and not self.is_using_special:
+        if inputs & INPUT_SPECIAL and self.special_attack_cooldown <= 0 and not self.is_using_special:
             self.is_using_special = True
             self.special_attack_timer = 30  # Special attack lasts 30 frames
             self.special_attack_cooldown = 300  # 5 second cooldown
@@ -313,13 +585,13 @@ class Player:
         dx = 0
         dy = 0
         
-        if keys[pygame.K_LEFT] and self.rect.x > 0:
+        if inputs & INPUT_LEFT and self.rect.x > 0:
             dx -= current_speed
-        if keys[pygame.K_RIGHT] and self.rect.x < SCREEN_WIDTH - self.rect.width:
+        if inputs & INPUT_RIGHT and self.rect.x < SCREEN_WIDTH - self.rect.width:
             dx += current_speed
-        if keys[pygame.K_UP] and self.rect.y > 0:
+        if inputs & INPUT_UP and self.rect.y > 0:
             dy -= current_speed
-        if keys[pygame.K_DOWN] and self.rect.y < SCREEN_HEIGHT - self.rect.height:
+        if inputs & INPUT_DOWN and self.rect.y < SCREEN_HEIGHT - self.rect.height:
             dy += current_speed
         
         # Normalize diagonal movement
@@ -362,9 +634,8 @@ class Player:
             if self.invincible_timer <= 0:
                 self.invincible = False
     
-    def draw(self, screen):
+    def draw(self, screen, rng=random):
         # Draw ninja body with animation
-        self.animation_frame += 0.2
         center_x = self.rect.x + self.rect.width // 2
         center_y = self.rect.y + self.rect.height // 2
         
@@ -381,8 +652,8 @@ class Player:
         # Dash effect
         if self.is_dashing:
             for i in range(5):
-                trail_x = center_x + random.randint(-30, 30)
-                trail_y = center_y + random.randint(-30, 30)
+                trail_x = center_x + rng.randint(-30, 30)
+                trail_y = center_y + rng.randint(-30, 30)
                 pygame.draw.circle(screen, WHITE, (trail_x, trail_y), 3)
         
         # Special attack effect
@@ -456,8 +727,8 @@ class Player:
         # Speed boost effect
         if self.speed_boost:
             for i in range(5):
-                trail_x = center_x + random.randint(-25, 25)
-                trail_y = center_y + random.randint(-25, 25)
+                trail_x = center_x + rng.randint(-25, 25)
+                trail_y = center_y + rng.randint(-25, 25)
                 pygame.draw.circle(screen, CYAN, (trail_x, trail_y), 2)
         
         # Health indicator
@@ -474,6 +745,8 @@ class Player:
             ]
             pygame.draw.polygon(screen, RED, heart_points)
 
+ENEMY_TYPES = ('ninja', 'assassin', 'boss')
+
 class Enemy:
     def __init__(self, x, y, enemy_type):
         self.rect = pygame.Rect(x, y, 40, 40)
@@ -546,266 +819,734 @@ class Enemy:
                 health_y = self.rect.y - 10
                 pygame.draw.rect(screen, RED, (health_x, health_y, 10, 3))
 
-class Projectile:
-    def __init__(self, x, y, direction, speed, color, projectile_type):
-        self.rect = pygame.Rect(x, y, 25, 25)
-        self.direction = direction  # 'down', 'left', 'right'
-        self.speed = speed
-        self.color = color
-        self.type = projectile_type  # 'kunai', 'fireball', 'shuriken', 'lightning', 'ice_shard', 'wind_blade'
-        self.rotation = 0
-        self.animation = 0
-        self.trail = []  # For trail effects
+# Projectiles
+PROJECTILE_TYPES = ('kunai', 'fireball', 'shuriken', 'lightning', 'ice_shard', 'wind_blade')
+PROJECTILE_DIRECTIONS = {'down': (0, 1), 'left': (-1, 0), 'right': (1, 0)}
+PROJECTILE_SIZE = 25
+PROJECTILE_TRAIL = 5  # Trail positions kept per projectile
+PROJECTILE_CAPACITY = 1024
+PROJECTILE_COLUMNS = ('x', 'y', 'prev_x', 'prev_y', 'vx', 'vy', 'speed', 'rotation', 'animation',
+                      'type', 'color', 'trail', 'trail_length', 'trail_head')
+
+def round_half_away(values):
+    """Round like pygame.Rect does when assigned a float"""
+    return np.copysign(np.floor(np.abs(values) + 0.5), values)
+
+def move_projectiles(pool, n, rows):
+    """Move the first ``n`` projectiles of a ProjectilePool, or of every pool in a ProjectileBatch, one frame.
     
-    def update(self):
-        # Store previous position for trail
-        prev_pos = (self.rect.centerx, self.rect.centery)
-        
-        if self.direction == 'down':
-            self.rect.y += self.speed
-        elif self.direction == 'left':
-            self.rect.x -= self.speed
-        elif self.direction == 'right':
-            self.rect.x += self.speed
-        
-        # Update trail
-        self.trail.append(prev_pos)
-        if len(self.trail) > 5:
-            self.trail.pop(0)
-        
-        # Rotate projectiles for visual effect
-        self.rotation += 10
-        self.animation += 0.3
+    ``rows`` is the index tuple that picks those projectiles' trails.
+    """
+    x = pool.x[..., :n]
+    y = pool.y[..., :n]
+    speed = pool.speed[..., :n]
+    head = pool.trail_head[..., :n]
     
-    def draw(self, screen):
-        center_x = self.rect.x + self.rect.width // 2
-        center_y = self.rect.y + self.rect.height // 2
+    # Store previous center for the trail
+    pool.trail[rows + (head, 0)] = x + PROJECTILE_SIZE // 2
+    pool.trail[rows + (head, 1)] = y + PROJECTILE_SIZE // 2
+    pool.trail_head[..., :n] = (head + 1) % PROJECTILE_TRAIL
+    np.minimum(pool.trail_length[..., :n] + 1, PROJECTILE_TRAIL, out=pool.trail_length[..., :n])
+    
+    x[:] = round_half_away(x + pool.vx[..., :n] * speed)
+    y[:] = round_half_away(y + pool.vy[..., :n] * speed)
+    
+    # Rotate projectiles for visual effect
+    pool.rotation[..., :n] += 10
+    pool.animation[..., :n] += 0.3
+
+class ProjectilePool:
+    """NumPy-backed store for every projectile in flight.
+    
+    Projectiles are rows across parallel columns, with the direction stored
+    as a unit velocity vector and the trail kept in a fixed-size ring buffer.
+    Movement, trail updates and off-screen culling run as one vectorized pass;
+    removal compacts the live rows with a boolean mask, preserving order.
+    Positions are the top-left corner of a PROJECTILE_SIZE square, rounded
+    exactly as the pygame.Rect they replace.
+    """
+    def __init__(self, capacity=PROJECTILE_CAPACITY):
+        self.capacity = capacity
+        self.count = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.prev_x = np.zeros(capacity)  # Position at the front end's last save_positions(), for render interpolation
+        self.prev_y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.rotation = np.zeros(capacity, dtype=np.int32)
+        self.animation = np.zeros(capacity)
+        self.type = np.zeros(capacity, dtype=np.int8)  # Index into PROJECTILE_TYPES
+        self.color = np.zeros(capacity, dtype=np.int16)  # Index into self.palette
+        self.trail = np.zeros((capacity, PROJECTILE_TRAIL, 2), dtype=np.int32)
+        self.trail_length = np.zeros(capacity, dtype=np.int8)
+        self.trail_head = np.zeros(capacity, dtype=np.int8)  # Next ring slot to write
+        self.rows = np.arange(capacity)
+        self.palette = []
+        self.palette_index = {}
+    
+    def __len__(self):
+        return self.count
+    
+    def columns(self):
+        return tuple(getattr(self, name) for name in PROJECTILE_COLUMNS)
+    
+    def clear(self):
+        self.count = 0
+    
+    def color_id(self, color):
+        """Return the palette index for an RGB color, registering it if new"""
+        index = self.palette_index.get(color)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(color)
+            self.palette_index[color] = index
+        return index
+    
+    def spawn(self, x, y, direction, speed, color, projectile_type):
+        if self.count >= self.capacity:
+            return
+        i = self.count
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.vx[i], self.vy[i] = PROJECTILE_DIRECTIONS[direction]
+        self.speed[i] = speed
+        self.rotation[i] = 0
+        self.animation[i] = 0
+        self.type[i] = PROJECTILE_TYPES.index(projectile_type)
+        self.color[i] = self.color_id(color)
+        self.trail[i] = 0  # Keeps snapshots of equal worlds byte-identical
+        self.trail_length[i] = 0
+        self.trail_head[i] = 0
+        self.count += 1
+    
+    def update(self, slow_time=False):
+        """Move every projectile one frame and record its trail"""
+        n = self.count
+        if n == 0:
+            return
+        move_projectiles(self, n, (self.rows[:n],))
         
-        # Draw trail effect
-        for i, (trail_x, trail_y) in enumerate(self.trail):
-            alpha = int(255 * (i / len(self.trail)))
-            trail_size = max(1, int(3 * (i / len(self.trail))))
-            pygame.draw.circle(screen, self.color, (int(trail_x), int(trail_y)), trail_size)
+        # Apply slow time effect
+        if slow_time:
+            speed = self.speed[:n]
+            np.maximum(speed * 0.5, 1, out=speed)
+    
+    def keep(self, mask):
+        """Compact the pool down to the rows where ``mask`` is true"""
+        live = int(np.count_nonzero(mask))
+        if live == self.count:
+            return
+        for column in self.columns():
+            column[:live] = column[:self.count][mask]
+        self.count = live
+    
+    def cull(self):
+        """Remove projectiles that are off-screen"""
+        n = self.count
+        x = self.x[:n]
+        self.keep(~((self.y[:n] > SCREEN_HEIGHT) | (x > SCREEN_WIDTH) | (x < -20)))
+    
+    def overlapping(self, rect):
+        """Indices of projectiles whose square overlaps ``rect``"""
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        return np.flatnonzero((x < rect.right) & (x + PROJECTILE_SIZE > rect.left) &
+                              (y < rect.bottom) & (y + PROJECTILE_SIZE > rect.top))
+    
+    def remove(self, indices):
+        mask = np.ones(self.count, dtype=bool)
+        mask[indices] = False
+        self.keep(mask)
+
+class ProjectileBatch:
+    """The ProjectilePools of several Simulations, stored as rows of shared 2-D columns.
+    
+    ``pools[i]`` is an ordinary ProjectilePool over row ``i``; hand each to a
+    Simulation and step them all with begin_step(), then advance() here, then
+    finish_step(). advance() moves, culls and collides every pool in one
+    vectorized pass, with exactly the results of each pool's own update(),
+    cull() and overlapping(). Slots past a pool's count are moved along as
+    scratch; spawn() rewrites a slot before it is live again.
+    """
+    def __init__(self, size, capacity=PROJECTILE_CAPACITY):
+        self.pools = [ProjectilePool(capacity) for _ in range(size)]
+        for name, column in zip(PROJECTILE_COLUMNS, self.pools[0].columns()):
+            rows = np.zeros((size,) + column.shape, dtype=column.dtype)
+            setattr(self, name, rows)
+            for pool, row in zip(self.pools, rows):
+                setattr(pool, name, row)
+        self.rows = self.pools[0].rows
+        self.pool_rows = np.arange(size)[:, None]
+        self.counts = np.zeros((size, 1), dtype=np.intp)
+        self.slow_time = np.zeros((size, 1), dtype=bool)
+        self.bounds = np.zeros((4, size, 1))  # Each player's left, right, top and bottom
+        self.no_hits = np.zeros(0, dtype=np.intp)
+    
+    def advance(self, players):
+        """Move every pool one frame, slowed where its player has slow time, and drop off-screen projectiles.
+        
+        Returns, per pool, the indices of projectiles overlapping its player's rect.
+        """
+        pools = self.pools
+        hits = [self.no_hits] * len(pools)
+        counts = self.counts
+        counts[:, 0] = [pool.count for pool in pools]
+        n = int(counts.max())
+        if n == 0:
+            return hits
+        move_projectiles(self, n, (self.pool_rows, self.rows[:n]))
+        self.slow_time[:, 0] = [player.slow_time for player in players]
+        if self.slow_time.any():
+            speed = self.speed[:, :n]
+            np.maximum(speed * 0.5, 1, out=speed, where=self.slow_time)
+        
+        # Cull; only pools that lost a projectile need compacting
+        x = self.x[:, :n]
+        y = self.y[:, :n]
+        live = self.rows[:n] < counts
+        culled = ((y > SCREEN_HEIGHT) | (x > SCREEN_WIDTH) | (x < -20)) & live
+        for i in np.flatnonzero(culled.any(axis=1)).tolist():
+            pool = pools[i]
+            pool.keep(~culled[i, :pool.count])
+            counts[i] = pool.count
+            live[i] = self.rows[:n] < pool.count
+        
+        self.bounds[:, :, 0] = np.array([(rect.left, rect.right, rect.top, rect.bottom)
+                                         for rect in (player.rect for player in players)]).T
+        left, right, top, bottom = self.bounds
+        hit = ((x < right) & (x + PROJECTILE_SIZE > left) & (y < bottom) & (y + PROJECTILE_SIZE > top)) & live
+        for i in np.flatnonzero(hit.any(axis=1)).tolist():
+            hits[i] = np.flatnonzero(hit[i, :pools[i].count])
+        return hits
+
+PROJECTILE_SPRITE_HALF = 24  # Sprites are square, centered on the projectile
+PROJECTILE_SPRITE_CACHE_SIZE = 512  # Most sprites kept before evicting the least recently used
+PROJECTILE_FRAMES = 8  # Frames in each animation strip
+PROJECTILE_ROTATION_PERIOD = {'shuriken': 90, 'wind_blade': 360}  # Degrees until the shape repeats
+PROJECTILE_ANIMATED = ('fireball', 'ice_shard', 'wind_blade')
+# Animated parts drawn unrotated over a rotating sprite, so rotations and frames add up instead of multiplying
+PROJECTILE_OVERLAYS = {'wind_blade': ('wind', LIGHT_BLUE)}
+
+class ProjectileRenderer:
+    """Draws a ProjectilePool from cached pre-rendered sprites.
+    
+    Each (projectile type, color, rotation bucket, animation frame) is rendered
+    once to a per-pixel-alpha surface and kept in an LRU cache, so a frame is
+    one ``Surface.blits()`` call. Fireball flames cycle through a strip of
+    frames over one flicker period; ice sparkles and wind particles pick a
+    random frame from a strip of pre-scattered layouts. Wind particles are a
+    separate overlay sprite, so the wind blade's rotations and particle
+    frames are cached side by side rather than in every combination.
+    """
+    def __init__(self, cache_size=PROJECTILE_SPRITE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.sprites = collections.OrderedDict()
+    
+    def sprite(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.sprites[key] = self.render(*key)
+            if len(self.sprites) > self.cache_size:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+        return sprite
+    
+    def render(self, projectile_type, color, rotation, frame):
+        size = 2 * PROJECTILE_SPRITE_HALF
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        if projectile_type == 'trail':
+            # Trail dot; ``rotation`` holds the radius
+            pygame.draw.circle(sprite, color, (PROJECTILE_SPRITE_HALF, PROJECTILE_SPRITE_HALF), rotation)
+        elif projectile_type == 'wind':
+            # Wind particles scattered around a wind blade
+            rng = random.Random(frame)
+            for i in range(4):
+                wind_x = PROJECTILE_SPRITE_HALF + rng.randint(-10, 10)
+                wind_y = PROJECTILE_SPRITE_HALF + rng.randint(-10, 10)
+                pygame.draw.circle(sprite, color, (wind_x, wind_y), 2)
+        else:
+            self.draw_projectile(sprite, projectile_type, color, rotation,
+                                 frame * 2 * math.pi / PROJECTILE_FRAMES, random.Random(frame))
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        return sprite
+    
+    def draw(self, screen, projectiles, rng=random):
+        n = projectiles.count
+        if n == 0:
+            return
+        palette = projectiles.palette
+        half = PROJECTILE_SPRITE_HALF
+        center = PROJECTILE_SIZE // 2
+        blits = []
+        for i, (x, y, type_id, color, rotation, animation, length, head) in enumerate(zip(
+                projectiles.x[:n].astype(int).tolist(), projectiles.y[:n].astype(int).tolist(),
+                projectiles.type[:n].tolist(), projectiles.color[:n].tolist(),
+                projectiles.rotation[:n].tolist(), projectiles.animation[:n].tolist(),
+                projectiles.trail_length[:n].tolist(), projectiles.trail_head[:n].tolist())):
+            projectile_type = PROJECTILE_TYPES[type_id]
+            color = palette[color]
+            
+            # Trail effect, oldest position first
+            if length:
+                trail = projectiles.trail[i].tolist()
+                for k in range(length):
+                    trail_x, trail_y = trail[(head - length + k) % PROJECTILE_TRAIL]
+                    trail_size = max(1, 3 * k // length)
+                    blits.append((self.sprite(('trail', color, trail_size, 0)),
+                                  (trail_x - half, trail_y - half)))
+            
+            period = PROJECTILE_ROTATION_PERIOD.get(projectile_type)
+            rotation = rotation % period if period else 0
+            if projectile_type == 'fireball':
+                frame = int(animation % (2 * math.pi) * PROJECTILE_FRAMES / (2 * math.pi))
+            elif projectile_type in PROJECTILE_ANIMATED:
+                frame = rng.randrange(PROJECTILE_FRAMES)
+            else:
+                frame = 0
+            position = (x + center - half, y + center - half)
+            overlay = PROJECTILE_OVERLAYS.get(projectile_type)
+            if overlay:
+                overlay_type, overlay_color = overlay
+                blits.append((self.sprite((projectile_type, color, rotation, 0)), position))
+                blits.append((self.sprite((overlay_type, overlay_color, 0, frame)), position))
+            else:
+                blits.append((self.sprite((projectile_type, color, rotation, frame)), position))
+        screen.blits(blits, doreturn=False)
+    
+    def draw_projectile(self, sprite, projectile_type, color, rotation, animation, rng):
+        """Draw one projectile centered on ``sprite``"""
+        center_x = center_y = PROJECTILE_SPRITE_HALF
+        top = center_y - PROJECTILE_SIZE // 2
         
-        if self.type == 'kunai':
+        if projectile_type == 'kunai':
             # Draw kunai (throwing knife) with better detail
             points = [
-                (center_x, self.rect.y + 2),
+                (center_x, top + 2),
                 (center_x - 8, center_y),
-                (center_x, self.rect.y + self.rect.height - 2),
+                (center_x, top + PROJECTILE_SIZE - 2),
                 (center_x + 8, center_y)
             ]
-            pygame.draw.polygon(screen, self.color, points)
-            pygame.draw.polygon(screen, DARK_GRAY, points, 2)
+            pygame.draw.polygon(sprite, color, points)
+            pygame.draw.polygon(sprite, DARK_GRAY, points, 2)
             # Blade tip
-            pygame.draw.circle(screen, SILVER, (center_x, center_y), 3)
+            pygame.draw.circle(sprite, SILVER, (center_x, center_y), 3)
             
-        elif self.type == 'fireball':
+        elif projectile_type == 'fireball':
             # Draw fireball with better flame effects
             base_radius = 12
-            pygame.draw.circle(screen, self.color, (center_x, center_y), base_radius)
-            pygame.draw.circle(screen, YELLOW, (center_x, center_y), base_radius - 3)
+            pygame.draw.circle(sprite, color, (center_x, center_y), base_radius)
+            pygame.draw.circle(sprite, YELLOW, (center_x, center_y), base_radius - 3)
             
-            # Animated flame effect
+            # Animated flame effect, sampled over one flicker period
             for i in range(6):
-                angle = (self.animation * 2 + i * 60) * math.pi / 180
+                angle = (animation * 2 + i * 60) * math.pi / 180
                 flame_x = center_x + math.cos(angle) * (base_radius + 3)
                 flame_y = center_y + math.sin(angle) * (base_radius + 3)
-                flame_size = 4 + int(2 * math.sin(self.animation + i))
-                pygame.draw.circle(screen, YELLOW, (int(flame_x), int(flame_y)), flame_size)
+                flame_size = 4 + int(2 * math.sin(animation + i))
+                pygame.draw.circle(sprite, YELLOW, (int(flame_x), int(flame_y)), flame_size)
                 
-        elif self.type == 'shuriken':
+        elif projectile_type == 'shuriken':
             # Draw shuriken (star) with better detail
             points = []
             for i in range(8):
-                angle = (self.rotation + i * 45) * math.pi / 180
+                angle = (rotation + i * 45) * math.pi / 180
                 radius = 10 if i % 2 == 0 else 5
                 x = center_x + radius * math.cos(angle)
                 y = center_y + radius * math.sin(angle)
                 points.append((x, y))
-            pygame.draw.polygon(screen, self.color, points)
-            pygame.draw.polygon(screen, DARK_GRAY, points, 2)
+            pygame.draw.polygon(sprite, color, points)
+            pygame.draw.polygon(sprite, DARK_GRAY, points, 2)
             # Center circle
-            pygame.draw.circle(screen, DARK_GRAY, (center_x, center_y), 3)
+            pygame.draw.circle(sprite, DARK_GRAY, (center_x, center_y), 3)
             
-        elif self.type == 'lightning':
+        elif projectile_type == 'lightning':
             # Draw lightning bolt
             points = [
-                (center_x - 6, self.rect.y),
+                (center_x - 6, top),
                 (center_x + 2, center_y - 5),
                 (center_x - 2, center_y),
                 (center_x + 6, center_y + 5),
                 (center_x - 2, center_y + 10),
                 (center_x + 2, center_y + 15),
-                (center_x - 6, self.rect.y + self.rect.height)
+                (center_x - 6, top + PROJECTILE_SIZE)
             ]
-            pygame.draw.lines(screen, self.color, False, points, 4)
-            pygame.draw.lines(screen, YELLOW, False, points, 2)
+            pygame.draw.lines(sprite, color, False, points, 4)
+            pygame.draw.lines(sprite, YELLOW, False, points, 2)
             
-        elif self.type == 'ice_shard':
+        elif projectile_type == 'ice_shard':
             # Draw ice shard
             points = [
-                (center_x, self.rect.y),
+                (center_x, top),
                 (center_x - 6, center_y),
-                (center_x, self.rect.y + self.rect.height),
+                (center_x, top + PROJECTILE_SIZE),
                 (center_x + 6, center_y)
             ]
-            pygame.draw.polygon(screen, self.color, points)
-            pygame.draw.polygon(screen, WHITE, points, 2)
+            pygame.draw.polygon(sprite, color, points)
+            pygame.draw.polygon(sprite, WHITE, points, 2)
             # Ice sparkles
             for i in range(3):
-                sparkle_x = center_x + random.randint(-8, 8)
-                sparkle_y = center_y + random.randint(-8, 8)
-                pygame.draw.circle(screen, WHITE, (sparkle_x, sparkle_y), 1)
+                sparkle_x = center_x + rng.randint(-8, 8)
+                sparkle_y = center_y + rng.randint(-8, 8)
+                pygame.draw.circle(sprite, WHITE, (sparkle_x, sparkle_y), 1)
                 
-        elif self.type == 'wind_blade':
+        elif projectile_type == 'wind_blade':
             # Draw wind blade
             blade_length = 15
-            angle = self.rotation * math.pi / 180
+            angle = rotation * math.pi / 180
             end_x = center_x + blade_length * math.cos(angle)
             end_y = center_y + blade_length * math.sin(angle)
-            pygame.draw.line(screen, self.color, (center_x, center_y), (end_x, end_y), 6)
-            pygame.draw.line(screen, WHITE, (center_x, center_y), (end_x, end_y), 3)
-            # Wind particles
-            for i in range(4):
-                wind_x = center_x + random.randint(-10, 10)
-                wind_y = center_y + random.randint(-10, 10)
-                pygame.draw.circle(screen, LIGHT_BLUE, (wind_x, wind_y), 2)
+            pygame.draw.line(sprite, color, (center_x, center_y), (end_x, end_y), 6)
+            pygame.draw.line(sprite, WHITE, (center_x, center_y), (end_x, end_y), 3)
+            # Wind particles are drawn over it from a separate 'wind' sprite
 
-class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Dodge Like Naruto - Enhanced Edition")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 48)  # Increased from 36
-        self.big_font = pygame.font.Font(None, 84)  # Increased from 72
-        self.title_font = pygame.font.Font(None, 120)  # Increased from 96
-        self.small_font = pygame.font.Font(None, 32)  # Increased from 24
-        self.medium_font = pygame.font.Font(None, 40)  # New medium font
-        self.large_font = pygame.font.Font(None, 60)  # New large font
-        
-        self.state = SPLASH
-        self.splash_timer = 0
-        self.high_score = self.load_high_score()
-        self.particles = []
-        self.powerups = []
-        self.powerup_timer = 0
-        self.powerup_delay = 300  # frames between powerup spawns
-        self.enemies = []
-        self.enemy_timer = 0
-        self.enemy_delay = 180  # frames between enemy spawns
-        self.level = 1
-        self.experience = 0
-        self.achievements = self.load_achievements()
-        self.settings = self.load_settings()
-        self.background_offset = 0
-        self.stage = 1  # Different visual themes per stage
-        self.stage_colors = {
-            1: {'bg': (20, 20, 40), 'stars': (100, 100, 200), 'accent': CYAN},
-            2: {'bg': (40, 20, 20), 'stars': (200, 100, 100), 'accent': RED},
-            3: {'bg': (20, 40, 20), 'stars': (100, 200, 100), 'accent': GREEN},
-            4: {'bg': (40, 20, 40), 'stars': (200, 100, 200), 'accent': PURPLE},
-            5: {'bg': (40, 40, 20), 'stars': (200, 200, 100), 'accent': YELLOW}
-        }
-        
-        # Sound system
-        self.sound_enabled = True
-        self.music_enabled = True
-        
-        # Performance tracking
-        self.frame_count = 0
-        self.fps_counter = 0
-        self.fps_timer = 0
-        self.current_fps = 0
-        
-        self.reset_game()
+# Collision broadphase
+COLLISION_CELL_SIZE = 64  # Must be at least as large as the biggest entity
+BROADPHASE_MIN_ENTITIES = 8  # Below this, testing every entity is cheaper
+SPECIAL_ATTACK_RANGE = 50
+
+class SpatialHash:
+    """Uniform grid broadphase for rect-based entities.
     
-    def load_high_score(self):
-        try:
-            if os.path.exists('high_score.json'):
-                with open('high_score.json', 'r') as f:
-                    data = json.load(f)
-                    return data.get('high_score', 0)
-        except:
-            pass
-        return 0
+    ``build`` buckets a list of entities by the grid cell holding the top-left
+    corner of their rect. Entities are never larger than a cell, so a query
+    only has to look one cell further up and left of its area. Queries return
+    the sorted list indices of candidate entities, so narrow-phase tests only
+    touch nearby objects.
+    """
+    def __init__(self, cell_size=COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.count = 0
     
-    def save_high_score(self):
-        try:
-            with open('high_score.json', 'w') as f:
-                json.dump({'high_score': self.high_score}, f)
-        except:
-            pass
+    def build(self, entities):
+        self.cells.clear()
+        self.count = len(entities)
+        if self.count < BROADPHASE_MIN_ENTITIES:
+            return
+        size = self.cell_size
+        cells = self.cells
+        for index, entity in enumerate(entities):
+            key = (entity.rect.x // size, entity.rect.y // size)
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [index]
+            else:
+                bucket.append(index)
     
-    def load_achievements(self):
-        try:
-            if os.path.exists('achievements.json'):
-                with open('achievements.json', 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return {
-            'first_game': False,
-            'score_1000': False,
-            'score_5000': False,
-            'score_10000': False,
-            'survive_60s': False,
-            'collect_10_powerups': False,
-            'perfect_dash': False,
-            'no_damage_run': False
-        }
+    def query_area(self, left, top, right, bottom):
+        if self.count < BROADPHASE_MIN_ENTITIES:
+            return range(self.count)
+        size = self.cell_size
+        cells = self.cells
+        found = []
+        for cx in range(int(left) // size - 1, int(right) // size + 1):
+            for cy in range(int(top) // size - 1, int(bottom) // size + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        found.sort()
+        return found
     
-    def save_achievements(self):
-        try:
-            with open('achievements.json', 'w') as f:
-                json.dump(self.achievements, f)
-        except:
-            pass
+    def query(self, rect):
+        """Indices of entities that may overlap ``rect``"""
+        return self.query_area(rect.left, rect.top, rect.right - 1, rect.bottom - 1)
     
-    def load_settings(self):
-        try:
-            if os.path.exists('settings.json'):
-                with open('settings.json', 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return {
-            'sound_enabled': True,
-            'music_enabled': True,
-            'difficulty': 'normal',
-            'particle_effects': True,
-            'show_fps': False
-        }
+    def query_radius(self, x, y, radius):
+        """Indices of entities that may lie within ``radius`` of (x, y)"""
+        return self.query_area(x - radius, y - radius, x + radius, y + radius)
+
+# Frame profiling
+PROFILE_PHASES = (
+    'events',
+    'update/spawn', 'update/player', 'update/projectiles', 'update/enemies',
+    'update/powerups', 'update/particles', 'update/autopilot', 'update/other',
+    'draw/background', 'draw/entities', 'draw/hud', 'draw/minimap', 'draw/other',
+    'profiler', 'flip', 'idle'
+)
+PROFILE_HISTORY = 3600  # Frames kept for the overlay and exports (one minute at 60 FPS)
+PROFILE_GRAPH_FRAMES = 240
+PROFILE_GRAPH_HEIGHT = 72
+PROFILE_SUMMARY_FRAMES = 600  # Rolling window for the overlay percentiles
+PROFILE_SUMMARY_INTERVAL = 30  # Frames between overlay percentile refreshes
+PROFILE_EXPORT_FILE = 'frame_profile.csv'  # Written by F4 in game
+
+class FrameProfiler:
+    """Splits each frame's wall time across PROFILE_PHASES.
     
-    def save_settings(self):
-        try:
-            with open('settings.json', 'w') as f:
-                json.dump(self.settings, f)
-        except:
-            pass
+    Code calls ``mark(phase)`` as it finishes each piece of work; the time
+    since the previous mark is charged to that phase, so marks cost one clock
+    read and need no nesting. ``end_frame`` stores the frame in a ring buffer
+    of the last PROFILE_HISTORY frames, allocated when the first frame is
+    recorded. While disabled, ``mark`` returns immediately.
+    """
+    def __init__(self, history=PROFILE_HISTORY):
+        self.enabled = False
+        self.index = {phase: i for i, phase in enumerate(PROFILE_PHASES)}
+        self.history_size = history
+        self.samples = np.zeros((0, len(PROFILE_PHASES)))  # Headless and forked Simulations never record a frame
+        self.frames = 0  # Frames recorded since the profiler was created
+        self.current = [0.0] * len(PROFILE_PHASES)
+        self.last = time.perf_counter()
+    
+    def begin_frame(self):
+        self.current = [0.0] * len(PROFILE_PHASES)
+        self.last = time.perf_counter()
+    
+    def mark(self, phase):
+        if self.enabled:
+            now = time.perf_counter()
+            self.current[self.index[phase]] += now - self.last
+            self.last = now
+    
+    def end_frame(self):
+        if self.enabled:
+            if not len(self.samples):
+                self.samples = np.zeros((self.history_size, len(PROFILE_PHASES)))
+            self.samples[self.frames % len(self.samples)] = self.current
+            self.frames += 1
+    
+    def history(self, frames=None):
+        """Recorded frames oldest first as a (frames, phases) array of seconds"""
+        count = min(self.frames, len(self.samples), frames or self.history_size)
+        rows = (np.arange(self.frames - count, self.frames)) % len(self.samples)
+        return self.samples[rows]
+    
+    def summary(self, frames=None):
+        """Median and 99th percentile milliseconds per phase, plus 'busy' (all but idle) and 'frame' totals"""
+        samples = self.history(frames) * 1000
+        if not len(samples):
+            return {}
+        frame = samples.sum(axis=1)
+        columns = dict(zip(PROFILE_PHASES, samples.T))
+        columns['busy'] = frame - columns['idle']
+        columns['frame'] = frame
+        return {name: (float(np.percentile(values, 50)), float(np.percentile(values, 99)))
+                for name, values in columns.items()}
     
-    def reset_game(self):
+    def encode(self, path):
+        """Recorded frames as CSV, or as JSON when ``path`` ends in .json"""
+        samples = self.history() * 1000
+        first = self.frames - len(samples)
+        if path.endswith('.json'):
+            return json.dumps({
+                'unit': 'ms',
+                'phases': PROFILE_PHASES,
+                'first_frame': first,
+                'frames': np.round(samples, 4).tolist(),
+                'summary': {name: {'p50': p50, 'p99': p99} for name, (p50, p99) in self.summary().items()}
+            }).encode()
+        lines = [','.join(('frame',) + PROFILE_PHASES)]
+        for i, row in enumerate(samples):
+            lines.append(','.join([str(first + i)] + [f"{value:.4f}" for value in row]))
+        return ('\n'.join(lines) + '\n').encode()
+    
+    def export(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.encode(path))
+
+# Difficulty tuning
+# The numbers behind the difficulty curve. Simulation takes overrides for any
+# of them, so balance.py can measure a change before it ships.
+BALANCE = {
+    'spawn_delay': 60,  # Frames between projectile spawns at the start of a run
+    'spawn_delay_step': 1,  # Taken off after every projectile spawn...
+    'spawn_delay_floor': 15,  # ...until it reaches this
+    'late_spawn_delay_step': 1,  # Extra reduction per spawn from stage 3 on...
+    'late_spawn_delay_floor': 10,  # ...down to this
+    'enemy_delay': 180,  # Frames between enemy spawns at the start of a run
+    'enemy_delay_step': 2,
+    'enemy_delay_floor': 60,
+    'late_enemy_delay_step': 1,
+    'late_enemy_delay_floor': 30,
+    'projectile_base_speed': 3,  # Slowest projectile speed, plus the level and stage - 1
+    'projectile_speed_spread': 3,  # Projectiles are up to this much faster than the base speed
+    'stage_3_enemy_speed': 1,  # Added to enemies spawned from stage 3 on
+    'stage_4_enemy_health': 1,  # Added from stage 4 on
+    'stage_4_attack_delay_cut': 30,  # Taken off enemy attack delays from stage 4 on...
+    'min_attack_delay': 60,  # ...down to this
+    'stage_5_boss_chance': 0.3  # Chance a stage 5 enemy spawn is always a boss
+}
+
+def shrink(value, step, floor):
+    """Reduce a spawn delay by ``step`` if it is still above ``floor``"""
+    return value - step if value > floor else value
+
+# Snapshots
+# Simulation.snapshot() packs the whole world into one bytes object: a header
+# of counters, the events, the player, the spawn random stream and the particle
+# generator, one fixed-size record per enemy and powerup, and then the live
+# rows of every projectile and particle column copied straight from NumPy.
+SIM_EVENTS = ('level_up', 'dash', 'hit', 'game_over', 'collect')
+DEATH_CAUSES = PROJECTILE_TYPES + ENEMY_TYPES
+SNAPSHOT_HEADER = struct.Struct('<Qq?13qbBHHIIHH')
+SNAPSHOT_COUNTERS = ('score', 'spawn_timer', 'spawn_delay', 'powerup_timer', 'powerup_delay', 'enemy_timer',
+                     'enemy_delay', 'level', 'stage', 'experience', 'powerups_collected', 'damage_taken', 'dash_count')
+SNAPSHOT_PLAYER_FIELDS = (
+    ('speed', 'q'), ('animation_frame', 'd'), ('shield_active', '?'), ('shield_timer', 'q'),
+    ('speed_boost', '?'), ('speed_timer', 'q'), ('slow_time', '?'), ('slow_timer', 'q'),
+    ('multi_shot', '?'), ('multi_shot_timer', 'q'), ('health', 'q'), ('max_health', 'q'),
+    ('invincible', '?'), ('invincible_timer', 'q'), ('invincible_flash', 'q'), ('dash_cooldown', 'q'),
+    ('dash_timer', 'q'), ('is_dashing', '?'), ('special_attack_cooldown', 'q'), ('special_attack_timer', 'q'),
+    ('is_using_special', '?'), ('dash_count', 'q')
+)
+SNAPSHOT_PLAYER_NAMES = tuple(name for name, _ in SNAPSHOT_PLAYER_FIELDS)
+SNAPSHOT_PLAYER = struct.Struct('<4i' + ''.join(code for _, code in SNAPSHOT_PLAYER_FIELDS))
+SNAPSHOT_ENEMY = struct.Struct('<4iBddqqq3B')  # rect, type, speed, animation, health, attack timer and delay, color
+SNAPSHOT_POWERUP = struct.Struct('<4iBdq')  # rect, type, animation, rotation
+SNAPSHOT_RANDOM = struct.Struct('<625I?d')  # Mersenne Twister state and index, cached gauss value
+SNAPSHOT_PCG64 = struct.Struct('<16s16s?I')  # state, increment, buffered 32-bit half
+
+def pack_random(rng):
+    _, state, gauss = rng.getstate()
+    return SNAPSHOT_RANDOM.pack(*state, gauss is not None, gauss or 0.0)
+
+def unpack_random(rng, data, offset):
+    values = SNAPSHOT_RANDOM.unpack_from(data, offset)
+    rng.setstate((3, values[:625], values[626] if values[625] else None))
+    return offset + SNAPSHOT_RANDOM.size
+
+def pack_pcg64(generator):
+    state = generator.bit_generator.state
+    return SNAPSHOT_PCG64.pack(state['state']['state'].to_bytes(16, 'little'), state['state']['inc'].to_bytes(16, 'little'),
+                               bool(state['has_uint32']), state['uinteger'])
+
+def unpack_pcg64(generator, data, offset):
+    state, inc, has_uint32, uinteger = SNAPSHOT_PCG64.unpack_from(data, offset)
+    generator.bit_generator.state = {
+        'bit_generator': 'PCG64',
+        'state': {'state': int.from_bytes(state, 'little'), 'inc': int.from_bytes(inc, 'little')},
+        'has_uint32': int(has_uint32),
+        'uinteger': uinteger
+    }
+    return offset + SNAPSHOT_PCG64.size
+
+def pack_columns(pool, parts):
+    """Append a ProjectilePool's or ParticleSystem's palette and live rows to ``parts``"""
+    parts.append(bytes(itertools.chain.from_iterable(pool.palette)))
+    for column in pool.columns():
+        parts.append(column[:pool.count].tobytes())
+
+def unpack_columns(pool, count, palette_size, data, offset):
+    """Load a pool written by pack_columns; returns the offset after it"""
+    palette = bytes(data[offset:offset + 3 * palette_size])
+    offset += 3 * palette_size
+    if bytes(itertools.chain.from_iterable(pool.palette)) != palette:
+        pool.palette = [tuple(palette[i:i + 3]) for i in range(0, len(palette), 3)]
+        pool.palette_index = {color: i for i, color in enumerate(pool.palette)}
+    pool.count = count
+    if not count:
+        return offset
+    for column in pool.columns():
+        if column.ndim == 1:
+            column[:count] = np.frombuffer(data, column.dtype, count, offset)
+            offset += count * column.itemsize
+        else:
+            size = count * column[0].size
+            column[:count] = np.frombuffer(data, column.dtype, size, offset).reshape((count,) + column.shape[1:])
+            offset += size * column.itemsize
+    return offset
+
+def copy_columns(source, target):
+    """Copy a ProjectilePool's or ParticleSystem's palette and live rows into another of the same capacity"""
+    if target.palette != source.palette:
+        target.palette = list(source.palette)
+        target.palette_index = dict(source.palette_index)
+    count = target.count = source.count
+    if count:
+        for source_column, target_column in zip(source.columns(), target.columns()):
+            target_column[:count] = source_column[:count]
+
+def copy_entity(entity):
+    """Copy of an Enemy or PowerUp with its own rect"""
+    clone = entity.__class__.__new__(entity.__class__)
+    clone.__dict__.update(entity.__dict__)
+    clone.rect = entity.rect.copy()
+    return clone
+
+def pack_enemy(enemy):
+    return SNAPSHOT_ENEMY.pack(*enemy.rect, ENEMY_TYPES.index(enemy.type), enemy.speed, enemy.animation,
+                               enemy.health, enemy.attack_timer, enemy.attack_delay, *enemy.color)
+
+def unpack_enemy(values):
+    x, y, width, height, kind, speed, animation, health, attack_timer, attack_delay, *color = values
+    enemy = Enemy.__new__(Enemy)
+    enemy.__dict__.update(rect=pygame.Rect(x, y, width, height), type=ENEMY_TYPES[kind], speed=speed, health=health,
+                          animation=animation, attack_timer=attack_timer, attack_delay=attack_delay, color=tuple(color))
+    return enemy
+
+def pack_powerup(powerup):
+    return SNAPSHOT_POWERUP.pack(*powerup.rect, POWERUP_TYPES.index(powerup.type), powerup.animation, powerup.rotation)
+
+def unpack_powerup(values):
+    x, y, width, height, kind, animation, rotation = values
+    powerup = PowerUp.__new__(PowerUp)
+    powerup.__dict__.update(rect=pygame.Rect(x, y, width, height), type=POWERUP_TYPES[kind],
+                            animation=animation, rotation=rotation)
+    return powerup
+
+class Simulation:
+    """Game world state and rules, independent of display, fonts and audio.
+    
+    ``step`` advances the world by one frame for a bitmask of INPUT_* flags and
+    lists what happened in ``events`` (sound cue names) so a front end can
+    react. With no front end attached it runs as fast as Python allows.
+    
+    Every run is seeded: spawning and particles each draw from their own
+    stream, and time is counted in frames, so the same seed and inputs
+    always reproduce the same game.
+    
+    ``balance`` overrides entries of BALANCE for this simulation, and
+    ``projectiles`` supplies the ProjectilePool, such as one of a
+    ProjectileBatch's.
+    """
+    def __init__(self, seed=None, effects=True, balance=None, projectiles=None):
+        unknown = set(balance or ()) - set(BALANCE)
+        if unknown:
+            raise ValueError(f"unknown balance settings: {', '.join(sorted(unknown))}")
+        self.balance = {**BALANCE, **(balance or {})}
+        self.effects = effects  # Spawn cosmetic particles
+        self.particles = ParticleSystem(PARTICLE_CAPACITY)
+        self.projectiles = projectiles if projectiles is not None else ProjectilePool()
+        self.powerup_delay = 300  # frames between powerup spawns
+        self.enemy_grid = SpatialHash()
+        self.powerup_grid = SpatialHash()
+        self.profiler = FrameProfiler()
+        self.reset_game(seed)
+    
+    def reset_game(self, seed=None):
+        """Start a new run; a fresh seed is picked unless one is given"""
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.spawn_rng = rng_stream(self.seed, 'spawn')
+        self.particles.rng = np.random.default_rng(rng_stream(self.seed, 'particles').getrandbits(64))
+        self.frame = 0
         self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100)
-        self.projectiles = []
+        self.projectiles.clear()
         self.score = 0
         self.game_over = False
         self.spawn_timer = 0
-        self.spawn_delay = 60  # frames between spawns
-        self.particles = []
+        self.spawn_delay = self.balance['spawn_delay']  # frames between spawns
+        self.particles.clear()
         self.powerups = []
         self.powerup_timer = 0
         self.enemies = []
         self.enemy_timer = 0
+        self.enemy_delay = self.balance['enemy_delay']  # frames between enemy spawns
         self.level = 1
+        self.stage = 1  # Different visual themes per stage
         self.experience = 0
         self.powerups_collected = 0
         self.damage_taken = 0
         self.dash_count = 0
-        self.start_time = time.time()
-        self.background_offset = 0
+        self.death_cause = None  # Projectile or enemy type that landed the final hit
+        self.events = []
     
     def spawn_projectile(self):
-        direction = random.choice(['down', 'left', 'right'])
+        direction = self.spawn_rng.choice(['down', 'left', 'right'])
         
         # More projectile types at higher levels and stages
         if self.stage >= 4:
@@ -817,37 +1558,37 @@ class Game:
         else:
             projectile_types = ['kunai', 'fireball', 'shuriken']
         
-        projectile_type = random.choice(projectile_types)
+        projectile_type = self.spawn_rng.choice(projectile_types)
         
         # Assign colors based on projectile type
         if projectile_type == 'kunai':
-            color = random.choice([RED, BLUE, DARK_GRAY])
+            color = self.spawn_rng.choice([RED, BLUE, DARK_GRAY])
         elif projectile_type == 'fireball':
-            color = random.choice([RED, ORANGE, YELLOW])
+            color = self.spawn_rng.choice([RED, ORANGE, YELLOW])
         elif projectile_type == 'shuriken':
-            color = random.choice([PURPLE, CYAN, DARK_GREEN])
+            color = self.spawn_rng.choice([PURPLE, CYAN, DARK_GREEN])
         elif projectile_type == 'lightning':
-            color = random.choice([YELLOW, WHITE, LIGHT_YELLOW])
+            color = self.spawn_rng.choice([YELLOW, WHITE, LIGHT_YELLOW])
         elif projectile_type == 'ice_shard':
-            color = random.choice([CYAN, LIGHT_BLUE, WHITE])
+            color = self.spawn_rng.choice([CYAN, LIGHT_BLUE, WHITE])
         elif projectile_type == 'wind_blade':
-            color = random.choice([LIGHT_GREEN, WHITE, LIGHT_GRAY])
+            color = self.spawn_rng.choice([LIGHT_GREEN, WHITE, LIGHT_GRAY])
         
         # Speed increases with level and stage
-        base_speed = 3 + self.level + (self.stage - 1)
-        speed = random.randint(base_speed, base_speed + 3)
+        base_speed = self.balance['projectile_base_speed'] + self.level + (self.stage - 1)
+        speed = self.spawn_rng.randint(base_speed, base_speed + self.balance['projectile_speed_spread'])
         
         if direction == 'down':
-            x = random.randint(0, SCREEN_WIDTH - 25)
+            x = self.spawn_rng.randint(0, SCREEN_WIDTH - 25)
             y = -25
         elif direction == 'left':
             x = SCREEN_WIDTH
-            y = random.randint(0, SCREEN_HEIGHT - 25)
+            y = self.spawn_rng.randint(0, SCREEN_HEIGHT - 25)
         else:  # right
             x = -25
-            y = random.randint(0, SCREEN_HEIGHT - 25)
+            y = self.spawn_rng.randint(0, SCREEN_HEIGHT - 25)
         
-        self.projectiles.append(Projectile(x, y, direction, speed, color, projectile_type))
+        self.projectiles.spawn(x, y, direction, speed, color, projectile_type)
     
     def spawn_enemy(self):
         """Spawn enemies based on level and stage"""
@@ -863,31 +1604,32 @@ class Game:
                 enemy_types.append('boss')
             
             # Stage 5 gets special boss spawns
-            if self.stage >= 5 and random.random() < 0.3:
+            if self.stage >= 5 and self.spawn_rng.random() < self.balance['stage_5_boss_chance']:
                 enemy_types = ['boss']
             
-            enemy_type = random.choice(enemy_types)
+            enemy_type = self.spawn_rng.choice(enemy_types)
             
             # Spawn from edges
-            side = random.choice(['top', 'left', 'right'])
+            side = self.spawn_rng.choice(['top', 'left', 'right'])
             if side == 'top':
-                x = random.randint(0, SCREEN_WIDTH - 40)
+                x = self.spawn_rng.randint(0, SCREEN_WIDTH - 40)
                 y = -40
             elif side == 'left':
                 x = -40
-                y = random.randint(0, SCREEN_HEIGHT - 40)
+                y = self.spawn_rng.randint(0, SCREEN_HEIGHT - 40)
             else:  # right
                 x = SCREEN_WIDTH
-                y = random.randint(0, SCREEN_HEIGHT - 40)
+                y = self.spawn_rng.randint(0, SCREEN_HEIGHT - 40)
             
             enemy = Enemy(x, y, enemy_type)
             
             # Stage-specific enemy buffs
+            balance = self.balance
             if self.stage >= 3:
-                enemy.speed += 1
+                enemy.speed += balance['stage_3_enemy_speed']
             if self.stage >= 4:
-                enemy.health += 1
-                enemy.attack_delay = max(60, enemy.attack_delay - 30)
+                enemy.health += balance['stage_4_enemy_health']
+                enemy.attack_delay = max(balance['min_attack_delay'], enemy.attack_delay - balance['stage_4_attack_delay_cut'])
             
             self.enemies.append(enemy)
     
@@ -902,60 +1644,58 @@ class Game:
         else:
             powerup_types = ['speed', 'shield', 'slow_time']
         
-        powerup_type = random.choice(powerup_types)
-        x = random.randint(60, SCREEN_WIDTH - 60)
-        y = random.randint(60, SCREEN_HEIGHT - 60)
+        powerup_type = self.spawn_rng.choice(powerup_types)
+        x = self.spawn_rng.randint(60, SCREEN_WIDTH - 60)
+        y = self.spawn_rng.randint(60, SCREEN_HEIGHT - 60)
         self.powerups.append(PowerUp(x, y, powerup_type))
     
     def create_particles(self, x, y, color, count=5, particle_type="circle", size=3):
-        for _ in range(count):
-            vx = random.randint(-8, 8)
-            vy = random.randint(-8, 8)
-            life = random.randint(20, 40)
-            self.particles.append(Particle(x, y, color, (vx, vy), life, particle_type, size))
+        if not self.effects:
+            return
+        rng = self.particles.rng
+        vx = rng.integers(-8, 9, count)
+        vy = rng.integers(-8, 9, count)
+        life = rng.integers(20, 41, count)
+        self.particles.emit(x, y, vx, vy, life, PARTICLE_TYPES[particle_type], color, size)
     
     def create_explosion(self, x, y, color, count=15):
         """Create a large explosion effect"""
-        for _ in range(count):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(2, 8)
-            vx = speed * math.cos(angle)
-            vy = speed * math.sin(angle)
-            life = random.randint(30, 60)
-            particle_type = random.choice(["circle", "spark", "star"])
-            self.particles.append(Particle(x, y, color, (vx, vy), life, particle_type, 4))
+        if not self.effects:
+            return
+        rng = self.particles.rng
+        angle = rng.uniform(0, 2 * math.pi, count)
+        speed = rng.uniform(2, 8, count)
+        life = rng.integers(30, 61, count)
+        particle_types = rng.integers(0, len(PARTICLE_TYPES), count)
+        self.particles.emit(x, y, speed * np.cos(angle), speed * np.sin(angle), life,
+                            particle_types, color, 4)
     
     def create_trail(self, x, y, color, count=3):
         """Create a trail effect"""
-        for _ in range(count):
-            vx = random.randint(-3, 3)
-            vy = random.randint(-3, 3)
-            life = random.randint(10, 20)
-            self.particles.append(Particle(x, y, color, (vx, vy), life, "spark", 2))
-    
-    def update(self):
-        # Update splash screen
-        if self.state == SPLASH:
-            self.splash_timer += 1
-            self.background_offset += 0.5
-            if self.splash_timer >= 180:  # 3 seconds at 60 FPS
-                self.state = MENU
-            return
-        
-        if self.state != PLAYING:
+        if not self.effects:
             return
+        rng = self.particles.rng
+        vx = rng.integers(-3, 4, count)
+        vy = rng.integers(-3, 4, count)
+        life = rng.integers(10, 21, count)
+        self.particles.emit(x, y, vx, vy, life, PARTICLE_SPARK, color, 2)
+    
+    def step(self, inputs=0):
+        """Advance the world by one frame for a set of INPUT_* flags"""
+        self.begin_step(inputs)
         
-        # Update performance tracking
-        self.frame_count += 1
-        self.fps_timer += 1
-        if self.fps_timer >= 60:  # Update FPS every second
-            self.current_fps = self.fps_counter
-            self.fps_counter = 0
-            self.fps_timer = 0
-        self.fps_counter += 1
+        # Update projectiles with slow time effect
+        projectiles = self.projectiles
+        projectiles.update(self.player.slow_time)
         
-        # Update background offset for scrolling effect
-        self.background_offset += 0.5
+        # Remove projectiles that are off-screen
+        projectiles.cull()
+        self.finish_step(projectiles.overlapping(self.player.rect))
+    
+    def begin_step(self, inputs):
+        """First part of step(): level progression, spawning and the player's move"""
+        self.events = []
+        self.frame += 1
         
         # Level progression
         new_level = (self.score // 1000) + 1
@@ -963,7 +1703,7 @@ class Game:
             self.level = new_level
             self.stage = ((self.level - 1) // 3) + 1  # New stage every 3 levels
             self.create_explosion(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, GOLD, 20)
-            sound_manager.play_sound('level_up')
+            self.events.append('level_up')
             
             # Level up effects
             for i in range(10):
@@ -978,10 +1718,11 @@ class Game:
             self.spawn_projectile()
             self.spawn_timer = 0
             # Increase difficulty over time and with stages
-            if self.spawn_delay > 15:
-                self.spawn_delay -= 1
-            if self.stage >= 3 and self.spawn_delay > 10:
-                self.spawn_delay -= 1
+            balance = self.balance
+            self.spawn_delay = shrink(self.spawn_delay, balance['spawn_delay_step'], balance['spawn_delay_floor'])
+            if self.stage >= 3:
+                self.spawn_delay = shrink(self.spawn_delay, balance['late_spawn_delay_step'],
+                                          balance['late_spawn_delay_floor'])
         
         # Spawn powerups
         self.powerup_timer += 1
@@ -995,126 +1736,124 @@ class Game:
             self.spawn_enemy()
             self.enemy_timer = 0
             # Increase enemy spawn rate over time and with stages
-            if self.enemy_delay > 60:
-                self.enemy_delay -= 2
-            if self.stage >= 3 and self.enemy_delay > 30:
-                self.enemy_delay -= 1
+            balance = self.balance
+            self.enemy_delay = shrink(self.enemy_delay, balance['enemy_delay_step'], balance['enemy_delay_floor'])
+            if self.stage >= 3:
+                self.enemy_delay = shrink(self.enemy_delay, balance['late_enemy_delay_step'],
+                                          balance['late_enemy_delay_floor'])
+        self.profiler.mark('update/spawn')
         
         # Update player
-        keys = pygame.key.get_pressed()
-        self.player.move(keys)
+        dash_count = self.player.dash_count
+        self.player.move(inputs)
         self.player.update_powerups()
-        
-        # Update projectiles with slow time effect
-        speed_multiplier = 0.5 if self.player.slow_time else 1.0
-        for projectile in self.projectiles[:]:
-            projectile.update()
-            
-            # Apply slow time effect
-            if self.player.slow_time:
-                projectile.speed = max(1, projectile.speed * 0.5)
-            
-            # Remove projectiles that are off-screen
-            if (projectile.rect.y > SCREEN_HEIGHT or 
-                projectile.rect.x > SCREEN_WIDTH or 
-                projectile.rect.x < -20):
-                self.projectiles.remove(projectile)
-            
-            # Check collision with player
-            if self.player.rect.colliderect(projectile.rect):
+        self.player.animation_frame += 0.2  # Per tick, so how often frames are drawn cannot change it
+        if self.player.dash_count != dash_count:
+            self.events.append('dash')
+        self.profiler.mark('update/player')
+    
+    def finish_step(self, hits):
+        """Rest of step() once projectiles have moved; ``hits`` are the ones overlapping the player"""
+        # Check collision with player
+        projectiles = self.projectiles
+        player_rect = self.player.rect
+        if len(hits):
+            centers = zip((projectiles.x[hits] + PROJECTILE_SIZE // 2).astype(int).tolist(),
+                          (projectiles.y[hits] + PROJECTILE_SIZE // 2).astype(int).tolist(),
+                          projectiles.type[hits].tolist())
+            for center_x, center_y, projectile_type in centers:
                 if self.player.shield_active:
                     # Shield absorbs the hit
-                    self.create_explosion(projectile.rect.centerx, projectile.rect.centery, BLUE, 10)
-                    self.projectiles.remove(projectile)
+                    self.create_explosion(center_x, center_y, BLUE, 10)
                 elif self.player.invincible:
                     # Invincible - no damage
-                    self.create_particles(projectile.rect.centerx, projectile.rect.centery, GOLD, 5)
-                    self.projectiles.remove(projectile)
+                    self.create_particles(center_x, center_y, GOLD, 5)
                 else:
                     # Take damage
-                    self.player.health -= 1
-                    self.damage_taken += 1
-                    self.create_explosion(projectile.rect.centerx, projectile.rect.centery, RED, 12)
-                    sound_manager.play_sound('hit')
-                    self.projectiles.remove(projectile)
-                    
-                    if self.player.health <= 0:
-                        self.game_over = True
-                        self.state = GAME_OVER
-                        sound_manager.play_sound('game_over')
-                        if self.score > self.high_score:
-                            self.high_score = self.score
-                            self.save_high_score()
-                        self.check_achievements()
+                    self.damage_player(center_x, center_y, PROJECTILE_TYPES[projectile_type])
+            projectiles.remove(hits)
+        self.profiler.mark('update/projectiles')
         
         # Update enemies
-        for enemy in self.enemies[:]:
+        for enemy in self.enemies:
             enemy.update(self.player.rect.center)
-            
-            # Check special attack damage to enemies
-            if self.player.is_using_special:
-                distance = math.sqrt((enemy.rect.centerx - self.player.rect.centerx)**2 + 
-                                   (enemy.rect.centery - self.player.rect.centery)**2)
-                if distance < 50:  # Special attack range
+        self.enemy_grid.build(self.enemies)
+        defeated = set()
+        
+        # Check special attack damage to enemies
+        if self.player.is_using_special:
+            px, py = player_rect.center
+            for i in self.enemy_grid.query_radius(px, py, SPECIAL_ATTACK_RANGE):
+                enemy = self.enemies[i]
+                dx = enemy.rect.centerx - px
+                dy = enemy.rect.centery - py
+                if dx * dx + dy * dy < SPECIAL_ATTACK_RANGE * SPECIAL_ATTACK_RANGE:
                     enemy.health -= 1
                     self.create_explosion(enemy.rect.centerx, enemy.rect.centery, GOLD, 15)
                     if enemy.health <= 0:
-                        self.enemies.remove(enemy)
+                        defeated.add(i)
                         self.score += 100  # Bonus points for defeating enemies
-            
-            # Check if enemy attacks
-            if enemy.can_attack() and self.player.rect.colliderect(enemy.rect):
-                if self.player.shield_active:
-                    # Shield blocks enemy attack
-                    self.create_explosion(enemy.rect.centerx, enemy.rect.centery, BLUE, 10)
-                    enemy.health -= 1
-                    if enemy.health <= 0:
-                        self.enemies.remove(enemy)
-                elif self.player.invincible:
-                    # Invincible - no damage
-                    self.create_particles(enemy.rect.centerx, enemy.rect.centery, GOLD, 5)
-                else:
-                    # Take damage from enemy
-                    self.player.health -= 1
-                    self.damage_taken += 1
-                    self.create_explosion(enemy.rect.centerx, enemy.rect.centery, RED, 12)
-                    sound_manager.play_sound('hit')
-                    
-                    if self.player.health <= 0:
-                        self.game_over = True
-                        self.state = GAME_OVER
-                        sound_manager.play_sound('game_over')
-                        if self.score > self.high_score:
-                            self.high_score = self.score
-                            self.save_high_score()
-                        self.check_achievements()
-            
-            # Remove enemies that are off-screen
-            if (enemy.rect.y > SCREEN_HEIGHT + 50 or 
-                enemy.rect.x > SCREEN_WIDTH + 50 or 
-                enemy.rect.x < -50):
-                self.enemies.remove(enemy)
+        
+        # Check if enemies attack
+        for i in self.enemy_grid.query(player_rect):
+            enemy = self.enemies[i]
+            if i in defeated or not (enemy.can_attack() and player_rect.colliderect(enemy.rect)):
+                continue
+            if self.player.shield_active:
+                # Shield blocks enemy attack
+                self.create_explosion(enemy.rect.centerx, enemy.rect.centery, BLUE, 10)
+                enemy.health -= 1
+                if enemy.health <= 0:
+                    defeated.add(i)
+            elif self.player.invincible:
+                # Invincible - no damage
+                self.create_particles(enemy.rect.centerx, enemy.rect.centery, GOLD, 5)
+            else:
+                # Take damage from enemy
+                self.damage_player(enemy.rect.centerx, enemy.rect.centery, enemy.type)
+        
+        # Remove defeated enemies and enemies that are off-screen
+        self.enemies = [enemy for i, enemy in enumerate(self.enemies)
+                        if i not in defeated and not (enemy.rect.y > SCREEN_HEIGHT + 50 or
+                                                      enemy.rect.x > SCREEN_WIDTH + 50 or
+                                                      enemy.rect.x < -50)]
+        self.profiler.mark('update/enemies')
         
         # Update powerups
-        for powerup in self.powerups[:]:
+        for powerup in self.powerups:
             powerup.update()
-            if self.player.rect.colliderect(powerup.rect):
-                self.collect_powerup(powerup)
-                self.powerups.remove(powerup)
+        self.powerup_grid.build(self.powerups)
+        collected = [self.powerups[i] for i in self.powerup_grid.query(player_rect)
+                     if player_rect.colliderect(self.powerups[i].rect)]
+        for powerup in collected:
+            self.collect_powerup(powerup)
+        if collected:
+            self.powerups = [powerup for powerup in self.powerups if powerup not in collected]
+        self.profiler.mark('update/powerups')
         
         # Update particles
-        for particle in self.particles[:]:
-            particle.update()
-            if particle.life <= 0:
-                self.particles.remove(particle)
+        self.particles.update()
+        self.profiler.mark('update/particles')
         
         # Update score
         self.score += 1
     
+    def damage_player(self, x, y, cause):
+        """Take one hit at (x, y) from ``cause`` (a projectile or enemy type), ending the game when health runs out"""
+        self.player.health -= 1
+        self.damage_taken += 1
+        self.create_explosion(x, y, RED, 12)
+        self.events.append('hit')
+        
+        if self.player.health <= 0 and not self.game_over:
+            self.game_over = True
+            self.death_cause = cause
+            self.events.append('game_over')
+    
     def collect_powerup(self, powerup):
         self.create_explosion(powerup.rect.centerx, powerup.rect.centery, GOLD, 15)
         self.powerups_collected += 1
-        sound_manager.play_sound('collect')
+        self.events.append('collect')
         
         if powerup.type == 'speed':
             self.player.speed_boost = True
@@ -1135,8 +1874,1123 @@ class Game:
             self.player.invincible = True
             self.player.invincible_timer = 300  # 5 seconds at 60 FPS
     
+    def snapshot(self):
+        """Pack the whole world, random streams included, into bytes for restore().
+        
+        Presentation state (particles aside) and the balance settings are not
+        included; restoring into another Simulation gives it this world with
+        its own settings, which is how lookahead searches fork a game.
+        """
+        player = self.player
+        pool = self.projectiles
+        particles = self.particles
+        parts = [
+            SNAPSHOT_HEADER.pack(self.seed, self.frame, self.game_over,
+                                 *[getattr(self, name) for name in SNAPSHOT_COUNTERS],
+                                 DEATH_CAUSES.index(self.death_cause) if self.death_cause else -1,
+                                 len(self.events), len(self.enemies), len(self.powerups), pool.count, particles.count,
+                                 len(pool.palette), len(particles.palette)),
+            bytes(SIM_EVENTS.index(event) for event in self.events),
+            SNAPSHOT_PLAYER.pack(*player.rect, *[getattr(player, name) for name in SNAPSHOT_PLAYER_NAMES]),
+            pack_random(self.spawn_rng),
+            pack_pcg64(particles.rng)
+        ]
+        parts += [pack_enemy(enemy) for enemy in self.enemies]
+        parts += [pack_powerup(powerup) for powerup in self.powerups]
+        pack_columns(pool, parts)
+        pack_columns(particles, parts)
+        return b''.join(parts)
+    
+    def restore(self, snapshot):
+        """Return the world to a state captured by snapshot(), here or in another Simulation"""
+        header = SNAPSHOT_HEADER.unpack_from(snapshot)
+        self.seed, self.frame, self.game_over = header[:3]
+        counters = len(SNAPSHOT_COUNTERS)
+        for name, value in zip(SNAPSHOT_COUNTERS, header[3:3 + counters]):
+            setattr(self, name, value)
+        cause, events, enemies, powerups, projectiles, particles, projectile_colors, particle_colors = header[3 + counters:]
+        self.death_cause = DEATH_CAUSES[cause] if cause >= 0 else None
+        offset = SNAPSHOT_HEADER.size
+        self.events = [SIM_EVENTS[event] for event in snapshot[offset:offset + events]]
+        offset += events
+        
+        player = self.player
+        values = SNAPSHOT_PLAYER.unpack_from(snapshot, offset)
+        player.rect.update(values[:4])
+        player.__dict__.update(zip(SNAPSHOT_PLAYER_NAMES, values[4:]))
+        offset += SNAPSHOT_PLAYER.size
+        offset = unpack_random(self.spawn_rng, snapshot, offset)
+        offset = unpack_pcg64(self.particles.rng, snapshot, offset)
+        
+        end = offset + enemies * SNAPSHOT_ENEMY.size
+        self.enemies = [unpack_enemy(values) for values in SNAPSHOT_ENEMY.iter_unpack(snapshot[offset:end])]
+        offset = end
+        end = offset + powerups * SNAPSHOT_POWERUP.size
+        self.powerups = [unpack_powerup(values) for values in SNAPSHOT_POWERUP.iter_unpack(snapshot[offset:end])]
+        offset = unpack_columns(self.projectiles, projectiles, projectile_colors, snapshot, end)
+        unpack_columns(self.particles, particles, particle_colors, snapshot, offset)
+    
+    def fork(self, into=None):
+        """Copy this world into ``into``, or a new Simulation, and return the copy; the two share nothing.
+        
+        The world is the one ``into.restore(self.snapshot())`` would give, and
+        ``into`` also takes this Simulation's balance and effects setting. The
+        state is copied directly instead of being packed into bytes, and an
+        ``into`` kept between forks reuses its pools instead of allocating.
+        """
+        if into is None:
+            into = Simulation(self.seed, self.effects, self.balance)
+        elif into.balance != self.balance:
+            into.balance = dict(self.balance)
+        into.effects = self.effects
+        into.seed, into.frame, into.game_over, into.death_cause = self.seed, self.frame, self.game_over, self.death_cause
+        for name in SNAPSHOT_COUNTERS:
+            setattr(into, name, getattr(self, name))
+        into.events = list(self.events)
+        
+        player = into.player
+        player.rect.update(self.player.rect)
+        for name in SNAPSHOT_PLAYER_NAMES:
+            setattr(player, name, getattr(self.player, name))
+        into.spawn_rng.setstate(self.spawn_rng.getstate())
+        into.particles.rng.bit_generator.state = self.particles.rng.bit_generator.state
+        
+        into.enemies = [copy_entity(enemy) for enemy in self.enemies]
+        into.powerups = [copy_entity(powerup) for powerup in self.powerups]
+        copy_columns(self.projectiles, into.projectiles)
+        copy_columns(self.particles, into.particles)
+        return into
+    
+    def skip_to_stage(self, stage):
+        """Credit a fresh run the score that reaches ``stage``; the level and stage follow on the next step.
+        
+        Projectile and enemy types and speeds follow the stage, but spawn rates
+        start where a new run's do.
+        """
+        self.score = max(self.score, (stage - 1) * 3 * 1000)  # Three levels of 1000 points per stage
+    
+    def advance(self, frames, policy=None):
+        """Step until game over or ``frames`` frames have passed.
+        
+        ``policy`` is called with the simulation before every frame and returns
+        the INPUT_* flags to apply; without one the player stands still.
+        Returns the number of frames simulated.
+        """
+        for frame in range(frames):
+            if self.game_over:
+                return frame
+            self.step(policy(self) if policy else 0)
+        return frames
+
+# Autopilot
+# Autopilot plays by beam search over forked worlds. Spawns are seeded, so a
+# fork sees exactly the projectiles and enemies the real game will throw; each
+# plan is a sequence of moves held for AUTOPILOT_HOLD frames, scored by
+# simulating it. The search runs a few milliseconds per frame and keeps its
+# tree between frames, so planning carries on while a move is being held.
+AUTOPILOT_BUDGET = 0.004  # Seconds of search per frame
+AUTOPILOT_HOLD = 12  # Frames each planned move is held
+AUTOPILOT_DEPTH = 6  # Moves planned ahead
+AUTOPILOT_BEAM = 3  # Plans kept at each depth
+AUTOPILOT_MOVES = (
+    0, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN,
+    INPUT_LEFT | INPUT_UP, INPUT_RIGHT | INPUT_UP, INPUT_LEFT | INPUT_DOWN, INPUT_RIGHT | INPUT_DOWN,
+    INPUT_LEFT | INPUT_DASH, INPUT_RIGHT | INPUT_DASH, INPUT_SPECIAL
+)
+AUTOPILOT_DEATH = -10 ** 9  # Value of a plan that dies, plus the frame it dies on
+AUTOPILOT_HEALTH = 1000  # Value of each health point left at the end of a plan
+AUTOPILOT_POWERUP = 50  # Value of each powerup collected
+AUTOPILOT_DANGER = 120  # Pixels around the player where projectiles count against a plan
+AUTOPILOT_CROWDING = 20  # Cost of each projectile that close
+AUTOPILOT_CHASE = 250  # Pixels around the player where enemies count against a plan
+AUTOPILOT_CHASED = 300  # Cost of an enemy on top of the player, falling off to nothing at AUTOPILOT_CHASE
+AUTOPILOT_EDGE = 150  # Pixels from a screen edge where the player starts to get cornered
+AUTOPILOT_CORNERED = 2  # Cost per pixel of that margin used up, on each axis
+
+def world_key(sim):
+    """Cheap fingerprint telling whether ``sim`` is the world a plan was made for"""
+    player = sim.player
+    return (sim.seed, sim.frame, sim.score, sim.game_over, player.rect.x, player.rect.y, player.health,
+            sim.projectiles.count, len(sim.enemies), len(sim.powerups))
+
+class Autopilot:
+    """Policy that drives the player in place of the keyboard by searching ahead.
+    
+    Call it with the live simulation once per frame, like RandomPolicy or
+    read_input(), and it returns the INPUT_* flags to apply. The search
+    works on its own effects-free Simulation restored from snapshots, and
+    each call spends about ``budget`` seconds on it. Every AUTOPILOT_HOLD
+    frames the best plan's first move is committed; the plans that start
+    with it become the new tree, so earlier search is reused. A decision
+    needs one complete layer of plans, so the first frame after the tree is
+    rebuilt (for a new game, or a world that is not the one predicted) may
+    overrun the budget.
+    
+    ``expansions`` and ``simulated`` count the plan extensions and frames
+    the search has run, for measuring how hard it works the simulation.
+    """
+    def __init__(self, budget=AUTOPILOT_BUDGET, hold=AUTOPILOT_HOLD, depth=AUTOPILOT_DEPTH, width=AUTOPILOT_BEAM):
+        self.budget = budget
+        self.hold = hold
+        self.depth = depth
+        self.width = width
+        self.sim = None
+        self.expected = None  # world_key() of the world the tree's root stands for
+        self.move = 0  # Index into AUTOPILOT_MOVES of the move being held
+        self.held = 0  # Frames left to hold it
+        # Search tree: plans are (value, moves, world keys after each move, snapshot or None once dead)
+        self.beam = []  # Best plans of the deepest complete layer
+        self.layer = 0  # Moves in each plan of the beam
+        self.frontier = []  # Plans of the layer being built
+        self.queue = []  # (plan, move) extensions still to build it
+        self.cost = 0.0  # Running average seconds per extension, so the search does not start one it cannot finish
+        self.expansions = 0
+        self.simulated = 0
+        self.replans = 0
+    
+    def __call__(self, sim):
+        deadline = time.perf_counter() + self.budget
+        if not self.held:
+            if world_key(sim) != self.expected:
+                self.replan(sim)
+            self.decide()
+        self.held -= 1
+        self.search(deadline)
+        return AUTOPILOT_MOVES[self.move]
+    
+    def replan(self, sim):
+        """Make ``sim``'s current world the root of a new tree"""
+        if self.sim is None or self.sim.balance != sim.balance:
+            self.sim = Simulation(sim.seed, effects=False, balance=sim.balance)
+        self.sim.restore(sim.snapshot())
+        self.sim.particles.clear()
+        self.beam = [(0, (), (), self.sim.snapshot())]
+        self.layer = 0
+        self.frontier = []
+        self.queue = []
+        self.replans += 1
+    
+    def decide(self):
+        """Commit to the first move of the best plan and re-root the tree under it"""
+        if not self.layer:
+            self.search(math.inf, 1)
+        best = self.beam[0]
+        self.move = best[1][0]
+        self.expected = best[2][0]
+        self.held = self.hold
+        move = self.move
+        self.beam = [self.trim(plan) for plan in self.beam if plan[1][0] == move]
+        self.frontier = [self.trim(plan) for plan in self.frontier if plan[1][0] == move]
+        self.queue = [(self.trim(plan), extension) for plan, extension in self.queue if plan[1][0] == move]
+        self.layer -= 1
+    
+    @staticmethod
+    def trim(plan):
+        """The rest of ``plan`` once its first move has been made"""
+        value, moves, keys, snapshot = plan
+        return value, moves[1:], keys[1:], snapshot
+    
+    def search(self, deadline, layers=None):
+        """Extend plans until the deadline passes or ``layers`` layers (default: the full depth) are complete"""
+        layers = self.depth if layers is None else layers
+        while self.grow(layers):
+            started = time.perf_counter()
+            if started + self.cost > deadline:
+                break
+            plan, move = self.queue.pop()
+            self.frontier.append(self.expand(plan, move))
+            self.cost += (time.perf_counter() - started - self.cost) / 8
+    
+    def grow(self, layers):
+        """Make sure there is an extension to build; False once ``layers`` layers are complete"""
+        while True:
+            if not self.queue and self.frontier:  # The layer being built is complete
+                self.beam = self.select(self.frontier)
+                self.frontier = []
+                self.layer += 1
+            if self.layer >= layers:
+                return False
+            if self.queue:
+                return True
+            for plan in self.beam:
+                value, moves, keys, snapshot = plan
+                if snapshot is None:  # A plan that dies stays dead, with the same value, at every depth
+                    self.frontier.append((value, moves + (0,), keys + (None,), None))
+                else:
+                    self.queue += [(plan, move) for move in reversed(range(len(AUTOPILOT_MOVES)))]
+    
+    def select(self, plans):
+        """The ``width`` best plans, taking each parent's best extension before any parent's second best.
+        
+        Extensions of one plan mostly score alike, so a plain best-``width``
+        cut tends to fill the beam with near copies of a single plan.
+        """
+        ranks = collections.Counter()
+        ranked = []
+        for plan in sorted(plans, key=lambda plan: plan[0], reverse=True):
+            parent = plan[1][:-1]
+            ranked.append((ranks[parent], plan))
+            ranks[parent] += 1
+        ranked.sort(key=lambda item: item[0])  # Stable, so plans stay in value order within a rank
+        return [plan for _, plan in ranked[:self.width]]
+    
+    def expand(self, plan, move):
+        """Simulate ``plan`` followed by holding ``move`` and return the longer plan"""
+        value, moves, keys, snapshot = plan
+        sim = self.sim
+        sim.restore(snapshot)
+        inputs = AUTOPILOT_MOVES[move]
+        for _ in range(self.hold):
+            sim.step(inputs)
+            self.simulated += 1
+            if sim.game_over:
+                break
+        self.expansions += 1
+        return (self.evaluate(sim), moves + (move,), keys + (world_key(sim),),
+                None if sim.game_over else sim.snapshot())
+    
+    @staticmethod
+    def evaluate(sim):
+        """How good a world is to end a plan in: alive, healthy, high-scoring and with room to move"""
+        if sim.game_over:
+            return AUTOPILOT_DEATH + sim.frame
+        player = sim.player
+        px, py = player.rect.center
+        value = sim.score + AUTOPILOT_HEALTH * player.health + AUTOPILOT_POWERUP * sim.powerups_collected
+        pool = sim.projectiles
+        n = pool.count
+        if n:
+            distance = np.hypot(pool.x[:n] + PROJECTILE_SIZE / 2 - px, pool.y[:n] + PROJECTILE_SIZE / 2 - py)
+            value -= AUTOPILOT_CROWDING * int(np.count_nonzero(distance < AUTOPILOT_DANGER))
+        for enemy in sim.enemies:
+            ex, ey = enemy.rect.center
+            distance = math.hypot(ex - px, ey - py)
+            if distance < AUTOPILOT_CHASE:
+                value -= AUTOPILOT_CHASED * (1 - distance / AUTOPILOT_CHASE)
+        for margin in (min(px, SCREEN_WIDTH - px), min(py, SCREEN_HEIGHT - py)):
+            if margin < AUTOPILOT_EDGE:
+                value -= AUTOPILOT_CORNERED * (AUTOPILOT_EDGE - margin)
+        return value
+
+# Replays
+REPLAY_MAGIC = b'DLNR'
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct('<4sBQI')  # magic, version, seed, frame count
+REPLAY_FILE = 'last_replay.dlr'
+REPLAY_SNAPSHOT_INTERVAL = 10 * FPS  # frames between seek snapshots
+REPLAY_SPEEDS = (1, 2, 4, 8)
+
+class Replay:
+    """The seed and per-frame INPUT_* flags of one run.
+    
+    Stored as a small header followed by run-length encoded input runs
+    (one flag byte plus a varint run length), which keeps a minute of play
+    to a few KB.
+    """
+    def __init__(self, seed, inputs=b''):
+        self.seed = seed
+        self.inputs = bytearray(inputs)
+    
+    @property
+    def frames(self):
+        return len(self.inputs)
+    
+    def record(self, inputs):
+        self.inputs.append(inputs)
+    
+    def encode(self):
+        data = bytearray(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.frames))
+        for inputs, run in itertools.groupby(self.inputs):
+            length = sum(1 for _ in run)
+            data.append(inputs)
+            while length >= 0x80:
+                data.append(length & 0x7f | 0x80)
+                length >>= 7
+            data.append(length)
+        return bytes(data)
+    
+    @classmethod
+    def decode(cls, data):
+        """Parse encode()'s output; raises ValueError for anything else, including damaged files"""
+        if len(data) < REPLAY_HEADER.size:
+            raise ValueError("not a supported replay file")
+        magic, version, seed, frames = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("not a supported replay file")
+        inputs = bytearray()
+        pos = REPLAY_HEADER.size
+        while pos < len(data):
+            flags = data[pos]
+            pos += 1
+            length = shift = 0
+            while True:
+                if pos == len(data):
+                    raise ValueError("replay file is truncated")
+                byte = data[pos]
+                pos += 1
+                length |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            if len(inputs) + length > frames:
+                raise ValueError("replay file is corrupt")
+            inputs.extend(bytes([flags]) * length)
+        if len(inputs) != frames:
+            raise ValueError("replay file is truncated")
+        return cls(seed, inputs)
+    
+    def save(self, path=REPLAY_FILE):
+        with open(path, 'wb') as f:
+            f.write(self.encode())
+    
+    @classmethod
+    def load(cls, path=REPLAY_FILE):
+        with open(path, 'rb') as f:
+            return cls.decode(f.read())
+
+class ReplayPlayer:
+    """Plays a Replay back through a Simulation.
+    
+    ``speed`` is the number of simulation frames per ``update`` call: 0 pauses,
+    1 is real time and higher values fast-forward. Snapshots are kept every
+    REPLAY_SNAPSHOT_INTERVAL frames, so ``seek`` restarts from the nearest
+    one instead of re-simulating from the first frame.
+    """
+    def __init__(self, replay, sim=None):
+        self.replay = replay
+        self.sim = sim if sim is not None else Simulation(replay.seed)
+        self.sim.reset_game(replay.seed)
+        self.speed = 1
+        self.snapshots = {0: self.sim.snapshot()}
+    
+    @property
+    def frame(self):
+        return self.sim.frame
+    
+    @property
+    def finished(self):
+        return self.sim.frame >= self.replay.frames
+    
+    def step(self):
+        """Simulate one recorded frame; returns False at the end of the replay"""
+        if self.finished:
+            return False
+        frame = self.sim.frame
+        if frame % REPLAY_SNAPSHOT_INTERVAL == 0 and frame not in self.snapshots:
+            self.snapshots[frame] = self.sim.snapshot()
+        self.sim.step(self.replay.inputs[frame])
+        return True
+    
+    def update(self):
+        for _ in range(self.speed):
+            if not self.step():
+                break
+    
+    def seek(self, frame):
+        """Jump to ``frame``, restoring the closest snapshot at or before it"""
+        frame = max(0, min(frame, self.replay.frames))
+        base = max(snapshot for snapshot in self.snapshots if snapshot <= frame)
+        if frame < self.sim.frame or base > self.sim.frame:
+            self.sim.restore(self.snapshots[base])
+        while self.sim.frame < frame:
+            self.step()
+    
+    def toggle_pause(self):
+        self.speed = 0 if self.speed else 1
+    
+    def fast_forward(self):
+        """Cycle through the fast-forward speeds"""
+        if self.speed in REPLAY_SPEEDS:
+            self.speed = REPLAY_SPEEDS[(REPLAY_SPEEDS.index(self.speed) + 1) % len(REPLAY_SPEEDS)]
+        else:
+            self.speed = REPLAY_SPEEDS[1]
+
+# Background starfield
+STAR_TWINKLE_FRAMES = 64  # Precomputed brightness frames per twinkle cycle
+
+class StarLayer:
+    """One parallax layer of evenly spaced stars.
+    
+    Star ``i`` sits at ``i * spacing`` and the whole layer scrolls by
+    ``offset * speed`` with wraparound, so the pattern tiles the screen. Each
+    star's brightness follows ``shade(phase + i)``; star sprites for a cycle of
+    STAR_TWINKLE_FRAMES phases are prepared up front, leaving one vectorized
+    position update and one ``Surface.blits()`` call per frame.
+    """
+    def __init__(self, count, spacing, speed, twinkle, radius, shade, width=0):
+        index = np.arange(count)
+        self.base_x = index * spacing[0]
+        self.base_y = index * spacing[1]
+        self.speed = speed
+        self.twinkle = twinkle  # Phase advance per unit of offset
+        self.radius = radius
+        sprites = {}
+        self.frames = []
+        for frame in range(STAR_TWINKLE_FRAMES if twinkle else 1):
+            phase = 2 * math.pi * frame / STAR_TWINKLE_FRAMES
+            colors = shade(phase + index)
+            self.frames.append([self.sprite(sprites, tuple(color), width) for color in colors.tolist()])
+    
+    def sprite(self, sprites, color, width):
+        sprite = sprites.get(color)
+        if sprite is None:
+            size = 2 * self.radius + 1
+            sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (self.radius, self.radius), self.radius, width)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            sprites[color] = sprite
+        return sprite
+    
+    def place(self, offset):
+        """Sprite positions and twinkle frame at scroll ``offset``, as (xs, ys, frame)"""
+        x = ((self.base_x + offset * self.speed[0]) % SCREEN_WIDTH).astype(int) - self.radius
+        y = ((self.base_y + offset * self.speed[1]) % SCREEN_HEIGHT).astype(int) - self.radius
+        frame = int(offset * self.twinkle % (2 * math.pi) * STAR_TWINKLE_FRAMES / (2 * math.pi))
+        return x.tolist(), y.tolist(), frame % len(self.frames)
+    
+    def draw(self, screen, offset, placement=None):
+        """Blit the layer, optionally at a ``placement`` from ``place``"""
+        x, y, frame = placement or self.place(offset)
+        screen.blits(zip(self.frames[frame], zip(x, y)), doreturn=False)
+    
+    def rects(self, placement):
+        """On-screen rects covered by the sprites at ``placement``"""
+        size = 2 * self.radius + 1
+        screen = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        return [screen.clip(x, y, size, size) for x, y in zip(placement[0], placement[1])]
+
+def merge_rects(rects):
+    """Combine overlapping rects into their unions so no pixel is covered twice"""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        if not rect.w or not rect.h:
+            continue
+        hits = rect.collidelistall(merged)
+        while hits:
+            rect.unionall_ip([merged[i] for i in hits])
+            for i in reversed(hits):
+                del merged[i]
+            hits = rect.collidelistall(merged)
+        merged.append(rect)
+    return merged
+
+def tinted(brightness, color):
+    """Scale an RGB color by per-star brightness values (0-255) like the original star colors"""
+    rgb = np.trunc(brightness.astype(int)[:, None] * np.array(color) / 255)
+    return np.clip(rgb, 0, 255).astype(int)
+
+class Starfield:
+    """Pre-baked star layers for the menu, splash screen and each stage palette"""
+    def __init__(self):
+        self.layers = {}
+    
+    def stage_layers(self, stage_color):
+        key = (stage_color['stars'], stage_color['accent'])
+        layers = self.layers.get(key)
+        if layers is None:
+            stars = stage_color['stars']
+            accent = stage_color['accent']
+            layers = self.layers[key] = [
+                StarLayer(100, (10, 8), (1, 0.3), 0.02, 1,
+                          lambda phase: tinted(100 + 155 * (0.5 + 0.5 * np.sin(phase)), stars)),
+                # Additional star layer
+                StarLayer(30, (33, 25), (1.5, 0.8), 0.015, 2,
+                          lambda phase: tinted(200 * (0.3 + 0.7 * np.sin(phase)), stars)),
+                # Atmospheric elements for stage 2 and up
+                StarLayer(5, (200, 150), (0.5, 0.2), 0, 3,
+                          lambda phase: np.tile(accent, (len(phase), 1)), width=1)
+            ]
+        return layers
+    
+    def draw_stage(self, screen, stage, stage_color, offset):
+        layers = self.stage_layers(stage_color)
+        for layer in layers if stage >= 2 else layers[:2]:
+            layer.draw(screen, offset)
+    
+    def moving_stars(self, count):
+        """White twinkling stars used behind the menu and splash screen"""
+        layer = self.layers.get(count)
+        if layer is None:
+            layer = self.layers[count] = StarLayer(
+                count, (20, 15), (1, 0.5), 0.01, 1,
+                lambda phase: tinted(255 * (0.5 + 0.5 * np.sin(phase)), WHITE))
+        return layer
+    
+    def draw_moving_stars(self, screen, count, offset):
+        self.moving_stars(count).draw(screen, offset)
+
+MENU_STARS = 50
+
+# Text rendering
+TEXT_CACHE_SIZE = 256  # Rendered strings kept before evicting the least recently used
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by (font, text, antialias, color).
+    
+    Static labels and values that rarely change (level, timers) are rasterized
+    once and then reused. Text that changes every frame, like the score, is
+    drawn from cached per-character glyphs with ``blit_glyphs`` instead.
+    """
+    def __init__(self, size=TEXT_CACHE_SIZE):
+        self.size = size
+        self.surfaces = collections.OrderedDict()
+        self.glyphs = {}
+    
+    def render(self, font, text, antialias, color):
+        """Cached equivalent of ``font.render(text, antialias, color)``"""
+        key = (font, text, antialias, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = font.render(text, antialias, color)
+            if len(self.surfaces) > self.size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+    
+    def blit_glyphs(self, screen, font, text, antialias, color, dest):
+        """Draw ``text`` at ``dest`` from cached glyph surfaces, without rasterizing it or allocating a surface.
+        
+        Each glyph is placed to end where ``font.size`` says the text up to it
+        ends, which keeps kerning and matches ``font.render`` pixel for pixel.
+        """
+        x, y = dest
+        for i, char in enumerate(text):
+            key = (font, char, antialias, color)
+            glyph = self.glyphs.get(key)
+            if glyph is None:
+                glyph = self.glyphs[key] = font.render(char, antialias, color)
+            screen.blit(glyph, (x + font.size(text[:i + 1])[0] - glyph.get_width(), y))
+
+# Compositing
+# pygame.draw writes RGBA colors straight onto the opaque screen, alpha and
+# all ignored, so translucent boxes have to be blitted from a surface instead.
+
+class Compositor:
+    """Cached translucent fills for full-screen overlays and HUD panels.
+
+    Each color gets one display-format surface with surface alpha, grown on
+    demand to the largest area asked for. Smaller boxes blit just a corner of
+    it, so an overlay or panel costs one blit and no allocations.
+    """
+    def __init__(self):
+        self.fills = {}
+
+    def fill(self, screen, color, rect=None):
+        """Blend ``color`` (RGB or RGBA) over ``rect`` of ``screen``, or over all of it"""
+        rect = screen.get_rect() if rect is None else pygame.Rect(rect)
+        if len(color) == 3 or color[3] == 255:
+            screen.fill(color[:3], rect)
+            return
+        surface = self.fills.get(color)
+        if surface is None or surface.get_width() < rect.width or surface.get_height() < rect.height:
+            width, height = rect.size
+            if surface is not None:
+                width = max(width, surface.get_width())
+                height = max(height, surface.get_height())
+            surface = pygame.Surface((width, height))
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            surface.fill(color[:3])
+            surface.set_alpha(color[3])
+            self.fills[color] = surface
+        screen.blit(surface, rect, (0, 0, rect.width, rect.height))
+
+    def panel(self, screen, rect, color, border=None, width=3):
+        """Translucent box with an optional opaque border"""
+        self.fill(screen, color, rect)
+        if border is not None:
+            pygame.draw.rect(screen, border, rect, width)
+
+# Persistence
+PROFILE_FILE = 'profile.db'
+PROFILE_VERSION = 2  # SQLite user_version; bump and add a ProfileStore migration when the schema changes
+DEFAULT_SETTINGS = {
+    'sound_enabled': True,
+    'music_enabled': True,
+    'difficulty': 'normal',
+    'particle_effects': True,
+    'show_fps': False
+}
+DEFAULT_ACHIEVEMENTS = {
+    'first_game': False,
+    'score_1000': False,
+    'score_5000': False,
+    'score_10000': False,
+    'survive_60s': False,
+    'collect_10_powerups': False,
+    'perfect_dash': False,
+    'no_damage_run': False
+}
+LEADERBOARD_SIZE = 10
+RUN_FIELDS = ('finished_at', 'seed', 'score', 'level', 'stage', 'frames', 'damage_taken',
+              'powerups_collected', 'dashes')
+
+class SaveWriter:
+    """Runs save jobs on a background thread so the game loop never waits on disk.
+    
+    Jobs run in the order they were queued. A job queued with a key replaces
+    any job with the same key that has not run yet, and is dropped entirely
+    when its arguments equal those of the last job queued under that key.
+    ``write`` uses the path as the key, writing to a temporary file and
+    swapping it in with os.replace so a crash mid-write leaves the previous
+    version intact.
+    """
+    def __init__(self):
+        self.pending = collections.OrderedDict()  # key -> (function, args) still to run
+        self.latest = {}  # key -> args most recently queued
+        self.busy = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name='saver', daemon=True)
+        self.thread.start()
+    
+    def submit(self, key, function, *args):
+        """Queue ``function(*args)``; a key of None never coalesces with other jobs"""
+        with self.condition:
+            if key is None:
+                key = object()
+            elif self.latest.get(key) == args:
+                return
+            else:
+                self.latest[key] = args
+                self.pending.pop(key, None)
+            self.pending[key] = (function, args)
+            self.condition.notify_all()
+    
+    def write(self, path, data):
+        self.submit(path, write_atomic, path, data)
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                key, (function, args) = self.pending.popitem(last=False)
+                self.busy = True
+            try:
+                function(*args)
+            except Exception as error:  # One failed job must not take the thread, and every later save, with it
+                print(f"Background save failed: {error!r}", file=sys.stderr)
+                with self.condition:
+                    self.latest.pop(key, None)  # Let the next save retry
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+    
+    def flush(self):
+        """Block until every queued job has finished"""
+        with self.condition:
+            while self.pending or self.busy:
+                self.condition.wait()
+    
+    def close(self):
+        """Finish the queued jobs and stop the writer thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+def write_atomic(path, data):
+    """Replace ``path`` with ``data`` so readers see either the old or the new file, never a partial one"""
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+def read_legacy_json(path):
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+class ProfileStore:
+    """The player's profile in one SQLite file: settings, achievements, high score and run history.
+    
+    ``profile`` holds JSON values by key and ``runs`` gets one row per
+    finished game, so recording a run is a single insert. The schema version
+    lives in SQLite's user_version; opening an older file runs the missing
+    migrations, the first of which imports the old per-topic JSON files.
+    Methods may be called from any thread.
+    """
+    def __init__(self, path=PROFILE_FILE):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.migrate()
+    
+    def migrate(self):
+        migrations = [self.create_v1, self.create_v2]
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN')  # DDL would otherwise commit each statement on its own
+            version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+            if version > PROFILE_VERSION:
+                raise sqlite3.DatabaseError(f"profile version {version} is newer than this game supports")
+            for migration in migrations[version:PROFILE_VERSION]:
+                migration()
+            self.connection.execute(f'PRAGMA user_version = {PROFILE_VERSION}')
+    
+    def create_v1(self):
+        self.connection.execute('CREATE TABLE profile (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.connection.execute(f"CREATE TABLE runs (id INTEGER PRIMARY KEY, {', '.join(RUN_FIELDS)})")
+        legacy = {
+            'high_score': read_legacy_json('high_score.json').get('high_score', 0),
+            'achievements': read_legacy_json('achievements.json'),
+            'settings': read_legacy_json('settings.json')
+        }
+        self.connection.executemany('INSERT INTO profile VALUES (?, ?)',
+                                    [(key, json.dumps(value)) for key, value in legacy.items()])
+    
+    def create_v2(self):
+        # Leaderboard and personal-best queries walk these instead of scanning every run
+        self.connection.execute('CREATE INDEX runs_by_score ON runs (score)')
+        self.connection.execute('CREATE INDEX runs_by_date ON runs (finished_at)')
+        self.connection.execute('CREATE INDEX runs_by_stage ON runs (stage, score)')
+        self.connection.execute('CREATE INDEX runs_by_frames ON runs (frames)')
+    
+    def load(self):
+        """Return the high score, achievements and settings, filling in defaults for missing keys"""
+        with self.lock:
+            rows = dict(self.connection.execute('SELECT key, value FROM profile'))
+        saved = {}
+        for key, value in rows.items():
+            try:
+                saved[key] = json.loads(value)
+            except ValueError:
+                print(f"Ignoring a corrupt saved {key}; using the default", file=sys.stderr)
+        for key, kind in (('high_score', int), ('achievements', dict), ('settings', dict)):
+            if key in saved and not isinstance(saved[key], kind):
+                print(f"Ignoring a saved {key} of the wrong type; using the default", file=sys.stderr)
+                del saved[key]
+        return {
+            'high_score': saved.get('high_score', 0),
+            'achievements': {**DEFAULT_ACHIEVEMENTS, **saved.get('achievements', {})},
+            'settings': {**DEFAULT_SETTINGS, **saved.get('settings', {})}
+        }
+    
+    def set(self, key, value):
+        """Store ``value``, already encoded as JSON, under ``key``"""
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO profile VALUES (?, ?)', (key, value))
+    
+    def add_run(self, run):
+        """Record a finished run and return its id"""
+        with self.lock, self.connection:
+            cursor = self.connection.execute(f"INSERT INTO runs ({', '.join(RUN_FIELDS)}) VALUES ({', '.join('?' * len(RUN_FIELDS))})",
+                                             [run[field] for field in RUN_FIELDS])
+        return cursor.lastrowid
+    
+    def top_runs(self, limit=LEADERBOARD_SIZE, stage=None):
+        """Highest-scoring runs, optionally only those that ended on ``stage``"""
+        with self.lock:
+            if stage is None:
+                rows = self.connection.execute('SELECT * FROM runs ORDER BY score DESC, id LIMIT ?', (limit,))
+            else:
+                rows = self.connection.execute('SELECT * FROM runs WHERE stage = ? ORDER BY score DESC, id LIMIT ?',
+                                               (stage, limit))
+            return [dict(row) for row in rows]
+    
+    def recent_runs(self, limit=LEADERBOARD_SIZE):
+        with self.lock:
+            rows = self.connection.execute('SELECT * FROM runs ORDER BY finished_at DESC LIMIT ?', (limit,))
+            return [dict(row) for row in rows]
+    
+    def personal_bests(self):
+        """Run count and best score, survival time and stage over every recorded run"""
+        with self.lock:
+            # Separate MIN/MAX queries so each is answered from its index
+            runs = self.connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+            bests = {'runs': runs}
+            for field in ('score', 'frames', 'stage'):
+                bests[field] = self.connection.execute(f'SELECT MAX({field}) FROM runs').fetchone()[0] or 0
+            return bests
+    
+    def rank(self, score):
+        """Leaderboard position a run scoring ``score`` holds, counting from 1"""
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM runs WHERE score > ?', (score,)).fetchone()[0] + 1
+    
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+def lazy_font(size):
+    """Game attribute holding a default font of ``size``, loaded the first time it is used"""
+    def load(self):
+        with startup_phase(f'font {size}'):
+            return pygame.font.Font(None, size)
+    return functools.cached_property(load)
+
+class Game(Simulation):
+    font = lazy_font(48)  # Increased from 36
+    big_font = lazy_font(84)  # Increased from 72
+    title_font = lazy_font(120)  # Increased from 96
+    small_font = lazy_font(32)  # Increased from 24
+    medium_font = lazy_font(40)  # New medium font
+    large_font = lazy_font(60)  # New large font
+    tiny_font = lazy_font(22)  # Profiler overlay
+    
+    def __init__(self, lazy=True, profile_file=PROFILE_FILE):
+        with startup_phase('display'):
+            pygame.display.init()
+            pygame.font.init()
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Dodge Like Naruto - Enhanced Edition")
+        self.clock = pygame.time.Clock()
+        
+        self.state = SPLASH
+        self.splash_timer = 0
+        with startup_phase('renderers'):
+            self.text = TextCache()
+            self.compositor = Compositor()
+            self.starfield = Starfield()
+            self.particle_renderer = ParticleRenderer()
+            self.projectile_renderer = ProjectileRenderer()
+            # Sparkles and dash trails, reseeded from the tick so they change per tick rather than
+            # per frame and stay out of the simulation's random streams
+            self.render_rng = random.Random()
+        self.background_offset = 0
+        self.stage_colors = {
+            1: {'bg': (20, 20, 40), 'stars': (100, 100, 200), 'accent': CYAN},
+            2: {'bg': (40, 20, 20), 'stars': (200, 100, 100), 'accent': RED},
+            3: {'bg': (20, 40, 20), 'stars': (100, 200, 100), 'accent': GREEN},
+            4: {'bg': (40, 20, 40), 'stars': (200, 100, 200), 'accent': PURPLE},
+            5: {'bg': (40, 40, 20), 'stars': (200, 200, 100), 'accent': YELLOW}
+        }
+        
+        # Sound system
+        self.sound_enabled = True
+        self.music_enabled = True
+        
+        self.max_fps = FPS  # Render rate cap; 0 renders as fast as possible
+        self.dirty_rendering = True  # Redraw only what changed on the menu and static screens
+        self.dirty_rects = None  # Screen areas the last draw() changed; None means all of it
+        self.static_key = None  # What the static screen on display was drawn from
+        self.backdrop = None
+        self.menu_labels = None
+        self.menu_star_rects = []
+        self.menu_star_placement = None
+        self.previous_positions = {}  # id(entity) -> (entity, x, y) before the latest tick
+        self.previous_offset = 0
+        self.previous_animation = 0
+        self.frame_profile_path = None  # Where the frame profile is exported on exit
+        self.show_profiler = False
+        self.profiler_panel = None
+        
+        self.profile_file = profile_file
+        self.replay_player = None
+        self.autopilot = None  # Plays in place of the keyboard when set (--autopilot)
+        self.menu_idle = 0  # Frames the menu has waited for a key
+        self.demo = None  # (autopilot, snapshot and recording of the world to go back to) while the attract-mode demo plays
+        self.leaderboard = None
+        self.last_run = None
+        self.saver = SaveWriter()
+        self.profile = None  # Set by load_assets(), like the high score, achievements and settings
+        self.settings = None
+        self.load_error = None  # What went wrong in load_assets(), for finish_loading()
+        with startup_phase('simulation'):
+            super().__init__()
+        
+        # Saved state and sounds load behind the splash screen; finish_loading() waits for them
+        self.loader = threading.Thread(target=self.load_assets, name='loader', daemon=True)
+        if lazy:
+            self.loader.start()
+        else:
+            self.loader.run()
+            for name in ('font', 'big_font', 'title_font', 'small_font', 'medium_font', 'large_font', 'tiny_font'):
+                getattr(self, name)
+            self.finish_loading()
+    
+    def load_assets(self):
+        """Read the saved state and prepare sounds; runs on the loader thread in lazy mode.
+        
+        Any failure is kept in ``load_error`` rather than raised, so the
+        thread always finishes and finish_loading() can fall back to defaults.
+        """
+        try:
+            with startup_phase('saved state'):
+                try:
+                    self.profile = ProfileStore(self.profile_file)
+                except sqlite3.Error as error:
+                    print(f"Could not open {self.profile_file}, progress will not be saved: {error}", file=sys.stderr)
+                    self.profile = ProfileStore(':memory:')
+                saved = self.profile.load()
+                self.high_score = saved['high_score']
+                self.achievements = saved['achievements']
+                self.settings = saved['settings']
+                self.load_leaderboard()
+            sound_manager.init_sounds()
+        except Exception as error:
+            self.load_error = error
+    
+    def finish_loading(self):
+        """Wait for load_assets() and apply the loaded settings, or defaults if they could not be loaded"""
+        if self.loader.is_alive():
+            self.loader.join()
+        if self.load_error is not None:
+            print(f"Loading failed, continuing with defaults where needed: {self.load_error!r}", file=sys.stderr)
+            self.load_error = None
+            if self.settings is None:
+                if self.profile is None:
+                    self.profile = ProfileStore(':memory:')
+                self.high_score = 0
+                self.achievements = dict(DEFAULT_ACHIEVEMENTS)
+                self.settings = dict(DEFAULT_SETTINGS)
+        self.effects = self.settings['particle_effects']
+    
+    def reset_game(self, seed=None):
+        super().reset_game(seed)
+        self.background_offset = 0
+        self.recording = Replay(self.seed)
+    
+    def save_profile(self, key, value):
+        self.saver.submit(key, self.profile.set, key, json.dumps(value))
+    
+    def save_high_score(self):
+        self.save_profile('high_score', self.high_score)
+    
+    def save_achievements(self):
+        self.save_profile('achievements', self.achievements)
+    
+    def save_settings(self):
+        self.save_profile('settings', self.settings)
+    
+    def save_run(self):
+        run = {
+            'finished_at': time.time(),
+            'seed': self.seed,
+            'score': self.score,
+            'level': self.level,
+            'stage': self.stage,
+            'frames': self.frame,
+            'damage_taken': self.damage_taken,
+            'powerups_collected': self.powerups_collected,
+            'dashes': self.player.dash_count
+        }
+        self.last_run = run
+        self.saver.submit(None, self.record_run, run)
+    
+    def record_run(self, run):
+        """Store a finished run and refresh the leaderboard; runs on the saver thread"""
+        run['id'] = self.profile.add_run(run)
+        self.load_leaderboard(run)
+    
+    def load_leaderboard(self, run=None):
+        """Query the leaderboard off the game thread; the screens draw whatever was loaded last"""
+        leaderboard = {
+            'top': self.profile.top_runs(),
+            'bests': self.profile.personal_bests(),
+            'run': run,
+            'rank': self.profile.rank(run['score']) if run else None
+        }
+        self.leaderboard = leaderboard
+    
+    def update(self):
+        # Update splash screen
+        if self.state == SPLASH:
+            self.splash_timer += 1
+            self.background_offset += 0.5
+            if self.splash_timer >= 180 and not self.loader.is_alive():  # 3 seconds at 60 FPS
+                self.finish_loading()
+                self.state = MENU
+            return
+        
+        if self.state == REPLAY:
+            self.update_replay()
+            return
+        
+        if self.state == MENU:
+            self.menu_idle += 1
+            if self.menu_idle >= ATTRACT_DELAY:
+                self.start_demo()
+            return
+        
+        if self.state == DEMO:
+            self.update_demo()
+            return
+        
+        if self.state != PLAYING:
+            return
+        
+        # Update background offset for scrolling effect
+        self.background_offset += 0.5
+        
+        # Advance the simulation with the keys held this frame
+        if self.autopilot:
+            inputs = self.autopilot(self)
+            self.profiler.mark('update/autopilot')
+        else:
+            inputs = read_input()
+        self.recording.record(inputs)
+        self.profiler.mark('update/other')
+        self.step(inputs)
+        for event in self.events:
+            sound_manager.play_sound(event)
+        
+        if self.game_over:
+            self.state = GAME_OVER
+            if self.score > self.high_score:
+                self.high_score = self.score
+                self.save_high_score()
+            self.check_achievements()
+            self.save_run()
+            self.save_replay()
+    
+    def save_replay(self):
+        self.saver.write(REPLAY_FILE, self.recording.encode())
+    
+    def start_replay(self, replay):
+        """Watch a replay in the game window"""
+        self.replay_player = ReplayPlayer(replay, self)
+        self.state = REPLAY
+    
+    def update_replay(self):
+        self.background_offset += 0.5 * self.replay_player.speed
+        self.replay_player.update()
+        if self.replay_player.speed == 1:
+            for event in self.events:
+                sound_manager.play_sound(event)
+    
+    def start_demo(self):
+        """Let the autopilot play a fresh, silent and unrecorded game until a key is pressed"""
+        self.demo = (Autopilot(), self.snapshot(), self.recording)
+        self.reset_game()
+        self.state = DEMO
+    
+    def update_demo(self):
+        self.background_offset += 0.5
+        inputs = self.demo[0](self)
+        self.profiler.mark('update/autopilot')
+        self.step(inputs)
+        if self.game_over:
+            self.stop_demo()
+    
+    def stop_demo(self):
+        """Back to the menu, showing the world and keeping the replay as they were before the demo"""
+        _, snapshot, self.recording = self.demo
+        self.restore(snapshot)
+        self.demo = None
+        self.menu_idle = 0
+        self.state = MENU
+    
     def check_achievements(self):
         """Check and unlock achievements"""
+        unlocked_before = sum(self.achievements.values())
+        
         if not self.achievements['first_game']:
             self.achievements['first_game'] = True
         
@@ -1149,7 +3003,7 @@ class Game:
         if self.score >= 10000 and not self.achievements['score_10000']:
             self.achievements['score_10000'] = True
         
-        if time.time() - self.start_time >= 60 and not self.achievements['survive_60s']:
+        if self.frame >= 60 * FPS and not self.achievements['survive_60s']:
             self.achievements['survive_60s'] = True
         
         if self.powerups_collected >= 10 and not self.achievements['collect_10_powerups']:
@@ -1161,116 +3015,105 @@ class Game:
         if self.damage_taken == 0 and self.score >= 1000 and not self.achievements['no_damage_run']:
             self.achievements['no_damage_run'] = True
         
-        self.save_achievements()
+        if sum(self.achievements.values()) != unlocked_before:
+            self.save_achievements()
     
     def draw_menu(self):
         # Animated background
         self.screen.fill(BLACK)
         
         # Moving stars
-        for i in range(50):
-            x = (i * 20 + self.background_offset) % SCREEN_WIDTH
-            y = (i * 15 + self.background_offset * 0.5) % SCREEN_HEIGHT
-            brightness = int(255 * (0.5 + 0.5 * math.sin(self.background_offset * 0.01 + i)))
-            color = (brightness, brightness, brightness)
-            pygame.draw.circle(self.screen, color, (int(x), int(y)), 1)
-        
+        self.starfield.draw_moving_stars(self.screen, MENU_STARS, self.background_offset)
+        self.draw_menu_labels()
+    
+    def draw_menu_labels(self):
         # Title with gradient effect
-        title_text = self.title_font.render("DODGE LIKE NARUTO", True, ORANGE)
+        title_text = self.text.render(self.title_font, "DODGE LIKE NARUTO", True, ORANGE)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 180))
         
         # Title shadow
-        shadow_text = self.title_font.render("DODGE LIKE NARUTO", True, DARK_GRAY)
+        shadow_text = self.text.render(self.title_font, "DODGE LIKE NARUTO", True, DARK_GRAY)
         shadow_rect = shadow_text.get_rect(center=(SCREEN_WIDTH//2 + 4, SCREEN_HEIGHT//2 - 176))
         self.screen.blit(shadow_text, shadow_rect)
         self.screen.blit(title_text, title_rect)
         
         # Subtitle
-        subtitle_text = self.large_font.render("Enhanced Edition", True, GOLD)
+        subtitle_text = self.text.render(self.large_font, "Enhanced Edition", True, GOLD)
         subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 120))
         self.screen.blit(subtitle_text, subtitle_rect)
         
         # High score with better styling
-        high_score_text = self.font.render(f"High Score: {self.high_score:,}", True, GOLD)
+        high_score_text = self.text.render(self.font, f"High Score: {self.high_score:,}", True, GOLD)
         high_score_rect = high_score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 60))
         self.screen.blit(high_score_text, high_score_rect)
         
         # Level indicator
-        level_text = self.font.render(f"Level: {self.level}", True, CYAN)
+        level_text = self.text.render(self.font, f"Level: {self.level}", True, CYAN)
         level_rect = level_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 20))
         self.screen.blit(level_text, level_rect)
         
         # Instructions
-        start_text = self.large_font.render("Press SPACE to Start", True, WHITE)
+        start_text = self.text.render(self.large_font, "Press SPACE to Start", True, WHITE)
         start_rect = start_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 20))
         self.screen.blit(start_text, start_rect)
         
         # Controls
-        controls_text = self.medium_font.render("Arrow Keys: Move | SPACE: Dash | X: Special Attack", True, YELLOW)
+        controls_text = self.text.render(self.medium_font, "Arrow Keys: Move | SPACE: Dash | X: Special Attack", True, YELLOW)
         controls_rect = controls_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 70))
         self.screen.blit(controls_text, controls_rect)
         
         # Additional controls
-        controls2_text = self.medium_font.render("Collect Power-ups! Defeat Enemies!", True, CYAN)
+        controls2_text = self.text.render(self.medium_font, "Collect Power-ups! Defeat Enemies!", True, CYAN)
         controls2_rect = controls2_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 110))
         self.screen.blit(controls2_text, controls2_rect)
         
         # Power-up descriptions
-        powerup_text = self.small_font.render("Power-ups: Speed | Shield | Slow Time | Multi-Shot | Health | Invincible", True, CYAN)
+        powerup_text = self.text.render(self.small_font, "Power-ups: Speed | Shield | Slow Time | Multi-Shot | Health | Invincible", True, CYAN)
         powerup_rect = powerup_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 150))
         self.screen.blit(powerup_text, powerup_rect)
         
         # Additional controls
-        extra_text = self.small_font.render("Press P to Pause | ESC to Quit | S to Toggle Sound | O for Settings | A for Achievements", True, LIGHT_GRAY)
+        extra_text = self.text.render(self.small_font, "Press P to Pause | ESC to Quit | S to Toggle Sound | O for Settings | A for Achievements", True, LIGHT_GRAY)
         extra_rect = extra_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 190))
         self.screen.blit(extra_text, extra_rect)
         
         # Sound status
         sound_status = "ON" if sound_manager.sound_enabled else "OFF"
-        sound_text = self.small_font.render(f"Sound: {sound_status}", True, LIGHT_GREEN if sound_manager.sound_enabled else LIGHT_GRAY)
+        sound_text = self.text.render(self.small_font, f"Sound: {sound_status}", True, LIGHT_GREEN if sound_manager.sound_enabled else LIGHT_GRAY)
         sound_rect = sound_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 230))
         self.screen.blit(sound_text, sound_rect)
+        
+        # Leaderboard and personal bests in the top corners
+        leaderboard = self.leaderboard
+        if leaderboard:
+            self.draw_top_runs(leaderboard, 20, 12, 3)
+            bests = leaderboard['bests']
+            lines = (f"Runs: {bests['runs']:,}", f"Longest: {bests['frames'] // FPS}s", f"Best Stage: {bests['stage']}")
+            for i, line in enumerate(lines):
+                best_text = self.text.render(self.small_font, line, True, LIGHT_GRAY)
+                self.screen.blit(best_text, best_text.get_rect(topright=(SCREEN_WIDTH - 20, 12 + i * 26)))
+    
+    def draw_top_runs(self, leaderboard, x, y, limit):
+        """List the best ``limit`` runs, marking the one the leaderboard was refreshed for"""
+        header_text = self.text.render(self.small_font, "TOP RUNS", True, GOLD)
+        self.screen.blit(header_text, (x, y))
+        highlight = leaderboard['run']['id'] if leaderboard['run'] else None
+        for i, run in enumerate(leaderboard['top'][:limit]):
+            color = GOLD if run['id'] == highlight else WHITE
+            entry_text = self.text.render(self.small_font, f"{i + 1}. {run['score']:,}  S{run['stage']}  {run['frames'] // FPS}s", True, color)
+            self.screen.blit(entry_text, (x, y + 26 * (i + 1)))
     
     def draw_game(self):
         # Draw animated background with stage colors
         stage_color = self.stage_colors.get(self.stage, self.stage_colors[1])
         self.screen.fill(stage_color['bg'])
         
-        # Enhanced background with parallax scrolling
-        for i in range(100):
-            x = (i * 10 + self.background_offset) % SCREEN_WIDTH
-            y = (i * 8 + self.background_offset * 0.3) % SCREEN_HEIGHT
-            brightness = int(100 + 155 * (0.5 + 0.5 * math.sin(self.background_offset * 0.02 + i)))
-            # Ensure color values are within valid range (0-255)
-            r = max(0, min(255, int(brightness * stage_color['stars'][0] / 255)))
-            g = max(0, min(255, int(brightness * stage_color['stars'][1] / 255)))
-            b = max(0, min(255, int(brightness * stage_color['stars'][2] / 255)))
-            color = (r, g, b)
-            pygame.draw.circle(self.screen, color, (int(x), int(y)), 1)
-        
-        # Additional star layer
-        for i in range(30):
-            x = (i * 33 + self.background_offset * 1.5) % SCREEN_WIDTH
-            y = (i * 25 + self.background_offset * 0.8) % SCREEN_HEIGHT
-            brightness = int(200 * (0.3 + 0.7 * math.sin(self.background_offset * 0.015 + i)))
-            # Ensure color values are within valid range (0-255)
-            r = max(0, min(255, int(brightness * stage_color['stars'][0] / 255)))
-            g = max(0, min(255, int(brightness * stage_color['stars'][1] / 255)))
-            b = max(0, min(255, int(brightness * stage_color['stars'][2] / 255)))
-            color = (r, g, b)
-            pygame.draw.circle(self.screen, color, (int(x), int(y)), 2)
-        
-        # Stage-specific background elements
-        if self.stage >= 2:
-            # Add some atmospheric elements
-            for i in range(5):
-                x = (i * 200 + self.background_offset * 0.5) % SCREEN_WIDTH
-                y = (i * 150 + self.background_offset * 0.2) % SCREEN_HEIGHT
-                pygame.draw.circle(self.screen, stage_color['accent'], (int(x), int(y)), 3, 1)
+        # Enhanced background with parallax scrolling and stage-specific elements
+        self.starfield.draw_stage(self.screen, self.stage, stage_color, self.background_offset)
+        self.profiler.mark('draw/background')
         
         # Draw particles
-        for particle in self.particles:
-            particle.draw(self.screen)
+        self.particle_renderer.draw(self.screen, self.particles)
         
         # Draw powerups
         for powerup in self.powerups:
@@ -1281,11 +3124,12 @@ class Game:
             enemy.draw(self.screen)
         
         # Draw projectiles
-        for projectile in self.projectiles:
-            projectile.draw(self.screen)
+        self.render_rng.seed(self.frame)
+        self.projectile_renderer.draw(self.screen, self.projectiles, self.render_rng)
         
         # Draw player
-        self.player.draw(self.screen)
+        self.player.draw(self.screen, self.render_rng)
+        self.profiler.mark('draw/entities')
         
         # Enhanced HUD with better styling and spacing
         hud_y = 15
@@ -1293,43 +3137,39 @@ class Game:
         hud_spacing = 60  # Increased spacing between elements
         
         # Score with background
-        score_text = self.font.render(f"Score: {self.score:,}", True, WHITE)
-        score_rect = score_text.get_rect()
-        score_bg = pygame.Rect(hud_x - 8, hud_y - 8, score_rect.width + 16, score_rect.height + 16)
-        pygame.draw.rect(self.screen, (0, 0, 0, 200), score_bg)
-        pygame.draw.rect(self.screen, WHITE, score_bg, 3)
-        self.screen.blit(score_text, (hud_x, hud_y))
+        score_text = f"Score: {self.score:,}"
+        score_width, score_height = self.font.size(score_text)
+        score_bg = pygame.Rect(hud_x - 8, hud_y - 8, score_width + 16, score_height + 16)
+        self.compositor.panel(self.screen, score_bg, (0, 0, 0, 200), WHITE)
+        self.text.blit_glyphs(self.screen, self.font, score_text, True, WHITE, (hud_x, hud_y))
         hud_y += hud_spacing
         
         # High score
-        high_score_text = self.font.render(f"High: {self.high_score:,}", True, GOLD)
+        high_score_text = self.text.render(self.font, f"High: {self.high_score:,}", True, GOLD)
         high_score_rect = high_score_text.get_rect()
         high_score_bg = pygame.Rect(hud_x - 8, hud_y - 8, high_score_rect.width + 16, high_score_rect.height + 16)
-        pygame.draw.rect(self.screen, (0, 0, 0, 200), high_score_bg)
-        pygame.draw.rect(self.screen, GOLD, high_score_bg, 3)
+        self.compositor.panel(self.screen, high_score_bg, (0, 0, 0, 200), GOLD)
         self.screen.blit(high_score_text, (hud_x, hud_y))
         hud_y += hud_spacing
         
         # Level and Stage
-        level_text = self.font.render(f"Level: {self.level}", True, CYAN)
+        level_text = self.text.render(self.font, f"Level: {self.level}", True, CYAN)
         level_rect = level_text.get_rect()
         level_bg = pygame.Rect(hud_x - 8, hud_y - 8, level_rect.width + 16, level_rect.height + 16)
-        pygame.draw.rect(self.screen, (0, 0, 0, 200), level_bg)
-        pygame.draw.rect(self.screen, CYAN, level_bg, 3)
+        self.compositor.panel(self.screen, level_bg, (0, 0, 0, 200), CYAN)
         self.screen.blit(level_text, (hud_x, hud_y))
         hud_y += hud_spacing
         
         # Stage
-        stage_text = self.font.render(f"Stage: {self.stage}", True, stage_color['accent'])
+        stage_text = self.text.render(self.font, f"Stage: {self.stage}", True, stage_color['accent'])
         stage_rect = stage_text.get_rect()
         stage_bg = pygame.Rect(hud_x - 8, hud_y - 8, stage_rect.width + 16, stage_rect.height + 16)
-        pygame.draw.rect(self.screen, (0, 0, 0, 200), stage_bg)
-        pygame.draw.rect(self.screen, stage_color['accent'], stage_bg, 3)
+        self.compositor.panel(self.screen, stage_bg, (0, 0, 0, 200), stage_color['accent'])
         self.screen.blit(stage_text, (hud_x, hud_y))
         hud_y += hud_spacing
         
         # Health bar with better spacing
-        health_text = self.medium_font.render("Health:", True, WHITE)
+        health_text = self.text.render(self.medium_font, "Health:", True, WHITE)
         self.screen.blit(health_text, (hud_x, hud_y))
         hud_y += 35
         
@@ -1356,43 +3196,45 @@ class Game:
         powerup_spacing = 35  # Increased spacing between power-up items
         
         if self.player.shield_active:
-            shield_text = self.medium_font.render(f"Shield: {self.player.shield_timer//60}s", True, BLUE)
+            shield_text = self.text.render(self.medium_font, f"Shield: {self.player.shield_timer//60}s", True, BLUE)
             self.screen.blit(shield_text, (hud_x, powerup_y))
             powerup_y += powerup_spacing
         if self.player.speed_boost:
-            speed_text = self.medium_font.render(f"Speed: {self.player.speed_timer//60}s", True, CYAN)
+            speed_text = self.text.render(self.medium_font, f"Speed: {self.player.speed_timer//60}s", True, CYAN)
             self.screen.blit(speed_text, (hud_x, powerup_y))
             powerup_y += powerup_spacing
         if self.player.slow_time:
-            slow_text = self.medium_font.render(f"Slow Time: {self.player.slow_timer//60}s", True, PURPLE)
+            slow_text = self.text.render(self.medium_font, f"Slow Time: {self.player.slow_timer//60}s", True, PURPLE)
             self.screen.blit(slow_text, (hud_x, powerup_y))
             powerup_y += powerup_spacing
         if self.player.multi_shot:
-            multi_text = self.medium_font.render(f"Multi-Shot: {self.player.multi_shot_timer//60}s", True, YELLOW)
+            multi_text = self.text.render(self.medium_font, f"Multi-Shot: {self.player.multi_shot_timer//60}s", True, YELLOW)
             self.screen.blit(multi_text, (hud_x, powerup_y))
             powerup_y += powerup_spacing
         if self.player.invincible:
-            inv_text = self.medium_font.render(f"Invincible: {self.player.invincible_timer//60}s", True, GOLD)
+            inv_text = self.text.render(self.medium_font, f"Invincible: {self.player.invincible_timer//60}s", True, GOLD)
             self.screen.blit(inv_text, (hud_x, powerup_y))
             powerup_y += powerup_spacing
         
         # Dash cooldown
         if self.player.dash_cooldown > 0:
-            dash_text = self.medium_font.render(f"Dash: {self.player.dash_cooldown//60}s", True, LIGHT_GRAY)
+            dash_text = self.text.render(self.medium_font, f"Dash: {self.player.dash_cooldown//60}s", True, LIGHT_GRAY)
             self.screen.blit(dash_text, (hud_x, powerup_y))
             powerup_y += powerup_spacing
         
         # Special attack cooldown
         if self.player.special_attack_cooldown > 0:
-            special_text = self.medium_font.render(f"Special: {self.player.special_attack_cooldown//60}s", True, LIGHT_GRAY)
+            special_text = self.text.render(self.medium_font, f"Special: {self.player.special_attack_cooldown//60}s", True, LIGHT_GRAY)
             self.screen.blit(special_text, (hud_x, powerup_y))
         
         # Mini-map/Radar
+        self.profiler.mark('draw/hud')
         self.draw_minimap(hud_x, SCREEN_HEIGHT - 150)
+        self.profiler.mark('draw/minimap')
         
         # Instructions
         if self.score < 100:  # Show instructions for first 100 points
-            instruction_text = self.medium_font.render("Arrow Keys: Move | SPACE: Dash | X: Special Attack", True, YELLOW)
+            instruction_text = self.text.render(self.medium_font, "Arrow Keys: Move | SPACE: Dash | X: Special Attack", True, YELLOW)
             self.screen.blit(instruction_text, (hud_x, SCREEN_HEIGHT - 40))
         
         # Draw FPS counter
@@ -1400,57 +3242,61 @@ class Game:
     
     def draw_game_over(self):
         # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(150)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.compositor.fill(self.screen, (0, 0, 0, 150))
         
         # Get stage color for display
         stage_color = self.stage_colors.get(self.stage, self.stage_colors[1])
         
         # Game over text with shadow
-        game_over_text = self.big_font.render("GAME OVER", True, RED)
-        game_over_shadow = self.big_font.render("GAME OVER", True, DARK_GRAY)
+        game_over_text = self.text.render(self.big_font, "GAME OVER", True, RED)
+        game_over_shadow = self.text.render(self.big_font, "GAME OVER", True, DARK_GRAY)
         game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 180))
         shadow_rect = game_over_shadow.get_rect(center=(SCREEN_WIDTH//2 + 4, SCREEN_HEIGHT//2 - 176))
         self.screen.blit(game_over_shadow, shadow_rect)
         self.screen.blit(game_over_text, game_over_rect)
         
         # Final score
-        final_score_text = self.large_font.render(f"Final Score: {self.score:,}", True, WHITE)
+        final_score_text = self.text.render(self.large_font, f"Final Score: {self.score:,}", True, WHITE)
         final_score_rect = final_score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 120))
         self.screen.blit(final_score_text, final_score_rect)
         
         # Level and Stage reached
-        level_text = self.font.render(f"Level Reached: {self.level}", True, CYAN)
+        level_text = self.text.render(self.font, f"Level Reached: {self.level}", True, CYAN)
         level_rect = level_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 70))
         self.screen.blit(level_text, level_rect)
         
-        stage_text = self.font.render(f"Stage Reached: {self.stage}", True, stage_color['accent'])
+        stage_text = self.text.render(self.font, f"Stage Reached: {self.stage}", True, stage_color['accent'])
         stage_rect = stage_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 30))
         self.screen.blit(stage_text, stage_rect)
         
         # Time survived
-        time_survived = int(time.time() - self.start_time)
-        time_text = self.font.render(f"Time Survived: {time_survived}s", True, YELLOW)
+        time_survived = self.frame // FPS
+        time_text = self.text.render(self.font, f"Time Survived: {time_survived}s", True, YELLOW)
         time_rect = time_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 10))
         self.screen.blit(time_text, time_rect)
         
         # Check if new high score
         if self.score >= self.high_score:
-            new_high_text = self.font.render("NEW HIGH SCORE!", True, GOLD)
+            new_high_text = self.text.render(self.font, "NEW HIGH SCORE!", True, GOLD)
             new_high_rect = new_high_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 20))
             self.screen.blit(new_high_text, new_high_rect)
         
         # Statistics
-        stats_text = self.small_font.render(f"Power-ups Collected: {self.powerups_collected} | Damage Taken: {self.damage_taken}", True, LIGHT_GRAY)
+        stats_text = self.text.render(self.small_font, f"Power-ups Collected: {self.powerups_collected} | Damage Taken: {self.damage_taken}", True, LIGHT_GRAY)
         stats_rect = stats_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 60))
         self.screen.blit(stats_text, stats_rect)
         
+        # Leaderboard, once this run has been recorded
+        leaderboard = self.leaderboard
+        if leaderboard and self.last_run and leaderboard['run'] is self.last_run:
+            self.draw_top_runs(leaderboard, 30, SCREEN_HEIGHT//2 - 140, LEADERBOARD_SIZE)
+            rank_text = self.text.render(self.small_font, f"Rank #{leaderboard['rank']:,} of {leaderboard['bests']['runs']:,}", True, CYAN)
+            self.screen.blit(rank_text, (30, SCREEN_HEIGHT//2 - 140 + 26 * (LEADERBOARD_SIZE + 1)))
+        
         # Controls
-        restart_text = self.font.render("Press R to Restart", True, YELLOW)
-        menu_text = self.font.render("Press M for Main Menu", True, CYAN)
-        quit_text = self.small_font.render("Press ESC to Quit", True, LIGHT_GRAY)
+        restart_text = self.text.render(self.font, "Press R to Restart", True, YELLOW)
+        menu_text = self.text.render(self.font, "Press M for Main Menu", True, CYAN)
+        quit_text = self.text.render(self.small_font, "Press V to Watch Replay | ESC to Quit", True, LIGHT_GRAY)
         
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100))
         menu_rect = menu_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 140))
@@ -1460,22 +3306,47 @@ class Game:
         self.screen.blit(menu_text, menu_rect)
         self.screen.blit(quit_text, quit_rect)
     
+    def draw_replay_bar(self):
+        """Draw replay position and playback controls"""
+        player = self.replay_player
+        bar_x = SCREEN_WIDTH // 2 - 200
+        bar_y = SCREEN_HEIGHT - 60
+        pygame.draw.rect(self.screen, DARK_GRAY, (bar_x, bar_y, 400, 10))
+        progress = player.frame / max(1, player.replay.frames)
+        pygame.draw.rect(self.screen, ORANGE, (bar_x, bar_y, int(400 * progress), 10))
+        pygame.draw.rect(self.screen, WHITE, (bar_x, bar_y, 400, 10), 1)
+        
+        if player.speed == 0:
+            mode = "PAUSED"
+        elif player.finished:
+            mode = "END"
+        else:
+            mode = f"{player.speed}x"
+        status = f"REPLAY {mode}  {player.frame // FPS}s / {player.replay.frames // FPS}s"
+        status_text = self.text.render(self.small_font, status, True, WHITE)
+        self.screen.blit(status_text, status_text.get_rect(center=(SCREEN_WIDTH//2, bar_y - 20)))
+        
+        help_text = self.text.render(self.small_font, "SPACE: Pause | F: Fast-forward | LEFT/RIGHT: Skip 10s | ESC: Menu", True, LIGHT_GRAY)
+        self.screen.blit(help_text, help_text.get_rect(center=(SCREEN_WIDTH//2, bar_y + 30)))
+    
+    def draw_demo_banner(self):
+        """Label the attract-mode demo"""
+        demo_text = self.text.render(self.medium_font, "DEMO - Press any key", True, GOLD)
+        self.screen.blit(demo_text, demo_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 60)))
+    
     def draw_pause(self):
         """Draw pause screen"""
         # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(150)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.compositor.fill(self.screen, (0, 0, 0, 150))
         
         # Pause text
-        pause_text = self.big_font.render("PAUSED", True, YELLOW)
+        pause_text = self.text.render(self.big_font, "PAUSED", True, YELLOW)
         pause_rect = pause_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
         self.screen.blit(pause_text, pause_rect)
         
         # Instructions
-        resume_text = self.font.render("Press SPACE to Resume", True, WHITE)
-        quit_text = self.font.render("Press ESC to Quit", True, LIGHT_GRAY)
+        resume_text = self.text.render(self.font, "Press SPACE to Resume", True, WHITE)
+        quit_text = self.text.render(self.font, "Press ESC to Quit", True, LIGHT_GRAY)
         
         resume_rect = resume_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 20))
         quit_rect = quit_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 60))
@@ -1486,61 +3357,55 @@ class Game:
     def draw_settings(self):
         """Draw settings screen"""
         # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.compositor.fill(self.screen, (0, 0, 0, 200))
         
         # Settings title
-        title_text = self.big_font.render("SETTINGS", True, WHITE)
+        title_text = self.text.render(self.big_font, "SETTINGS", True, WHITE)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 150))
         self.screen.blit(title_text, title_rect)
         
         # Sound settings
-        sound_text = self.font.render(f"Sound Effects: {'ON' if sound_manager.sound_enabled else 'OFF'}", True, LIGHT_GREEN if sound_manager.sound_enabled else LIGHT_GRAY)
+        sound_text = self.text.render(self.font, f"Sound Effects: {'ON' if sound_manager.sound_enabled else 'OFF'}", True, LIGHT_GREEN if sound_manager.sound_enabled else LIGHT_GRAY)
         sound_rect = sound_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 80))
         self.screen.blit(sound_text, sound_rect)
         
         # Music settings
-        music_text = self.font.render(f"Background Music: {'ON' if sound_manager.music_enabled else 'OFF'}", True, LIGHT_GREEN if sound_manager.music_enabled else LIGHT_GRAY)
+        music_text = self.text.render(self.font, f"Background Music: {'ON' if sound_manager.music_enabled else 'OFF'}", True, LIGHT_GREEN if sound_manager.music_enabled else LIGHT_GRAY)
         music_rect = music_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 40))
         self.screen.blit(music_text, music_rect)
         
         # Difficulty settings
-        difficulty_text = self.font.render(f"Difficulty: {self.settings['difficulty'].title()}", True, CYAN)
+        difficulty_text = self.text.render(self.font, f"Difficulty: {self.settings['difficulty'].title()}", True, CYAN)
         difficulty_rect = difficulty_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
         self.screen.blit(difficulty_text, difficulty_rect)
         
         # Particle effects
-        particles_text = self.font.render(f"Particle Effects: {'ON' if self.settings['particle_effects'] else 'OFF'}", True, LIGHT_GREEN if self.settings['particle_effects'] else LIGHT_GRAY)
+        particles_text = self.text.render(self.font, f"Particle Effects: {'ON' if self.settings['particle_effects'] else 'OFF'}", True, LIGHT_GREEN if self.settings['particle_effects'] else LIGHT_GRAY)
         particles_rect = particles_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 40))
         self.screen.blit(particles_text, particles_rect)
         
         # FPS display
-        fps_text = self.font.render(f"Show FPS: {'ON' if self.settings.get('show_fps', False) else 'OFF'}", True, LIGHT_GREEN if self.settings.get('show_fps', False) else LIGHT_GRAY)
+        fps_text = self.text.render(self.font, f"Show FPS: {'ON' if self.settings['show_fps'] else 'OFF'}", True, LIGHT_GREEN if self.settings['show_fps'] else LIGHT_GRAY)
         fps_rect = fps_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 80))
         self.screen.blit(fps_text, fps_rect)
         
         # Controls
-        controls_text = self.small_font.render("S: Toggle Sound | M: Toggle Music | D: Change Difficulty | P: Toggle Particles | F: Toggle FPS", True, LIGHT_GRAY)
+        controls_text = self.text.render(self.small_font, "S: Toggle Sound | M: Toggle Music | D: Change Difficulty | P: Toggle Particles | F: Toggle FPS", True, LIGHT_GRAY)
         controls_rect = controls_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100))
         self.screen.blit(controls_text, controls_rect)
         
         # Back to menu
-        back_text = self.font.render("Press ESC to Return to Menu", True, YELLOW)
+        back_text = self.text.render(self.font, "Press ESC to Return to Menu", True, YELLOW)
         back_rect = back_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 150))
         self.screen.blit(back_text, back_rect)
     
     def draw_achievements(self):
         """Draw achievements screen"""
         # Semi-transparent overlay
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill(BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.compositor.fill(self.screen, (0, 0, 0, 200))
         
         # Achievements title
-        title_text = self.big_font.render("ACHIEVEMENTS", True, GOLD)
+        title_text = self.text.render(self.big_font, "ACHIEVEMENTS", True, GOLD)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 200))
         self.screen.blit(title_text, title_rect)
         
@@ -1561,18 +3426,18 @@ class Game:
             color = GOLD if unlocked else LIGHT_GRAY
             status = "✓" if unlocked else "✗"
             
-            achievement_text = self.font.render(f"{status} {name}", True, color)
+            achievement_text = self.text.render(self.font, f"{status} {name}", True, color)
             achievement_rect = achievement_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + y_offset))
             self.screen.blit(achievement_text, achievement_rect)
             
-            desc_text = self.small_font.render(description, True, LIGHT_GRAY)
+            desc_text = self.text.render(self.small_font, description, True, LIGHT_GRAY)
             desc_rect = desc_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + y_offset + 25))
             self.screen.blit(desc_text, desc_rect)
             
             y_offset += 50
         
         # Back to menu
-        back_text = self.font.render("Press ESC to Return to Menu", True, YELLOW)
+        back_text = self.text.render(self.font, "Press ESC to Return to Menu", True, YELLOW)
         back_rect = back_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 250))
         self.screen.blit(back_text, back_rect)
     
@@ -1582,26 +3447,21 @@ class Game:
         self.screen.fill(BLACK)
         
         # Moving stars
-        for i in range(100):
-            x = (i * 20 + self.background_offset) % SCREEN_WIDTH
-            y = (i * 15 + self.background_offset * 0.5) % SCREEN_HEIGHT
-            brightness = int(255 * (0.5 + 0.5 * math.sin(self.background_offset * 0.01 + i)))
-            color = (brightness, brightness, brightness)
-            pygame.draw.circle(self.screen, color, (int(x), int(y)), 1)
+        self.starfield.draw_moving_stars(self.screen, 100, self.background_offset)
         
         # Title with pulsing effect
         pulse = int(10 * math.sin(self.splash_timer * 0.1))
-        title_text = self.title_font.render("DODGE LIKE NARUTO", True, ORANGE)
+        title_text = self.text.render(self.title_font, "DODGE LIKE NARUTO", True, ORANGE)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50 + pulse))
         self.screen.blit(title_text, title_rect)
         
         # Subtitle
-        subtitle_text = self.font.render("Enhanced Edition", True, GOLD)
+        subtitle_text = self.text.render(self.font, "Enhanced Edition", True, GOLD)
         subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 20 + pulse))
         self.screen.blit(subtitle_text, subtitle_rect)
         
         # Loading text
-        loading_text = self.small_font.render("Loading...", True, WHITE)
+        loading_text = self.text.render(self.small_font, "Loading...", True, WHITE)
         loading_rect = loading_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 80))
         self.screen.blit(loading_text, loading_rect)
         
@@ -1628,8 +3488,7 @@ class Game:
         map_rect = pygame.Rect(x, y, map_size, map_size)
         
         # Draw map background
-        pygame.draw.rect(self.screen, (0, 0, 0, 180), map_rect)
-        pygame.draw.rect(self.screen, WHITE, map_rect, 2)
+        self.compositor.panel(self.screen, map_rect, (0, 0, 0, 180), WHITE, 2)
         
         # Draw player position (center of map)
         player_x = x + map_size // 2
@@ -1665,16 +3524,87 @@ class Game:
                 pygame.draw.circle(self.screen, GOLD, (int(map_powerup_x), int(map_powerup_y)), 2)
         
         # Draw map label
-        label_text = self.small_font.render("RADAR", True, WHITE)
+        label_text = self.text.render(self.small_font, "RADAR", True, WHITE)
         self.screen.blit(label_text, (x, y - 20))
     
     def draw_fps(self):
         """Draw FPS counter"""
-        if self.settings.get('show_fps', False):
-            fps_text = self.small_font.render(f"FPS: {self.current_fps}", True, LIGHT_GREEN)
+        if self.settings['show_fps']:
+            fps_text = self.text.render(self.small_font, f"FPS: {self.clock.get_fps():.0f}", True, LIGHT_GREEN)
             self.screen.blit(fps_text, (SCREEN_WIDTH - 80, 10))
     
+    def draw_profiler(self):
+        """Overlay per-phase p50/p99 frame times and a graph of recent frame times"""
+        profiler = self.profiler
+        if self.profiler_panel is None or profiler.frames % PROFILE_SUMMARY_INTERVAL == 0:
+            self.profiler_panel = self.render_profiler_panel(profiler.summary(PROFILE_SUMMARY_FRAMES))
+        x = SCREEN_WIDTH - self.profiler_panel.get_width() - 10
+        y = 40
+        self.screen.blit(self.profiler_panel, (x, y))
+        
+        # Busy time per frame against the 60 FPS budget
+        graph = self.profiler_panel.get_rect(topleft=(x, y)).inflate(-20, 0)
+        graph.height = PROFILE_GRAPH_HEIGHT
+        graph.bottom = y + self.profiler_panel.get_height() - 10
+        samples = profiler.history(PROFILE_GRAPH_FRAMES)
+        budget_ms = 1000 / FPS
+        scale = graph.height / (2 * budget_ms)
+        budget_y = graph.bottom - budget_ms * scale
+        pygame.draw.line(self.screen, DARK_GRAY, (graph.left, budget_y), (graph.right, budget_y))
+        if len(samples) > 1:
+            busy = (samples.sum(axis=1) - samples[:, profiler.index['idle']]) * 1000
+            xs = graph.left + np.arange(len(busy)) * graph.width / PROFILE_GRAPH_FRAMES
+            ys = graph.bottom - np.minimum(busy, 2 * budget_ms) * scale
+            pygame.draw.lines(self.screen, LIGHT_GREEN, False, np.column_stack((xs, ys)).tolist())
+        pygame.draw.rect(self.screen, GRAY, graph, 1)
+    
+    def render_profiler_panel(self, summary):
+        """Translucent panel with the p50/p99 table, leaving room for the graph underneath"""
+        table = [("phase", "p50 ms", "p99 ms", GOLD)]
+        table += [(name, f"{summary[name][0]:.2f}", f"{summary[name][1]:.2f}",
+                   WHITE if name in ('busy', 'frame') else LIGHT_GRAY)
+                  for name in PROFILE_PHASES + ('busy', 'frame') if name in summary]
+        line_height = 18
+        width = 300
+        size = (width, 28 + line_height * len(table) + PROFILE_GRAPH_HEIGHT)
+        panel = self.profiler_panel
+        if panel is None or panel.get_size() != size:
+            panel = pygame.Surface(size, pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 190))  # Filling a per-pixel alpha surface replaces its pixels, clearing the old table
+        for i, (name, p50, p99, color) in enumerate(table):
+            row_y = 8 + i * line_height
+            panel.blit(self.text.render(self.tiny_font, name, True, color), (10, row_y))
+            for right, value in ((210, p50), (width - 10, p99)):
+                value_text = self.text.render(self.tiny_font, value, True, color)
+                panel.blit(value_text, value_text.get_rect(topright=(right, row_y)))
+        return panel
+    
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        self.profiler.enabled = self.show_profiler or self.frame_profile_path is not None
+    
     def draw(self):
+        """Draw the current state and set ``dirty_rects`` to what changed (None for the whole screen)"""
+        self.dirty_rects = None
+        if not self.dirty_rendering or self.show_profiler:
+            self.static_key = None  # The profiler overlay is redrawn over the full screen every frame
+            self.draw_full()
+        elif self.state == MENU:
+            self.dirty_rects = self.draw_menu_dirty()
+        elif self.state == PAUSED:
+            self.dirty_rects = self.draw_static((PAUSED,), self.draw_full)
+        elif self.state == SETTINGS:
+            key = (SETTINGS, sound_manager.sound_enabled, sound_manager.music_enabled, tuple(self.settings.items()))
+            self.dirty_rects = self.draw_static(key, self.draw_settings)
+        elif self.state == LEVEL_SELECT:
+            self.dirty_rects = self.draw_static((LEVEL_SELECT, tuple(self.achievements.items())), self.draw_achievements)
+        elif self.state == GAME_OVER:
+            self.dirty_rects = self.draw_static((GAME_OVER, self.last_run, self.leaderboard), self.draw_game_over)
+        else:
+            self.static_key = None
+            self.draw_full()
+    
+    def draw_full(self):
         if self.state == SPLASH:
             self.draw_splash()
         elif self.state == MENU:
@@ -1690,12 +3620,104 @@ class Game:
             self.draw_achievements()  # Using achievements screen for now
         elif self.state == GAME_OVER:
             self.draw_game_over()
+        elif self.state == REPLAY:
+            self.draw_game()
+            self.draw_replay_bar()
+        elif self.state == DEMO:
+            self.draw_game()
+            self.draw_demo_banner()
+    
+    def invalidate_screen(self):
+        """Make the next draw() redraw the current screen in full, so the whole window is flipped again"""
+        if self.static_key is not None:
+            self.static_key = (self.static_key[0], None)  # Same state, so draw_static keeps its backdrop
+    
+    def draw_static(self, key, draw):
+        """Draw a screen whose content depends only on ``key``, skipping frames where the key is unchanged.
+        
+        The first frame of a state captures the screen underneath as a
+        backdrop, so translucent overlays are composited over it exactly once
+        however often the screen is redrawn.
+        """
+        if key == self.static_key:
+            return []
+        if self.static_key is None or self.static_key[0] != key[0]:
+            self.backdrop = self.screen.copy()
+        self.static_key = key
+        self.screen.blit(self.backdrop, (0, 0))
+        draw()
+        return None
+    
+    def draw_menu_dirty(self):
+        """Draw the menu as cached labels over the stars, touching only stars that moved or twinkled"""
+        stars = self.starfield.moving_stars(MENU_STARS)
+        placement = stars.place(self.background_offset)
+        key = (MENU, self.leaderboard, sound_manager.sound_enabled, self.high_score, self.level)
+        if key != self.static_key:
+            self.static_key = key
+            self.menu_labels = self.render_layer(self.draw_menu_labels)
+            self.screen.fill(BLACK)
+            stars.draw(self.screen, None, placement)
+            self.screen.blit(self.menu_labels, (0, 0))
+            self.menu_star_rects = stars.rects(placement)
+            self.menu_star_placement = placement
+            return None
+        if placement == self.menu_star_placement:
+            return []
+        
+        # Clear the stars' old and new spots, redraw the stars and restore the labels over them.
+        # Overlapping rects are merged first so no translucent label edge is blended twice.
+        new_rects = stars.rects(placement)
+        dirty = merge_rects(self.menu_star_rects + new_rects)
+        for rect in dirty:
+            self.screen.fill(BLACK, rect)
+        stars.draw(self.screen, None, placement)
+        self.screen.blits([(self.menu_labels, rect, rect) for rect in dirty], doreturn=False)
+        self.menu_star_rects = new_rects
+        self.menu_star_placement = placement
+        return dirty
+    
+    def render_layer(self, draw):
+        """Run ``draw`` offscreen and return what it drew as a transparent screen-sized layer.
+        
+        Blitting antialiased text into a transparent surface darkens its
+        edges, so ``draw`` runs twice, over black and over white, and the
+        difference between the two gives each pixel's exact coverage.
+        """
+        screen = self.screen
+        passes = []
+        try:
+            for background in (BLACK, WHITE):
+                self.screen = pygame.Surface(screen.get_size())
+                self.screen.fill(background)
+                draw()
+                passes.append(pygame.surfarray.array3d(self.screen).astype(np.int32))
+        finally:
+            self.screen = screen
+        on_black, on_white = passes
+        alpha = 255 - (on_white - on_black).max(axis=2)
+        color = on_black * 255 // np.maximum(alpha, 1)[:, :, None]
+        layer = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
+        pygame.surfarray.pixels3d(layer)[:] = np.minimum(color, 255)
+        pygame.surfarray.pixels_alpha(layer)[:] = alpha
+        return layer
     
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
+            elif event.type in EXPOSE_EVENTS:
+                self.invalidate_screen()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_profiler()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.saver.write(PROFILE_EXPORT_FILE, self.profiler.encode(PROFILE_EXPORT_FILE))
+            elif event.type == pygame.KEYDOWN and self.state == REPLAY:
+                self.handle_replay_key(event.key)
+            elif event.type == pygame.KEYDOWN and self.state == DEMO:
+                self.stop_demo()
             elif event.type == pygame.KEYDOWN:
+                self.menu_idle = 0
                 if event.key == pygame.K_ESCAPE:
                     if self.state == PLAYING:
                         self.state = PAUSED
@@ -1714,6 +3736,8 @@ class Game:
                     self.reset_game()
                 elif event.key == pygame.K_m and self.state == GAME_OVER:
                     self.state = MENU
+                elif event.key == pygame.K_v and self.state == GAME_OVER:
+                    self.start_replay(self.recording)
                 elif event.key == pygame.K_s:
                     sound_manager.toggle_sound()
                 elif event.key == pygame.K_o and self.state == MENU:
@@ -1730,24 +3754,215 @@ class Game:
                     self.save_settings()
                 elif event.key == pygame.K_p and self.state == SETTINGS:
                     self.settings['particle_effects'] = not self.settings['particle_effects']
+                    self.effects = self.settings['particle_effects']
                     self.save_settings()
                 elif event.key == pygame.K_f and self.state == SETTINGS:
-                    self.settings['show_fps'] = not self.settings.get('show_fps', False)
+                    self.settings['show_fps'] = not self.settings['show_fps']
                     self.save_settings()
         return True
     
+    def handle_replay_key(self, key):
+        player = self.replay_player
+        if key in (pygame.K_ESCAPE, pygame.K_m):
+            self.replay_player = None
+            self.state = MENU
+        elif key == pygame.K_SPACE:
+            player.toggle_pause()
+        elif key == pygame.K_f:
+            player.fast_forward()
+        elif key == pygame.K_LEFT:
+            player.seek(player.frame - 10 * FPS)
+        elif key == pygame.K_RIGHT:
+            player.seek(player.frame + 10 * FPS)
+        elif key == pygame.K_HOME:
+            player.seek(0)
+    
+    def save_positions(self):
+        """Remember where everything is before a tick so frames drawn between ticks can interpolate"""
+        self.previous_positions = {id(entity): (entity, entity.rect.x, entity.rect.y)
+                                   for entity in itertools.chain((self.player,), self.enemies, self.powerups)}
+        # Projectile rows move when others are culled, so their previous positions travel with them in the pool;
+        # a tick that steps several times (fast-forward) or not at all (paused) still interpolates from here
+        projectiles = self.projectiles
+        n = projectiles.count
+        projectiles.prev_x[:n] = projectiles.x[:n]
+        projectiles.prev_y[:n] = projectiles.y[:n]
+        self.previous_offset = self.background_offset
+        self.previous_animation = self.player.animation_frame
+    
+    @contextlib.contextmanager
+    def interpolated(self, alpha):
+        """Temporarily place entities ``alpha`` of the way from their previous to their current tick position"""
+        moved = []
+        for entity in itertools.chain((self.player,), self.enemies, self.powerups):
+            previous = self.previous_positions.get(id(entity))
+            if previous is None or previous[0] is not entity:
+                continue  # Spawned during the latest tick
+            rect = entity.rect
+            x, y = rect.topleft
+            moved.append((rect, x, y))
+            rect.topleft = (round(previous[1] + (x - previous[1]) * alpha),
+                            round(previous[2] + (y - previous[2]) * alpha))
+        projectiles = self.projectiles
+        projectile_x, projectile_y = projectiles.x, projectiles.y
+        projectiles.x = round_half_away(projectiles.prev_x + (projectile_x - projectiles.prev_x) * alpha)
+        projectiles.y = round_half_away(projectiles.prev_y + (projectile_y - projectiles.prev_y) * alpha)
+        offset = self.background_offset
+        if offset >= self.previous_offset:
+            self.background_offset = self.previous_offset + (offset - self.previous_offset) * alpha
+        player = self.player
+        animation = player.animation_frame
+        if animation >= self.previous_animation:
+            player.animation_frame = self.previous_animation + (animation - self.previous_animation) * alpha
+        try:
+            yield
+        finally:
+            for rect, x, y in moved:
+                rect.topleft = (x, y)
+            projectiles.x, projectiles.y = projectile_x, projectile_y
+            self.background_offset = offset
+            player.animation_frame = animation
+    
     def run(self):
+        """Run the simulation at a fixed FPS ticks per second and draw as often as max_fps allows.
+        
+        Real time accumulates between frames and is spent in whole ticks; the
+        leftover fraction of a tick interpolates the drawn positions. After
+        MAX_TICKS_PER_FRAME ticks in one frame the remaining backlog is
+        dropped, so a slow machine runs the game slower instead of stalling.
+        """
         running = True
+        profiler = self.profiler
+        accumulator = 0.0
+        last_time = time.perf_counter()
         while running:
+            profiler.begin_frame()
             running = self.handle_events()
-            self.update()
-            self.draw()
-            pygame.display.flip()
-            self.clock.tick(FPS)
-        
+            profiler.mark('events')
+            
+            now = time.perf_counter()
+            accumulator += now - last_time
+            last_time = now
+            ticks = 0
+            while accumulator >= TICK_SECONDS and ticks < MAX_TICKS_PER_FRAME:
+                self.save_positions()
+                self.update()
+                accumulator -= TICK_SECONDS
+                ticks += 1
+            if ticks == MAX_TICKS_PER_FRAME:
+                accumulator = min(accumulator, TICK_SECONDS)
+            profiler.mark('update/other')
+            
+            with self.interpolated(accumulator / TICK_SECONDS):
+                self.draw()
+            profiler.mark('draw/other')
+            if self.show_profiler:
+                self.draw_profiler()
+                profiler.mark('profiler')
+            if self.dirty_rects is None:
+                pygame.display.flip()
+            elif self.dirty_rects:
+                pygame.display.update(self.dirty_rects)
+            profiler.mark('flip')
+            self.clock.tick(self.max_fps)
+            profiler.mark('idle')
+            profiler.end_frame()
+        
+        if self.frame_profile_path:
+            profiler.export(self.frame_profile_path)
+        self.saver.close()
+        if self.loader.is_alive():
+            self.loader.join()  # Quitting on the splash screen: let it finish opening the profile
+        if self.profile is not None:  # Unset if loading failed and finish_loading() never ran
+            self.profile.close()
         pygame.quit()
         sys.exit()
 
+class RandomPolicy:
+    """Mash random keys from a seeded stream; used to exercise the simulation headlessly"""
+    def __init__(self, seed):
+        self.rng = rng_stream(seed, 'policy')
+    
+    def __call__(self, sim):
+        return self.rng.getrandbits(6)
+
+def run_headless(seconds, games=1, seed=None, autopilot=False, stage=1):
+    """Play ``games`` seeded games of up to ``seconds`` each with no display and report results.
+    
+    Random keys are pressed unless ``autopilot`` is set; ``stage`` skips every
+    game ahead to that stage first, for soak testing the late game.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    started = time.perf_counter()
+    simulated = 0
+    searched = 0
+    for game_number in range(games):
+        sim = Simulation(seed + game_number, effects=False)
+        sim.skip_to_stage(stage)
+        policy = Autopilot() if autopilot else RandomPolicy(sim.seed)
+        frames = sim.advance(int(seconds * FPS), policy)
+        simulated += frames
+        if autopilot:
+            searched += policy.simulated
+        print(f"Game {game_number + 1} (seed {sim.seed}): score {sim.score:,} | level {sim.level} | stage {sim.stage} | "
+              f"survived {frames / FPS:.1f}s | {'died' if sim.game_over else 'alive'}")
+    elapsed = time.perf_counter() - started
+    print(f"Simulated {simulated / FPS:.1f}s of play in {elapsed:.2f}s ({simulated / FPS / elapsed:.0f}x real time)")
+    if autopilot:
+        print(f"Autopilot searched {searched:,} frames ahead ({searched / max(1, simulated):.0f} per frame played, "
+              f"{searched / elapsed:,.0f} per second)")
+
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    import argparse
+    parser = argparse.ArgumentParser(description="Dodge Like Naruto - Enhanced Edition")
+    parser.add_argument('--headless', type=float, metavar='SECONDS',
+                        help="simulate up to SECONDS of play per game without a window")
+    parser.add_argument('--games', type=int, default=1, help="number of headless games to run")
+    parser.add_argument('--seed', type=int, help="seed of the first headless game (consecutive seeds follow)")
+    parser.add_argument('--stage', type=int, default=1, help="start headless games at this stage (default %(default)s)")
+    parser.add_argument('--autopilot', action='store_true',
+                        help="let the search-based autopilot play, headless or in the window")
+    parser.add_argument('--replay', metavar='FILE', help="watch a recorded replay")
+    parser.add_argument('--eager-startup', action='store_true',
+                        help="load fonts, sounds and saved state before showing the splash screen")
+    parser.add_argument('--max-fps', type=int, default=FPS,
+                        help="cap on frames drawn per second, e.g. your display's refresh rate (default %(default)s)")
+    parser.add_argument('--uncapped', action='store_true', help="draw frames as fast as possible")
+    parser.add_argument('--full-redraw', action='store_true',
+                        help="redraw and flip the whole screen every frame, even on menus")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="record frame timings from the start and export them to FILE (.csv or .json) on exit")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="print how long each startup phase takes and exit")
+    args = parser.parse_args()
+    
+    if args.headless:
+        run_headless(args.headless, args.games, args.seed, args.autopilot, args.stage)
+    else:
+        if args.replay:
+            try:
+                replay = Replay.load(args.replay)
+            except (OSError, ValueError) as error:
+                sys.exit(f"Could not open replay {args.replay}: {error}")
+        game = Game(lazy=not args.eager_startup)
+        if args.startup_report:
+            with startup_phase('first frame'):
+                game.draw()
+                pygame.display.flip()
+            with startup_phase('wait for loader'):
+                game.finish_loading()
+            print_startup_report()
+            pygame.quit()
+            sys.exit()
+        game.max_fps = 0 if args.uncapped else args.max_fps
+        game.dirty_rendering = not args.full_redraw
+        if args.autopilot:
+            game.autopilot = Autopilot()
+        if args.profile:
+            game.frame_profile_path = args.profile
+            game.profiler.enabled = True  # Record only; F3 still toggles the overlay
+        if args.replay:
+            game.finish_loading()
+            game.start_replay(replay)
+        game.run()
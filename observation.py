@@ -0,0 +1,198 @@
+"""
+Dodge Like Naruto - Observation Encoder
+Turns a Simulation's world state into fixed-size float32 arrays for bots and
+analytics, without going through pygame.Rect objects or the screen.
+
+    encoder = ObservationEncoder(grid=True)
+    vector = encoder.encode(sim)          # player + nearest projectiles, enemies and powerups
+    encoder.projectiles[:, 0]             # named views into the same vector
+    encoder.grid[GRID_CHANNELS.index('projectiles')]   # occupancy raster
+
+All outputs are allocated once and overwritten by every encode(), so copy
+them to keep a step's observation.
+"""
+
+import numpy as np
+
+from main import SCREEN_WIDTH, SCREEN_HEIGHT, PROJECTILE_SIZE, PROJECTILE_CAPACITY, ENEMY_TYPES, POWERUP_TYPES
+
+# Column layout of each block; positions are relative to the player's center
+# in screen widths and heights, and type ids index PROJECTILE_TYPES,
+# ENEMY_TYPES or POWERUP_TYPES. Empty slots are all zero, ``present`` included.
+PLAYER_FEATURES = ('x', 'y', 'health', 'dash_cooldown', 'special_cooldown', 'dashing', 'special',
+                   'shield', 'speed_boost', 'slow_time', 'invincible')
+PROJECTILE_FEATURES = ('dx', 'dy', 'vx', 'vy', 'type', 'present')
+ENEMY_FEATURES = ('dx', 'dy', 'type', 'health', 'attack_ready', 'present')
+POWERUP_FEATURES = ('dx', 'dy', 'type', 'present')
+
+NEAREST_PROJECTILES = 16
+NEAREST_ENEMIES = 8
+NEAREST_POWERUPS = 4
+SPEED_SCALE = 20  # Projectile velocities (pixels per frame) are divided by this to land roughly in [-1, 1]
+
+GRID_CELL = 25  # Pixels per occupancy grid cell
+GRID_CHANNELS = ('projectiles', 'enemies', 'powerups', 'player')
+GRID_SHAPE = (len(GRID_CHANNELS), -(-SCREEN_HEIGHT // GRID_CELL), -(-SCREEN_WIDTH // GRID_CELL))
+
+def observation_size(projectiles=NEAREST_PROJECTILES, enemies=NEAREST_ENEMIES, powerups=NEAREST_POWERUPS):
+    """Length of the vector an ObservationEncoder with these slot counts produces"""
+    return (len(PLAYER_FEATURES) + projectiles * len(PROJECTILE_FEATURES) + enemies * len(ENEMY_FEATURES)
+            + powerups * len(POWERUP_FEATURES))
+
+class ObservationEncoder:
+    """Fixed-shape encoding of the player and the nearest projectiles, enemies and powerups.
+
+    ``vector`` holds everything back to back; ``player``, ``projectiles``,
+    ``enemies`` and ``powerups`` are (slots, features) views into it. Pass
+    ``out`` to encode straight into a caller's buffer, such as one row of a
+    batch. With ``grid`` set (True, or a GRID_SHAPE array to fill) encode()
+    also rasterizes every entity rect into a per-channel occupancy grid of
+    GRID_CELL pixel cells.
+    """
+    def __init__(self, projectiles=NEAREST_PROJECTILES, enemies=NEAREST_ENEMIES, powerups=NEAREST_POWERUPS,
+                 out=None, grid=None):
+        self.size = observation_size(projectiles, enemies, powerups)
+        if out is None:
+            out = np.zeros(self.size, dtype=np.float32)
+        elif out.shape != (self.size,) or out.dtype != np.float32:
+            raise ValueError(f"out must be a float32 array of shape ({self.size},)")
+        self.vector = out
+        blocks = []
+        start = 0
+        for slots, features in ((1, PLAYER_FEATURES), (projectiles, PROJECTILE_FEATURES),
+                                (enemies, ENEMY_FEATURES), (powerups, POWERUP_FEATURES)):
+            end = start + slots * len(features)
+            blocks.append(out[start:end].reshape(slots, len(features)))
+            start = end
+        self.player = blocks[0][0]
+        self.projectiles, self.enemies, self.powerups = blocks[1:]
+
+        if grid is True:
+            grid = np.zeros(GRID_SHAPE, dtype=np.float32)
+        elif grid is not None and (grid.shape != GRID_SHAPE or grid.dtype != np.float32):
+            raise ValueError(f"grid must be a float32 array of shape {GRID_SHAPE}")
+        self.grid = grid
+
+        # Scratch for the projectile pass. Rows are ranked by complex keys, distance + row * 1j: an
+        # in-place sort orders them by distance and then by row without argsort's index arrays
+        self.dx = np.empty(PROJECTILE_CAPACITY)
+        self.dy = np.empty(PROJECTILE_CAPACITY)
+        self.keys = np.empty(PROJECTILE_CAPACITY, dtype=np.complex128)
+        self.rows = np.arange(PROJECTILE_CAPACITY, dtype=np.float64)
+        self.nearest = np.empty(projectiles, dtype=np.intp)
+        self.speed = np.empty(projectiles)
+        self.velocity = np.empty(projectiles)
+        self.types = np.empty(projectiles, dtype=np.int8)
+        self.entity_keys = np.empty(64, dtype=np.complex128)  # Grown if a world ever holds more entities
+
+    def encode(self, sim):
+        """Fill the outputs from ``sim`` and return ``vector``"""
+        player = sim.player
+        px, py = player.rect.center
+        self.player[:] = (
+            px / SCREEN_WIDTH, py / SCREEN_HEIGHT, player.health / player.max_health,
+            player.dash_cooldown / 60, player.special_attack_cooldown / 300, player.is_dashing,
+            player.is_using_special, player.shield_active, player.speed_boost, player.slow_time, player.invincible
+        )
+        self.encode_projectiles(sim.projectiles, px, py)
+        self.encode_entities(self.enemies, sim.enemies, px, py, self.enemy_features)
+        self.encode_entities(self.powerups, sim.powerups, px, py, self.powerup_features)
+        if self.grid is not None:
+            self.rasterize(sim)
+        return self.vector
+
+    @staticmethod
+    def rank(keys, slots):
+        """Sort the ``slots`` smallest keys to the front, in place"""
+        if slots < len(keys):
+            keys.partition(slots - 1)
+            keys[:slots].sort()
+        else:
+            keys.sort()
+
+    def encode_projectiles(self, pool, px, py):
+        rows = self.projectiles
+        n = pool.count
+        slots = min(n, len(rows))
+        rows[slots:] = 0
+        if not n:
+            return
+        half = PROJECTILE_SIZE / 2
+        dx = np.subtract(pool.x[:n], px - half, out=self.dx[:n])
+        dx /= SCREEN_WIDTH
+        dy = np.subtract(pool.y[:n], py - half, out=self.dy[:n])
+        dy /= SCREEN_HEIGHT
+        keys = self.keys[:n]
+        np.hypot(dx, dy, out=keys.real)
+        keys.imag = self.rows[:n]
+        self.rank(keys, slots)
+        nearest = self.nearest[:slots]
+        nearest[:] = keys[:slots].imag
+        
+        # The take() methods, unlike np.take(), write straight into ``out``; the indices are known good
+        dx.take(nearest, out=rows[:slots, 0], mode='clip')
+        dy.take(nearest, out=rows[:slots, 1], mode='clip')
+        speed = pool.speed.take(nearest, out=self.speed[:slots], mode='clip')
+        speed /= SPEED_SCALE
+        velocity = self.velocity[:slots]
+        np.multiply(pool.vx.take(nearest, out=velocity, mode='clip'), speed, out=rows[:slots, 2])
+        np.multiply(pool.vy.take(nearest, out=velocity, mode='clip'), speed, out=rows[:slots, 3])
+        rows[:slots, 4] = pool.type.take(nearest, out=self.types[:slots], mode='clip')
+        rows[:slots, 5] = 1
+
+    @staticmethod
+    def enemy_features(row, enemy):
+        row[2] = ENEMY_TYPES.index(enemy.type)
+        row[3] = enemy.health
+        row[4] = min(1, enemy.attack_timer / enemy.attack_delay)
+        row[5] = 1
+
+    @staticmethod
+    def powerup_features(row, powerup):
+        row[2] = POWERUP_TYPES.index(powerup.type)
+        row[3] = 1
+
+    def encode_entities(self, rows, entities, px, py, features):
+        """Fill ``rows`` with the entities nearest the player, closest first"""
+        n = len(entities)
+        slots = min(n, len(rows))
+        rows[slots:] = 0
+        if not n:
+            return
+        if n > len(self.entity_keys):
+            self.entity_keys = np.empty(2 * n, dtype=np.complex128)
+        keys = self.entity_keys[:n]
+        for i, entity in enumerate(entities):
+            dx = (entity.rect.centerx - px) / SCREEN_WIDTH
+            dy = (entity.rect.centery - py) / SCREEN_HEIGHT
+            keys[i] = complex(dx * dx + dy * dy, i)
+        self.rank(keys, slots)
+        for j in range(slots):
+            entity = entities[int(keys[j].imag)]
+            row = rows[j]
+            row[0] = (entity.rect.centerx - px) / SCREEN_WIDTH
+            row[1] = (entity.rect.centery - py) / SCREEN_HEIGHT
+            features(row, entity)
+
+    def rasterize(self, sim):
+        """Mark the grid cells each projectile, enemy, powerup and the player overlap"""
+        grid = self.grid
+        grid[:] = 0
+        projectiles, enemies, powerups, player = grid
+        pool = sim.projectiles
+        n = pool.count
+        for x, y in zip(pool.x[:n].tolist(), pool.y[:n].tolist()):
+            self.fill(projectiles, int(x), int(y), PROJECTILE_SIZE, PROJECTILE_SIZE)
+        for channel, entities in ((enemies, sim.enemies), (powerups, sim.powerups)):
+            for entity in entities:
+                self.fill(channel, *entity.rect)
+        self.fill(player, *sim.player.rect)
+
+    @staticmethod
+    def fill(channel, x, y, width, height):
+        top = max(y // GRID_CELL, 0)
+        left = max(x // GRID_CELL, 0)
+        bottom = (y + height - 1) // GRID_CELL + 1
+        right = (x + width - 1) // GRID_CELL + 1
+        if bottom > top and right > left:
+            channel[top:bottom, left:right] = 1
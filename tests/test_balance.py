@@ -0,0 +1,36 @@
+"""Balancing runner arguments: bad settings are refused before any output or worker process exists"""
+
+import sys
+import json
+
+import pytest
+
+import balance
+
+@pytest.mark.parametrize('arguments', [
+    ['--games', '0'],
+    ['--workers', '0'],
+    ['--set', 'no_such_setting=1'],
+    ['--set', 'projectile_base_speed=4.5'],
+    ['--set', 'projectile_base_speed=true'],
+    ['--set', 'spawn_delay_floor=twelve'],
+    ['--set', 'stage_5_boss_chance="high"'],
+])
+def test_bad_arguments_exit_before_running(arguments, tmp_path, monkeypatch, capsys):
+    output = tmp_path / 'runs'
+    monkeypatch.setattr(sys, 'argv', ['balance.py', '--output', str(output), *arguments])
+    with pytest.raises(SystemExit) as exit_info:
+        balance.main()
+    assert exit_info.value.code == 2
+    assert 'error' in capsys.readouterr().err
+    assert not output.exists()
+
+def test_settings_keep_their_default_types(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['balance.py', '--output', str(tmp_path), '--games', '2', '--workers', '1',
+                                      '--max-seconds', '5', '--set', 'stage_5_boss_chance=1',
+                                      '--set', 'spawn_delay_floor=12'])
+    balance.main()
+    with open(tmp_path / balance.MANIFEST_FILE) as f:
+        settings = json.load(f)['balance']
+    assert settings['stage_5_boss_chance'] == 1.0 and isinstance(settings['stage_5_boss_chance'], float)
+    assert settings['spawn_delay_floor'] == 12 and isinstance(settings['spawn_delay_floor'], int)
@@ -0,0 +1,76 @@
+"""Bot environments: Gym-style stepping, automatic resets and batched projectiles that match solo games"""
+
+import numpy as np
+import pytest
+
+from main import Simulation, RandomPolicy, ProjectileBatch
+from env import DodgeEnv, VectorDodgeEnv
+from observation import ObservationEncoder, observation_size
+
+def test_step_rewards_score_and_truncates():
+    env = DodgeEnv(max_frames=50)
+    observation, info = env.reset(seed=3)
+    assert observation.shape == (observation_size(),) and info['frame'] == 0
+    total = 0
+    for frame in range(1, 51):
+        observation, reward, terminated, truncated, info = env.step(0)
+        total += reward
+        assert not terminated and truncated == (frame == 50)
+    assert total == info['score'] == env.sim.score
+
+def test_step_after_game_over_raises():
+    env = DodgeEnv()
+    env.reset(seed=1)
+    env.sim.game_over = True
+    with pytest.raises(RuntimeError):
+        env.step(0)
+
+def test_vector_env_matches_games_stepped_on_their_own():
+    count, max_frames = 6, 400
+    env = VectorDodgeEnv(count, seed=100, max_frames=max_frames)
+    env.reset()
+    solo = [Simulation(100 + i, effects=False) for i in range(count)]
+    next_seed = 100 + count
+    encoder = ObservationEncoder()
+    policies = [RandomPolicy(i) for i in range(count)]
+    actions = np.zeros(count, dtype=np.int64)
+    for _ in range(1200):
+        for i, sim in enumerate(solo):
+            actions[i] = policies[i](sim)
+        env.step(actions)
+        for i, sim in enumerate(solo):
+            score = sim.score
+            sim.step(int(actions[i]))
+            assert env.rewards[i] == sim.score - score
+            if sim.game_over or sim.frame >= max_frames:
+                assert env.terminated[i] or env.truncated[i]
+                assert (env.scores[i], env.frames[i]) == (sim.score, sim.frame)
+                sim.reset_game(next_seed)
+                next_seed += 1
+            assert env.sims[i].snapshot() == sim.snapshot()
+            np.testing.assert_array_equal(env.observations[i], encoder.encode(sim))
+    assert env.episodes == next_seed - 100 - count > 0
+
+def test_batch_advance_matches_pool_update_cull_and_overlapping():
+    count = 5
+    batch = ProjectileBatch(count)
+    batched = [Simulation(seed, effects=False, projectiles=pool) for seed, pool in enumerate(batch.pools)]
+    solo = [Simulation(seed, effects=False) for seed in range(count)]
+    for sims in (batched, solo):
+        for sim in sims:
+            sim.level, sim.stage = 10, 4
+            for _ in range(30):
+                sim.spawn_projectile()
+    for frame in range(300):
+        for i, (a, b) in enumerate(zip(batched, solo)):
+            a.player.slow_time = b.player.slow_time = (frame // 40 + i) % 2 == 0
+            a.player.rect.x = b.player.rect.x = (frame * 13 + i * 170) % 950
+        hits = batch.advance([sim.player for sim in batched])
+        for sim, hit in zip(solo, hits):
+            pool = sim.projectiles
+            pool.update(sim.player.slow_time)
+            pool.cull()
+            assert hit.tolist() == pool.overlapping(sim.player.rect).tolist()
+        for a, b in zip(batched, solo):
+            assert [column[:a.projectiles.count].tobytes() for column in a.projectiles.columns()] == \
+                   [column[:b.projectiles.count].tobytes() for column in b.projectiles.columns()]
@@ -0,0 +1,95 @@
+"""ObservationEncoder: fixed shapes, nearest-first slots that match a brute-force ranking, zeroed empty slots"""
+
+import random
+
+import numpy as np
+import pytest
+
+from main import (Simulation, RandomPolicy, PROJECTILE_SIZE, PROJECTILE_TYPES, PROJECTILE_DIRECTIONS,
+                  SCREEN_WIDTH, SCREEN_HEIGHT, ENEMY_TYPES, RED)
+from observation import (ObservationEncoder, observation_size, PLAYER_FEATURES, PROJECTILE_FEATURES, ENEMY_FEATURES,
+                         POWERUP_FEATURES, NEAREST_PROJECTILES, NEAREST_ENEMIES, NEAREST_POWERUPS, SPEED_SCALE,
+                         GRID_SHAPE, GRID_CHANNELS)
+
+def busy(seed, frames=2000):
+    sim = Simulation(seed, effects=False)
+    sim.level, sim.stage = 13, 5
+    policy = RandomPolicy(seed)
+    for _ in range(frames):
+        sim.player.health = 3
+        sim.step(policy(sim))
+    return sim
+
+def expected_projectiles(sim, slots):
+    """The projectile block computed the slow, obvious way"""
+    px, py = sim.player.rect.center
+    pool = sim.projectiles
+    rows = []
+    for i in range(pool.count):
+        dx = (pool.x[i] - (px - PROJECTILE_SIZE / 2)) / SCREEN_WIDTH
+        dy = (pool.y[i] - (py - PROJECTILE_SIZE / 2)) / SCREEN_HEIGHT
+        speed = pool.speed[i] / SPEED_SCALE
+        rows.append((np.hypot(dx, dy), i, [dx, dy, pool.vx[i] * speed, pool.vy[i] * speed, pool.type[i], 1]))
+    rows.sort(key=lambda row: row[:2])
+    block = np.zeros((slots, len(PROJECTILE_FEATURES)), dtype=np.float32)
+    for j, (_, _, features) in enumerate(rows[:slots]):
+        block[j] = features
+    return block
+
+def test_shapes_and_views():
+    encoder = ObservationEncoder(grid=True)
+    assert encoder.vector.shape == (observation_size(),) and encoder.vector.dtype == np.float32
+    assert encoder.player.shape == (len(PLAYER_FEATURES),)
+    assert encoder.projectiles.shape == (NEAREST_PROJECTILES, len(PROJECTILE_FEATURES))
+    assert encoder.enemies.shape == (NEAREST_ENEMIES, len(ENEMY_FEATURES))
+    assert encoder.powerups.shape == (NEAREST_POWERUPS, len(POWERUP_FEATURES))
+    assert encoder.grid.shape == GRID_SHAPE
+    for view in (encoder.player, encoder.projectiles, encoder.enemies, encoder.powerups):
+        assert np.shares_memory(view, encoder.vector)
+    assert encoder.encode(busy(1, 300)) is encoder.vector
+
+def test_out_and_grid_buffers_are_checked():
+    with pytest.raises(ValueError):
+        ObservationEncoder(out=np.zeros(observation_size() + 1, dtype=np.float32))
+    with pytest.raises(ValueError):
+        ObservationEncoder(out=np.zeros(observation_size()))
+    with pytest.raises(ValueError):
+        ObservationEncoder(grid=np.zeros(GRID_SHAPE))
+    batch = np.zeros((2, observation_size(3, 2, 1)), dtype=np.float32)
+    encoder = ObservationEncoder(3, 2, 1, out=batch[1])
+    encoder.encode(busy(2, 300))
+    assert not batch[0].any() and batch[1].any()
+
+@pytest.mark.parametrize('slots', [1, 4, NEAREST_PROJECTILES, 64])
+def test_projectiles_are_nearest_first(slots):
+    sim = busy(3)
+    rng = random.Random(3)
+    for _ in range(40):
+        x, y = rng.randrange(SCREEN_WIDTH), rng.randrange(SCREEN_HEIGHT)
+        for _ in range(rng.choice((1, 1, 2))):  # Some share a position, so ties must break by row
+            sim.projectiles.spawn(x, y, rng.choice(list(PROJECTILE_DIRECTIONS)), rng.uniform(1, 9), RED,
+                                  rng.choice(PROJECTILE_TYPES))
+    encoder = ObservationEncoder(projectiles=slots)
+    encoder.encode(sim)
+    np.testing.assert_array_equal(encoder.projectiles, expected_projectiles(sim, slots))
+
+def test_entities_are_nearest_first():
+    sim = busy(4)
+    assert sim.enemies
+    encoder = ObservationEncoder(enemies=len(sim.enemies) + 2)
+    encoder.encode(sim)
+    px, py = sim.player.rect.center
+    enemies = sorted(sim.enemies, key=lambda enemy: ((enemy.rect.centerx - px) / SCREEN_WIDTH) ** 2
+                     + ((enemy.rect.centery - py) / SCREEN_HEIGHT) ** 2)
+    assert encoder.enemies[:, 2].tolist()[:len(enemies)] == [ENEMY_TYPES.index(enemy.type) for enemy in enemies]
+    assert encoder.enemies[:, -1].tolist() == [1] * len(enemies) + [0, 0]
+    assert not encoder.enemies[len(enemies):].any()
+
+def test_empty_slots_are_cleared_between_encodes():
+    encoder = ObservationEncoder(grid=True)
+    encoder.encode(busy(5))
+    sim = Simulation(5, effects=False)
+    encoder.encode(sim)
+    assert not encoder.projectiles.any() and not encoder.enemies.any() and not encoder.powerups.any()
+    grid = dict(zip(GRID_CHANNELS, encoder.grid))
+    assert not grid['projectiles'].any() and grid['player'].any()
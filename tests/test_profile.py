@@ -0,0 +1,98 @@
+"""ProfileStore: schema migrations, the legacy JSON import and corrupt saved values"""
+
+import json
+import sqlite3
+
+import pytest
+
+from main import ProfileStore, PROFILE_VERSION, RUN_FIELDS, DEFAULT_SETTINGS, DEFAULT_ACHIEVEMENTS
+
+@pytest.fixture(autouse=True)
+def no_legacy_files(tmp_path, monkeypatch):
+    """Run in an empty directory so the game's own legacy JSON files are never imported"""
+    monkeypatch.chdir(tmp_path)
+
+def user_version(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute('PRAGMA user_version').fetchone()[0]
+
+def indexes(path):
+    with sqlite3.connect(path) as connection:
+        return {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def run(score, **fields):
+    return {**dict.fromkeys(RUN_FIELDS, 0), 'score': score, **fields}
+
+def test_new_profile_is_current_and_holds_defaults(tmp_path):
+    path = tmp_path / 'profile.db'
+    store = ProfileStore(path)
+    assert store.load() == {'high_score': 0, 'achievements': DEFAULT_ACHIEVEMENTS, 'settings': DEFAULT_SETTINGS}
+    store.close()
+    assert user_version(path) == PROFILE_VERSION
+
+def test_first_migration_imports_the_legacy_json_files(tmp_path):
+    (tmp_path / 'high_score.json').write_text(json.dumps({'high_score': 4321}))
+    (tmp_path / 'achievements.json').write_text(json.dumps({'score_1000': True}))
+    (tmp_path / 'settings.json').write_text('{"difficulty": ')  # Damaged: ignored
+    store = ProfileStore(tmp_path / 'profile.db')
+    saved = store.load()
+    store.close()
+    assert saved['high_score'] == 4321
+    assert saved['achievements'] == {**DEFAULT_ACHIEVEMENTS, 'score_1000': True}
+    assert saved['settings'] == DEFAULT_SETTINGS
+
+def test_version_1_file_gains_the_indexes_and_keeps_its_data(tmp_path):
+    path = tmp_path / 'profile.db'
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE profile (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        connection.execute(f"CREATE TABLE runs (id INTEGER PRIMARY KEY, {', '.join(RUN_FIELDS)})")
+        connection.execute('INSERT INTO profile VALUES (?, ?)', ('high_score', '900'))
+        connection.execute(f"INSERT INTO runs ({', '.join(RUN_FIELDS)}) VALUES ({', '.join('?' * len(RUN_FIELDS))})",
+                           [run(900)[field] for field in RUN_FIELDS])
+        connection.execute('PRAGMA user_version = 1')
+    connection.close()
+    store = ProfileStore(path)
+    assert store.load()['high_score'] == 900
+    assert [row['score'] for row in store.top_runs()] == [900]
+    store.close()
+    assert user_version(path) == PROFILE_VERSION
+    assert {'runs_by_score', 'runs_by_date', 'runs_by_stage', 'runs_by_frames'} <= indexes(path)
+
+def test_reopening_a_current_file_changes_nothing(tmp_path):
+    path = tmp_path / 'profile.db'
+    store = ProfileStore(path)
+    store.set('high_score', '77')
+    store.add_run(run(77))
+    store.close()
+    store = ProfileStore(path)
+    assert store.load()['high_score'] == 77
+    assert store.personal_bests()['runs'] == 1
+    store.close()
+
+def test_newer_file_is_refused(tmp_path):
+    path = tmp_path / 'profile.db'
+    with sqlite3.connect(path) as connection:
+        connection.execute(f'PRAGMA user_version = {PROFILE_VERSION + 1}')
+    connection.close()
+    with pytest.raises(sqlite3.DatabaseError):
+        ProfileStore(path)
+
+def test_corrupt_values_fall_back_to_defaults(tmp_path):
+    store = ProfileStore(tmp_path / 'profile.db')
+    store.set('settings', '{"particle_effects": fal')
+    store.set('achievements', '[1, 2]')
+    store.set('high_score', '"lots"')
+    assert store.load() == {'high_score': 0, 'achievements': DEFAULT_ACHIEVEMENTS, 'settings': DEFAULT_SETTINGS}
+    store.set('settings', json.dumps({'difficulty': 'hard'}))
+    assert store.load()['settings'] == {**DEFAULT_SETTINGS, 'difficulty': 'hard'}
+    store.close()
+
+def test_leaderboard_order_and_rank(tmp_path):
+    store = ProfileStore(tmp_path / 'profile.db')
+    for score, stage in ((500, 1), (1500, 2), (900, 2), (1500, 1)):
+        store.add_run(run(score, stage=stage))
+    assert [row['score'] for row in store.top_runs()] == [1500, 1500, 900, 500]
+    assert [row['score'] for row in store.top_runs(stage=2)] == [1500, 900]
+    assert store.rank(1000) == 3
+    assert store.personal_bests() == {'runs': 4, 'score': 1500, 'frames': 0, 'stage': 2}
+    store.close()
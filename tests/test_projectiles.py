@@ -0,0 +1,66 @@
+"""ProjectilePool: movement rounds like pygame.Rect, trails, culling and removal keep order"""
+
+import pygame
+import pytest
+
+from main import (ProjectilePool, round_half_away, PROJECTILE_SIZE, PROJECTILE_TRAIL, PROJECTILE_TYPES,
+                  SCREEN_WIDTH, SCREEN_HEIGHT, RED)
+
+@pytest.mark.parametrize('value', [-2.5, -1.5, -0.5, -0.49, 0.0, 0.5, 1.5, 2.5, 2.49, 7.75])
+def test_round_half_away_matches_pygame_rect(value):
+    rect = pygame.Rect(0, 0, 1, 1)
+    rect.x = value
+    assert round_half_away(value) == rect.x
+
+def test_update_moves_like_the_rect_it_replaces():
+    pool = ProjectilePool()
+    pool.spawn(100, 50, 'down', 3, RED, 'kunai')
+    pool.spawn(400, 200, 'left', 4.5, RED, 'fireball')
+    rects = [pygame.Rect(100, 50, PROJECTILE_SIZE, PROJECTILE_SIZE), pygame.Rect(400, 200, PROJECTILE_SIZE, PROJECTILE_SIZE)]
+    speeds = [3, 4.5]
+    for frame in range(40):
+        slow = frame >= 20
+        pool.update(slow)
+        rects[0].y += speeds[0]
+        rects[1].x -= speeds[1]
+        if slow:
+            speeds = [max(speed * 0.5, 1) for speed in speeds]
+        assert pool.x[:2].tolist() == [rect.x for rect in rects]
+        assert pool.y[:2].tolist() == [rect.y for rect in rects]
+    assert pool.speed[:2].tolist() == speeds
+
+def test_trail_keeps_the_latest_centers():
+    pool = ProjectilePool()
+    pool.spawn(10, 10, 'right', 2, RED, 'kunai')
+    for frame in range(PROJECTILE_TRAIL + 3):
+        assert pool.trail_length[0] == min(frame, PROJECTILE_TRAIL)
+        pool.update()
+    centers = {(10 + 2 * i + PROJECTILE_SIZE // 2, 10 + PROJECTILE_SIZE // 2) for i in range(3, PROJECTILE_TRAIL + 3)}
+    assert {tuple(point) for point in pool.trail[0].tolist()} == centers
+
+def test_cull_and_remove_keep_the_order_of_survivors():
+    pool = ProjectilePool()
+    positions = [(10, 10), (10, SCREEN_HEIGHT + 1), (SCREEN_WIDTH + 1, 10), (-21, 10), (-20, 10), (500, 600)]
+    for i, (x, y) in enumerate(positions):
+        pool.spawn(x, y, 'down', 1, RED, PROJECTILE_TYPES[i])
+    pool.cull()
+    assert pool.type[:pool.count].tolist() == [0, 4, 5]
+    pool.remove([1])
+    assert pool.type[:pool.count].tolist() == [0, 5]
+    assert (pool.x[:2].tolist(), pool.y[:2].tolist()) == ([10, 500], [10, 600])
+
+def test_overlapping_matches_colliderect():
+    pool = ProjectilePool()
+    for x in range(-40, 140, 7):
+        for y in range(-40, 140, 9):
+            pool.spawn(x, y, 'down', 1, RED, 'kunai')
+    target = pygame.Rect(30, 40, 50, 30)
+    expected = [i for i in range(pool.count)
+                if target.colliderect(pygame.Rect(pool.x[i], pool.y[i], PROJECTILE_SIZE, PROJECTILE_SIZE))]
+    assert pool.overlapping(target).tolist() == expected
+
+def test_spawn_beyond_capacity_is_dropped():
+    pool = ProjectilePool(capacity=2)
+    for _ in range(3):
+        pool.spawn(0, 0, 'down', 1, RED, 'kunai')
+    assert len(pool) == 2
@@ -0,0 +1,83 @@
+"""Replay files and playback: encoding round trips, damaged files are refused and playback reproduces the run"""
+
+import pytest
+
+from main import (Simulation, RandomPolicy, Replay, ReplayPlayer, REPLAY_HEADER, REPLAY_MAGIC, REPLAY_VERSION,
+                  REPLAY_SNAPSHOT_INTERVAL)
+
+def record(seed, frames):
+    """Play ``frames`` frames with a random player, returning the finished Simulation and its Replay"""
+    sim = Simulation(seed, effects=False)
+    replay = Replay(seed)
+    policy = RandomPolicy(seed)
+    for _ in range(frames):
+        if sim.game_over:
+            break
+        inputs = policy(sim)
+        replay.record(inputs)
+        sim.step(inputs)
+    return sim, replay
+
+@pytest.mark.parametrize('inputs', [
+    b'',
+    b'\x05',
+    bytes(range(64)),
+    b'\x00' * 127 + b'\x01' * 128 + b'\x02' * 16383 + b'\x03' * 16384 + b'\x3f' * 70000,
+])
+def test_encode_decode_round_trip(inputs):
+    decoded = Replay.decode(Replay(2 ** 63 + 7, inputs).encode())
+    assert decoded.seed == 2 ** 63 + 7
+    assert bytes(decoded.inputs) == inputs
+
+def test_runs_of_held_keys_encode_compactly():
+    data = Replay(1, b'\x01' * 3600 + b'\x00' * 3600).encode()
+    assert len(data) == REPLAY_HEADER.size + 2 * 3  # A flag byte and a two-byte varint per run
+
+def test_save_and_load(tmp_path):
+    _, replay = record(4, 600)
+    path = tmp_path / 'run.dlr'
+    replay.save(path)
+    loaded = Replay.load(path)
+    assert (loaded.seed, loaded.inputs) == (replay.seed, replay.inputs)
+
+def header(frames, magic=REPLAY_MAGIC, version=REPLAY_VERSION):
+    return REPLAY_HEADER.pack(magic, version, 1, frames)
+
+@pytest.mark.parametrize('data', [
+    b'',
+    header(0)[:-1],
+    header(0, magic=b'PNG\x00'),
+    header(0, version=REPLAY_VERSION + 1),
+    header(10) + b'\x01',  # Run length missing
+    header(200) + b'\x01\xc8',  # Varint cut short
+    header(10) + b'\x01\x0b',  # More frames than the header says
+    header(10) + b'\x01\x09',  # Fewer
+])
+def test_damaged_files_raise_value_error(data):
+    with pytest.raises(ValueError):
+        Replay.decode(data)
+
+def test_playback_reproduces_the_run():
+    sim, replay = record(21, 2000)
+    player = ReplayPlayer(replay, Simulation(effects=False))
+    while player.step():
+        pass
+    assert player.frame == replay.frames
+    assert player.sim.snapshot() == sim.snapshot()
+
+def test_seek_matches_straight_playback():
+    _, replay = record(22, 3 * REPLAY_SNAPSHOT_INTERVAL)
+    straight = ReplayPlayer(replay, Simulation(effects=False))
+    expected = {}
+    targets = (REPLAY_SNAPSHOT_INTERVAL + 17, 5, 2 * REPLAY_SNAPSHOT_INTERVAL, replay.frames)
+    while True:
+        if straight.frame in targets:
+            expected[straight.frame] = straight.sim.snapshot()
+        if not straight.step():
+            break
+    player = ReplayPlayer(replay, Simulation(effects=False))
+    player.seek(replay.frames)  # Leaves snapshots behind to seek back to
+    for frame in targets:
+        player.seek(frame)
+        assert player.frame == frame
+        assert player.sim.snapshot() == expected[frame]
@@ -0,0 +1,80 @@
+"""snapshot(), restore() and fork(): a restored or forked world carries on exactly like the original"""
+
+import pytest
+
+from main import Simulation, RandomPolicy
+
+def busy(seed, frames=2500, effects=True):
+    """A world late enough to hold projectiles, enemies, powerups and particles"""
+    sim = Simulation(seed, effects=effects)
+    sim.level, sim.stage = 13, 5
+    policy = RandomPolicy(seed)
+    for _ in range(frames):
+        sim.player.health = 3
+        sim.step(policy(sim))
+    return sim
+
+def continue_game(sim, frames=600):
+    """Step on with fixed inputs and return the snapshot after each frame"""
+    snapshots = []
+    for i in range(frames):
+        sim.player.health = 3
+        sim.step(i * 7 % 64)
+        snapshots.append(sim.snapshot())
+    return snapshots
+
+@pytest.fixture(scope='module')
+def world():
+    sim = busy(11)
+    assert len(sim.projectiles) and sim.enemies and len(sim.particles)
+    return sim.snapshot()
+
+def test_restore_rewinds_a_simulation(world):
+    sim = Simulation()
+    sim.restore(world)
+    expected = continue_game(sim)
+    sim.restore(world)
+    assert sim.snapshot() == world
+    assert continue_game(sim) == expected
+
+def test_restore_into_another_simulation(world):
+    original = Simulation()
+    original.restore(world)
+    other = busy(99, frames=300, effects=False)
+    other.effects = True
+    other.restore(world)
+    assert other.snapshot() == world
+    assert continue_game(other) == continue_game(original)
+
+def test_empty_world_round_trips():
+    sim = Simulation(3)
+    snapshot = sim.snapshot()
+    copy = busy(4, frames=300)
+    copy.restore(snapshot)
+    assert copy.snapshot() == snapshot
+    assert len(copy.projectiles) == len(copy.particles) == 0
+
+@pytest.mark.parametrize('reuse', [False, True])
+def test_fork_matches_restore(world, reuse):
+    sim = Simulation()
+    sim.restore(world)
+    target = busy(5, frames=400) if reuse else None
+    fork = sim.fork(target)
+    assert fork is not sim and (target is None or fork is target)
+    assert fork.snapshot() == world
+    assert continue_game(fork) == continue_game(sim)
+
+def test_fork_shares_nothing(world):
+    sim = Simulation()
+    sim.restore(world)
+    fork = sim.fork()
+    continue_game(fork, 200)
+    fork.enemies[0].rect.x += 5
+    fork.projectiles.x[0] += 5
+    assert sim.snapshot() == world
+
+def test_fork_takes_the_balance_settings():
+    sim = Simulation(7, balance={'spawn_delay': 20})
+    target = Simulation(8)
+    fork = sim.fork(target)
+    assert fork.balance == sim.balance and fork.balance is not sim.balance
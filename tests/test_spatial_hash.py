@@ -0,0 +1,46 @@
+"""SpatialHash broadphase: queries may over-report but never miss an overlapping entity"""
+
+import random
+import types
+
+import pygame
+import pytest
+
+from main import SpatialHash, COLLISION_CELL_SIZE, BROADPHASE_MIN_ENTITIES, SCREEN_WIDTH, SCREEN_HEIGHT
+
+def scatter(count, seed):
+    rng = random.Random(seed)
+    return [types.SimpleNamespace(rect=pygame.Rect(rng.randint(-60, SCREEN_WIDTH), rng.randint(-60, SCREEN_HEIGHT),
+                                                   rng.randint(1, COLLISION_CELL_SIZE),
+                                                   rng.randint(1, COLLISION_CELL_SIZE)))
+            for _ in range(count)]
+
+@pytest.mark.parametrize('count', [0, 1, BROADPHASE_MIN_ENTITIES - 1, BROADPHASE_MIN_ENTITIES, 200])
+def test_query_finds_every_overlapping_rect(count):
+    entities = scatter(count, count)
+    grid = SpatialHash()
+    grid.build(entities)
+    rng = random.Random(1)
+    for _ in range(300):
+        area = pygame.Rect(rng.randint(-80, SCREEN_WIDTH), rng.randint(-80, SCREEN_HEIGHT),
+                           rng.randint(1, 120), rng.randint(1, 120))
+        found = list(grid.query(area))
+        assert found == sorted(set(found))
+        assert {i for i, entity in enumerate(entities) if area.colliderect(entity.rect)} <= set(found)
+
+def test_query_radius_finds_every_rect_within_reach():
+    entities = scatter(200, 5)
+    grid = SpatialHash()
+    grid.build(entities)
+    rng = random.Random(2)
+    for _ in range(300):
+        x, y, radius = rng.randint(0, SCREEN_WIDTH), rng.randint(0, SCREEN_HEIGHT), rng.randint(1, 150)
+        near = {i for i, entity in enumerate(entities)
+                if (entity.rect.centerx - x) ** 2 + (entity.rect.centery - y) ** 2 < radius ** 2}
+        assert near <= set(grid.query_radius(x, y, radius))
+
+def test_rebuild_forgets_the_previous_entities():
+    grid = SpatialHash()
+    grid.build(scatter(200, 7))
+    grid.build(scatter(BROADPHASE_MIN_ENTITIES, 8))
+    assert all(i < BROADPHASE_MIN_ENTITIES for i in grid.query(pygame.Rect(-100, -100, 2000, 2000)))